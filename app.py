@@ -1,10 +1,14 @@
-from datetime import datetime
+from datetime import date, datetime, time
+import hashlib
+import hmac
+import logging
 import os
-from flask import Flask, redirect, render_template, request, flash, abort,jsonify, send_file, url_for, session
+import uuid
+from flask import Flask, Response, g, make_response, redirect, render_template, request, flash, abort,jsonify, send_file, stream_with_context, url_for, session
 from flask.views import MethodView
 from werkzeug.security import generate_password_hash, check_password_hash
-from services.db import get_db, init_db
-from services.utils import classify_and_insert
+from services.db import get_db, init_db, pool_stats
+from services.utils import classify_and_insert, classify_and_insert_many, insert_committer
 from services.dashboard_service import DashboardService
 from services.add_service import AddService
 from services.subcategory_service import SubcategoryService
@@ -13,21 +17,56 @@ from services.delete_service import DeleteService
 from services.data_service import DataService
 from services.analytics_service import AnalyticsService
 from services.backup_service import BackupService
-from services.password_service import PasswordService
+from services.job_service import job_runner, run_export, run_import
+from services.password_service import PasswordService, PASSWORD_PAGE_SIZE
+from services import vault
+from services.rollup_service import RollupService
+from services.cache import fetch_data_version, result_cache
+from services.model_registry import model_registry
+from services.prediction_cache import prediction_cache_stats
+from services.pagination import MAX_PAGE_SIZE, InvalidCursor, parse_cursor, parse_page_size
+from services import metrics
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 
 
 from services.utils import CATEGORIES
-import traceback
+import click
 from functools import wraps
+from time import perf_counter
 
 
+# -------------------- Logging --------------------
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s")
+
 # -------------------- Flask App --------------------
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET', os.urandom(24))
 UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+ADD_BATCH_MAX = int(os.environ.get('ADD_BATCH_MAX', 5000))
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Bearer token required by /metrics; unset, /metrics is not served at all
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Create/upgrade the schema when the app is imported. gunicorn.conf.py turns this
+# off and runs it once in the master instead of once per worker.
+DB_INIT_ON_START = os.environ.get('DB_INIT_ON_START', '1') == '1'
+
+
+def _template_fingerprint():
+    """Hash of the templates, so a deploy that changes the markup changes every ETag."""
+    digest = hashlib.sha1()
+    folder = os.path.join(app.root_path, app.template_folder)
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+ETAG_SALT = os.environ.get('ETAG_SALT') or _template_fingerprint()
 
 # Decorator to require login for routes
 def login_required(f):
@@ -39,42 +78,233 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Operational endpoints (/metrics, /stats/*) are for the scraper, not for users:
+# they need METRICS_TOKEN instead of a login
+OPERATIONAL_ENDPOINTS = [
+    "metrics", "db_pool_stats", "cache_stats", "model_stats", "prediction_cache_stats", "group_commit_stats",
+    "vault_key_stats",
+]
+
+def require_metrics_token(f):
+    """Serve the view only to requests sending ``Authorization: Bearer <METRICS_TOKEN>``.
+
+    404 while ``METRICS_TOKEN`` is unset, 401 for a missing or wrong token.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not METRICS_TOKEN:
+            abort(404)
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        return f(*args, **kwargs)
+    return decorated
+
+# Conditional GET for views whose output depends only on the user's data
+def conditional(f):
+    """Answer If-None-Match / If-Modified-Since with 304 while the user's data is unchanged.
+
+    The ETag is derived from ``users.data_version`` (bumped by every write), the
+    URL and today's date, so revalidating only reads the users row. Responses that
+    carry flashed messages are never tagged, since those are shown once.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get("_flashes"):
+            return f(*args, **kwargs)
+
+        version, updated_at = fetch_data_version(session["user_id"])
+        today = date.today()
+        etag = hashlib.sha1(
+            f"{ETAG_SALT}:{session['user_id']}:{version}:{today}:{request.endpoint}:{request.full_path}".encode()
+        ).hexdigest()
+        midnight = datetime.combine(today, time()).astimezone()
+        last_modified = max(updated_at, midnight) if updated_at else midnight
+
+        not_modified = (
+            etag in request.if_none_match if request.if_none_match
+            else request.if_modified_since is not None and last_modified.replace(microsecond=0) <= request.if_modified_since
+        )
+        if not_modified:
+            response = Response(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or session.get("_flashes") or g.get("uncacheable"):
+                return response
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    return decorated_function
+
+# Request latency and query count, observed per endpoint
+@app.before_request
+def start_timer():
+    g.request_started = perf_counter()
+    metrics.begin_request()
+
+@app.after_request
+def record_latency(response):
+    started = g.get("request_started")
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"
+        metrics.REQUEST_SECONDS.observe(
+            perf_counter() - started, endpoint=endpoint, method=request.method, status=response.status_code,
+        )
+        metrics.end_request(endpoint)
+    return response
+
 # Apply login_required to all routes
 @app.before_request
 def require_login():
-    excluded_routes = ["login", "signup", "static"]
-    print(f"Request endpoint: {request.endpoint}")
+    excluded_routes = ["login", "signup", "static", *OPERATIONAL_ENDPOINTS]
     if request.endpoint in excluded_routes or request.endpoint is None:
-        print("Access allowed: Excluded route or static file.")
         return  # Allow access to excluded routes and static files
     if "user_id" not in session:
-        print("Access denied: User not logged in.")
+        app.logger.debug("Access denied to %s: user not logged in", request.endpoint)
         return redirect(url_for("login"))
 
 # -------------------- Error Handlers --------------------
+def is_api_request():
+    return request.path.startswith("/api/")
+
+def api_error(message, status):
+    return jsonify({"success": False, "error": message}), status
+
 @app.errorhandler(404)
 def not_found(e):
+    if is_api_request():
+        return api_error("Not found", 404)
     return render_template('404.html'), 404
 
 @app.errorhandler(500)
 def internal_error(e):
-    print("Internal Server Error: %s", traceback.format_exc())
+    app.logger.exception("Internal Server Error: %s", e)
+    if is_api_request():
+        return api_error("Internal server error", 500)
     return render_template('500.html'), 500
 
 @app.errorhandler(Exception)
 def handle_any_error(e):
-    print("Unhandled Exception: %s", traceback.format_exc())
+    if is_api_request():
+        if isinstance(e, HTTPException):
+            return api_error(e.description, e.code)
+        if isinstance(e, ValueError):
+            # Malformed parameters (e.g. InvalidCursor) are the client's error
+            app.logger.warning("Invalid API request %s: %s", request.full_path, e)
+            return api_error("Invalid request parameters", 400)
+        app.logger.exception("Unhandled Exception: %s", e)
+        return api_error("Internal server error", 500)
+    app.logger.exception("Unhandled Exception: %s", e)
     flash("An unexpected error occurred.", "danger")
     return render_template('500.html'), 500
 
 # -------------------- Initialize DB --------------------
 
-with app.app_context():
-    try:
-        init_db()
-        print("✅ Database initialized successfully.")
-    except Exception as ex:
-        print(f"❌ Database initialization failed: {ex}")
+def initialize_database():
+    if not vault.keys.configured:
+        app.logger.warning(vault.UNCONFIGURED_MESSAGE)
+    with app.app_context():
+        try:
+            init_db()
+            app.logger.info("Database initialized successfully.")
+        except Exception as ex:
+            app.logger.error("Database initialization failed: %s", ex)
+
+
+if DB_INIT_ON_START:
+    initialize_database()
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create or upgrade the database schema."""
+    initialize_database()
+
+
+@app.cli.command("schema-status")
+def schema_status_command():
+    """Show the schema version, pending migrations and missing indexes."""
+    from services.migrations import schema_status
+
+    status = schema_status()
+    click.echo(f"schema version {status['version']} (latest {status['latest']})")
+    for step in status["pending"]:
+        click.echo(f"pending migration: {step}")
+    for name in status["missing_indexes"]:
+        click.echo(f"missing index: {name}")
+    if status["pending"] or status["missing_indexes"]:
+        raise SystemExit(1)
+
+
+@app.cli.command("build-indexes")
+def build_indexes_command():
+    """Apply the online migrations, then build missing indexes with CREATE INDEX CONCURRENTLY.
+
+    Neither blocks writes for long; both are kept out of the startup path.
+    """
+    from services.migrations import build_indexes, migrate
+
+    applied = migrate(online=True)
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(map(str, applied))}")
+    with get_db() as conn:
+        built = build_indexes(conn)
+    click.echo(f"Built {len(built)} indexes: {', '.join(built)}" if built else "All indexes present")
+
+
+
+@app.cli.command("encrypt-passwords")
+def encrypt_passwords_command():
+    """Encrypt password manager entries still stored in plaintext (needs VAULT_MASTER_KEY)."""
+    from services.password_service import encrypt_plaintext_passwords
+
+    if not vault.keys.configured:
+        raise click.ClickException("VAULT_MASTER_KEY is not set")
+    encrypted = 0
+    with get_db() as conn, conn.cursor() as cur:
+        while True:
+            done = encrypt_plaintext_passwords(cur)
+            conn.commit()
+            if not done:
+                break
+            encrypted += done
+    click.echo(f"Encrypted {encrypted} passwords")
+
+
+@app.cli.command("export-models")
+def export_models_command():
+    """Re-export the serving model artifacts from the pickled scikit-learn models."""
+    from services.model_artifact import export_pickle
+    from services.utils import AMOUNT_MODEL_ARTIFACT, AMOUNT_MODEL_PATH
+
+    for pickle_path, artifact in (
+        (model_registry.path, model_registry.artifact), (AMOUNT_MODEL_PATH, AMOUNT_MODEL_ARTIFACT),
+    ):
+        export_pickle(pickle_path, artifact)
+        click.echo(f"Exported {pickle_path} -> {artifact}")
+
+
+@app.cli.command("rollups")
+@click.argument("action", type=click.Choice(["verify", "rebuild"]))
+@click.option("--user-id", type=int, default=None, help="Limit to one user.")
+def rollups_command(action, user_id):
+    """Verify monthly_rollups against raw transactions, or rebuild them."""
+    service = RollupService()
+    if action == "rebuild":
+        rows = service.rebuild(user_id)
+        click.echo(f"Rebuilt monthly_rollups: {rows} rows")
+        return
+    drift = service.verify(user_id)
+    for row in drift:
+        click.echo(
+            f"user={row['user_id']} month={row['month']} {row['category']}|{row['sub_category']}: "
+            f"expected {row['expected_total']:.2f} ({row['expected_count']}) "
+            f"stored {row['stored_total']:.2f} ({row['stored_count']})"
+        )
+    click.echo(f"{len(drift)} drifted rollup rows" if drift else "monthly_rollups is in sync")
+    if drift:
+        raise SystemExit(1)
 
 
 
@@ -88,6 +318,8 @@ def datetimeformat(value, format='%b %Y'):
 def format_datetime(value):
     if not value:
         return ""
+    if isinstance(value, datetime):
+        return value.strftime("%-d %b, %-I.%M %p")
     try:
         dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
         return dt.strftime("%-d %b, %-I.%M %p")
@@ -111,6 +343,8 @@ def inject_categories():
 
 # -------------------- Class-Based Views --------------------
 class IndexView(MethodView):
+    decorators = [conditional]
+
     def get(self):
         month_filter = request.args.get("month", "").strip()
         service = DashboardService(month_filter)
@@ -125,7 +359,7 @@ class IndexView(MethodView):
                 month_filter=context["month_filter"]
             )
         except Exception as ex:
-            print("Index fetch failed: %s", ex)
+            app.logger.error("Index fetch failed: %s", ex)
             abort(500)
 
 class AddChatView(MethodView):
@@ -134,42 +368,85 @@ class AddChatView(MethodView):
             add_service = AddService()
             txns = add_service.fetch_current_month_txns()
         except Exception as ex:
-            print("Add: GET failed: %s", ex)
+            app.logger.error("Add: GET failed: %s", ex)
             flash("Could not fetch transactions", "danger")
             txns = []
         return render_template("add.html", transactions=txns)
 
     def post(self):
-        text = request.form.get("text")
-        txn = classify_and_insert(text)
-        if txn:
-            return jsonify({"success": True, "txn": txn})
+        # Batch mode: a JSON array (or {"lines": [...]}) or multi-line text
+        if request.is_json:
+            payload = request.get_json(silent=True)
+            lines = payload.get("lines", []) if isinstance(payload, dict) else payload
+            lines = [line for line in lines or [] if isinstance(line, str)]
+        else:
+            lines = (request.form.get("text") or "").splitlines()
+            if len(lines) <= 1:
+                txn = classify_and_insert(request.form.get("text"))
+                if txn:
+                    return jsonify({"success": True, "txn": txn})
+                return jsonify({"success": False, "error": "Could not parse amount"})
+
+        if len(lines) > ADD_BATCH_MAX:
+            return jsonify({"success": False, "error": f"At most {ADD_BATCH_MAX} lines per batch"}), 413
+        txns = classify_and_insert_many(lines)
+        if txns:
+            return jsonify({"success": True, "txns": txns})
         return jsonify({"success": False, "error": "Could not parse amount"})
     
 
+def page_payload(page):
+    """JSON-ready page of transactions plus its cursors."""
+    txns = [
+        dict(
+            txn,
+            date_time=txn["date_time"].isoformat() if txn["date_time"] else None,
+            date_label=format_datetime(txn["date_time"]),
+        )
+        for txn in page["transactions"]
+    ]
+    return dict(page, transactions=txns)
+
+def page_json(page):
+    """JSON body for a "load more" request: the page's rows plus its cursors."""
+    return jsonify(page_payload(page))
+
 class SubcategoryView(MethodView):
+    decorators = [conditional]
+
     def get(self, category, sub_category):
+        cursor = parse_cursor(request.args.get("cursor"))
+        page_size = parse_page_size(request.args.get("size"))
         try:
             subcat_service = SubcategoryService()
-            txns = subcat_service.fetch_transactions_by_subcategory(category, sub_category)
+            page = subcat_service.fetch_transactions_by_subcategory(category, sub_category, cursor, page_size)
         except Exception as ex:
-            print("Subcategory fetch failed: %s", ex)
+            app.logger.error("Subcategory fetch failed: %s", ex)
             abort(500)
-        return render_template("subcategory.html", transactions=txns, category=category, sub_category=sub_category)
+        if request.args.get("format") == "json":
+            return page_json(page)
+        return render_template(
+            "subcategory.html",
+            transactions=page["transactions"],
+            next_cursor=page["next_cursor"],
+            prev_cursor=page["prev_cursor"],
+            page_size=page_size,
+            category=category,
+            sub_category=sub_category
+        )
     
 
 
 class EditView(MethodView):
     def get(self, txn_id):
-        print("Fetching transaction for edit...",txn_id)
         try:
             service = EditService()
             txn = service.fetch_transaction(txn_id)
             if txn is None:
-                print("Transaction not found or access denied for txn_id: %s", txn_id)
+                app.logger.warning("Transaction not found or access denied for txn_id: %s", txn_id)
                 abort(404)
         except Exception as ex:
-            print("Edit fetch failed: %s", ex)
+            app.logger.error("Edit fetch failed: %s", ex)
             abort(404)
         return render_template("edit.html", txn=txn, categories=CATEGORIES)
 
@@ -184,7 +461,7 @@ class EditView(MethodView):
             flash("Transaction updated successfully!", "success")
             return redirect(url_for("add_chat", txn_id=txn_id))
         except Exception as ex:
-            print("Edit update failed: %s", ex)
+            app.logger.error("Edit update failed: %s", ex)
             abort(500)
 
 class DeleteTransactionView(MethodView):
@@ -194,24 +471,37 @@ class DeleteTransactionView(MethodView):
             service.delete_transaction(txn_id, session["user_id"])
             flash("Transaction deleted successfully!", "success")
         except Exception as ex:
-            print("Delete transaction failed: %s", ex)
+            app.logger.error("Delete transaction failed: %s", ex)
             flash("Could not delete transaction!", "danger")
         return redirect(url_for("add_chat"))
 
 
 class DynamicDataView(MethodView):
+    decorators = [conditional]
+
     def get(self, sub_category):
         search = request.args.get("search", "").strip()
         month_filter = request.args.get("month", "").strip()
+        cursor = parse_cursor(request.args.get("cursor"))
+        page_size = parse_page_size(request.args.get("size"))
         service = DataService()
         try:
-            txns, subcat_list, months, month_filter = service.fetch(sub_category, month_filter, search, session["user_id"])
+            page, subcat_list, months, month_filter = service.fetch(
+                sub_category, month_filter, search, session["user_id"], cursor, page_size
+            )
         except Exception as ex:
-            print("Dynamic data fetch failed: %s", ex)
-            txns, subcat_list, months = [], [], []
+            app.logger.error("Dynamic data fetch failed: %s", ex)
+            g.uncacheable = True
+            page = {"transactions": [], "next_cursor": None, "prev_cursor": None}
+            subcat_list, months = [], []
+        if request.args.get("format") == "json":
+            return page_json(page)
         return render_template(
             "all-data.html",
-            transactions=txns,
+            transactions=page["transactions"],
+            next_cursor=page["next_cursor"],
+            prev_cursor=page["prev_cursor"],
+            page_size=page_size,
             sub_category=sub_category,
             subcat_list=subcat_list,
             months=months,
@@ -220,20 +510,123 @@ class DynamicDataView(MethodView):
             
 
 class AnalyticsView(MethodView):
+    decorators = [conditional]
+
     def get(self):
+        range_key = request.args.get("range", "").strip()
+        start = request.args.get("start", "").strip()
+        end = request.args.get("end", "").strip()
+        service = AnalyticsService()
         try:
-            service = AnalyticsService()
-            expenses_data, income_rows, savings_rows, up_rows = service.fetch_analytics()
+            expenses_data, income_rows, savings_rows, up_rows = service.fetch_analytics(range_key, start, end)
         except Exception as ex:
-            print("Analytics fetch failed: %s", ex)
+            app.logger.error("Analytics fetch failed: %s", ex)
+            g.uncacheable = True
             expenses_data, income_rows, savings_rows, up_rows = {}, [], [], []
+        try:
+            trends = service.fetch_trends(range_key, start, end)
+        except Exception as ex:
+            app.logger.error("Trends fetch failed: %s", ex)
+            g.uncacheable = True
+            trends = None
         return render_template(
             "analytics.html",
             expenses_data=expenses_data,
             income_rows=income_rows,
             savings_rows=savings_rows,
-            up_rows=up_rows
+            up_rows=up_rows,
+            trends=trends,
+            range_key=range_key,
+            start=start,
+            end=end
+        )
+
+# -------------------- JSON API --------------------
+class DashboardApiView(MethodView):
+    decorators = [conditional]
+
+    def get(self):
+        service = DashboardService(request.args.get("month", "").strip())
+        return jsonify(service.get_context())
+
+class AnalyticsApiView(MethodView):
+    decorators = [conditional]
+
+    def get(self):
+        range_key = request.args.get("range", "").strip()
+        start = request.args.get("start", "").strip()
+        end = request.args.get("end", "").strip()
+        expenses_data, income_rows, savings_rows, up_rows = AnalyticsService().fetch_analytics(range_key, start, end)
+        return jsonify({
+            "expenses": expenses_data,
+            "income": income_rows,
+            "savings": savings_rows,
+            "usne_pasne": up_rows,
+        })
+
+class TrendsApiView(MethodView):
+    decorators = [conditional]
+
+    def get(self):
+        range_key = request.args.get("range", "").strip()
+        start = request.args.get("start", "").strip()
+        end = request.args.get("end", "").strip()
+        return jsonify(AnalyticsService().fetch_trends(range_key, start, end))
+
+class DataApiView(MethodView):
+    decorators = [conditional]
+
+    def get(self, sub_category):
+        page, _, months, month_filter = DataService().fetch(
+            sub_category,
+            request.args.get("month", "").strip(),
+            request.args.get("search", "").strip(),
+            session["user_id"],
+            parse_cursor(request.args.get("cursor")),
+            parse_page_size(request.args.get("size")),
         )
+        return jsonify(dict(page_payload(page), months=months, month_filter=month_filter))
+
+class PoolStatsView(MethodView):
+    decorators = [require_metrics_token]
+
+    def get(self):
+        return jsonify(pool_stats())
+
+class CacheStatsView(MethodView):
+    decorators = [require_metrics_token]
+
+    def get(self):
+        return jsonify(result_cache.stats())
+
+class ModelStatsView(MethodView):
+    decorators = [require_metrics_token]
+
+    def get(self):
+        return jsonify(model_registry.stats())
+
+class PredictionCacheStatsView(MethodView):
+    decorators = [require_metrics_token]
+
+    def get(self):
+        return jsonify(prediction_cache_stats())
+
+class GroupCommitStatsView(MethodView):
+    decorators = [require_metrics_token]
+
+    def get(self):
+        return jsonify(insert_committer.stats())
+
+class MetricsView(MethodView):
+    decorators = [require_metrics_token]
+
+    def get(self):
+        stats = pool_stats()
+        for state in ("borrowed", "idle"):
+            metrics.POOL_CONNECTIONS.set(stats[state], state=state)
+        for event in ("borrows", "timeouts", "reconnects"):
+            metrics.POOL_EVENTS.set(stats.get(event, 0), event=event)
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 class ProfileView(MethodView):
     def get(self):
@@ -241,49 +634,100 @@ class ProfileView(MethodView):
     
 class DownloadBackupView(MethodView):
     def get(self):
-        try:
-            service = BackupService()
-            file_path = service.export_xlsx()
-            return send_file(file_path, as_attachment=True)
-        except Exception as ex:
-            print("Backup download failed: %s", ex)
-            abort(500)
+        fmt = "csv" if request.args.get("format") == "csv" else "xlsx"
+        service = BackupService()
+        if fmt == "csv":
+            body, mimetype = service.export_csv(session["user_id"]), "text/csv"
+        else:
+            body, mimetype = service.export_xlsx(session["user_id"]), XLSX_MIMETYPE
+        filename = f"backup-{datetime.now():%Y%m%d}.{fmt}"
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
 
 class UploadBackupView(MethodView):
     def post(self):
+        wants_json = request.args.get("format") == "json"
         try:
             if "file" not in request.files or request.files["file"].filename == "":
+                if wants_json:
+                    return jsonify({"success": False, "error": "No file uploaded or selected!"}), 400
                 flash("No file uploaded or selected!", "danger")
                 return redirect(url_for("backup_page"))
             file = request.files["file"]
-            filename = secure_filename(file.filename)
+            # Unique name: the file outlives this request and uploads may run side by side
+            filename = f"{uuid.uuid4().hex}-{secure_filename(file.filename)}"
             file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
             file.save(file_path)
-            service = BackupService()
-            service.import_xlsx(file_path)
-            flash("Data uploaded successfully! Duplicate data were skipped", "success")
-            return redirect(url_for("profile"))
+            job_id = job_runner.submit(
+                session["user_id"], "import",
+                {"user_id": session["user_id"], "file_path": file_path},
+                run_import,
+                owned_files=[file_path],
+            )
+            if wants_json:
+                return jsonify({"success": True, "job_id": job_id, "status_url": url_for("job_status", job_id=job_id)}), 202
+            flash("Upload received, restoring in the background.", "success")
+            return redirect(url_for("backup_page", job=job_id))
         except Exception as ex:
-            print("Backup upload failed: %s", ex)
+            app.logger.error("Backup upload failed: %s", ex)
+            if wants_json:
+                return jsonify({"success": False, "error": "Upload failed!"}), 500
             flash("Upload failed!", "danger")
             return redirect(url_for("backup_page"))
 
+class ExportBackupView(MethodView):
+    def post(self):
+        fmt = "csv" if request.args.get("format") == "csv" else "xlsx"
+        job_id = job_runner.submit(
+            session["user_id"], "export",
+            {"user_id": session["user_id"], "format": fmt},
+            run_export,
+        )
+        return jsonify({"success": True, "job_id": job_id, "status_url": url_for("job_status", job_id=job_id)}), 202
+
+class JobStatusView(MethodView):
+    def get(self, job_id):
+        job = job_runner.get(job_id, session["user_id"])
+        if job is None:
+            return jsonify({"success": False, "error": "Job not found"}), 404
+        if job["has_result"]:
+            job["download_url"] = url_for("job_download", job_id=job_id)
+        return jsonify(job)
+
+class JobDownloadView(MethodView):
+    def get(self, job_id):
+        result = job_runner.result_file(job_id, session["user_id"])
+        if result is None:
+            return jsonify({"success": False, "error": "Result not available"}), 404
+        path, params = result
+        fmt = params.get("format", "xlsx")
+        return send_file(
+            os.path.abspath(path),
+            mimetype="text/csv" if fmt == "csv" else XLSX_MIMETYPE,
+            as_attachment=True,
+            download_name=f"backup-{datetime.now():%Y%m%d}.{fmt}",
+        )
+
 class BackupPageView(MethodView):
     def get(self):
         return render_template("backup.html")
     
 
+def password_page_size(value):
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return PASSWORD_PAGE_SIZE
+
 class PasswordManagerView(MethodView):
     def get(self):
-        user_id = session.get("user_id")
-        passwords = []
-        try:
-            service = PasswordService()
-            passwords = service.list_passwords(user_id)
-        except Exception as ex:
-            print("Password fetch failed: %s", ex)
-
-        return render_template("password_manager.html", passwords=passwords)
+        # Entries are fetched a page at a time by the page's script (PasswordsApiView)
+        if not vault.keys.configured:
+            flash("The password vault is not configured: passwords cannot be added or revealed.", "danger")
+        return render_template("password_manager.html")
     
     def post(self):
         # Handle adding a new password entry
@@ -292,14 +736,17 @@ class PasswordManagerView(MethodView):
         password = request.form.get("password")
         action = request.form.get("activeOption")
         user_id = session.get("user_id")
+        service = PasswordService()
 
+        if action in ("Search", "List"):
+            query = request.form.get("query") if action == "Search" else None
+            return jsonify(dict(service.list_passwords(user_id, query), success=True))
 
         if not category or not username or not password:
             flash("All fields are required!", "danger")
             return redirect(url_for("password_manager"))
         
         try:
-            service = PasswordService()
             if action == "New":
 
                 password = service.add_password(user_id, category, username, password)
@@ -308,26 +755,51 @@ class PasswordManagerView(MethodView):
                 else:
                     return jsonify({"success": False, "password": password})
 
-            elif action == "Search":
-                results = service.search_passwords(user_id, category, username)
-
-                if results:
-                    return jsonify({"success": True, "password": results})
-                else:
-                    return jsonify({"success": False, "password": results})
-                
-            
-            elif action == "List":
-                passwords = service.list_passwords(user_id)
-                return jsonify({"success": True, "password": passwords})
-            
+        except vault.VaultUnavailable as ex:
+            app.logger.error("Add password failed: %s", ex)
+            return jsonify({"success": False, "error": "The password vault is not configured"}), 503
         except Exception as ex:
-            print("Add password failed: %s", ex)
+            app.logger.error("Add password failed: %s", ex)
             flash("An error occurred while adding the password.", "danger")
             return jsonify({"success": False, "error": "An error occurred"})
     
 
     
+class PasswordsApiView(MethodView):
+    def get(self):
+        try:
+            page = PasswordService().list_passwords(
+                session["user_id"],
+                request.args.get("q", ""),
+                request.args.get("cursor") or None,
+                password_page_size(request.args.get("size")),
+            )
+        except InvalidCursor:
+            return jsonify({"success": False, "error": "Invalid cursor"}), 400
+        return jsonify(dict(page, success=True))
+
+class PasswordRevealView(MethodView):
+    def post(self, password_id):
+        try:
+            password = PasswordService().reveal_password(session["user_id"], password_id)
+        except vault.VaultUnavailable as ex:
+            app.logger.error("Reveal password failed: %s", ex)
+            return jsonify({"success": False, "error": "The password vault is not configured"}), 503
+        except vault.SecretCorrupted as ex:
+            app.logger.error("Reveal password %s failed: %s", password_id, ex)
+            return jsonify({"success": False, "error": "The stored password could not be decrypted"}), 500
+        if password is None:
+            return jsonify({"success": False, "error": "Password not found"}), 404
+        response = jsonify({"success": True, "password": password})
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+class VaultKeyStatsView(MethodView):
+    decorators = [require_metrics_token]
+
+    def get(self):
+        return jsonify(vault.keys.stats())
+
 # -------------------- Register CBV with URL --------------------
 
 app.add_url_rule("/", view_func=IndexView.as_view("index"))
@@ -340,8 +812,26 @@ app.add_url_rule("/analytics", view_func=AnalyticsView.as_view("analytics"))
 app.add_url_rule("/profile", view_func=ProfileView.as_view("profile"))
 app.add_url_rule("/backup/download", view_func=DownloadBackupView.as_view("download_backup"))
 app.add_url_rule("/backup/upload", view_func=UploadBackupView.as_view("upload_backup"), methods=["POST"])
+app.add_url_rule("/backup/export", view_func=ExportBackupView.as_view("export_backup"), methods=["POST"])
 app.add_url_rule("/backup", view_func=BackupPageView.as_view("backup_page"))
+app.add_url_rule("/jobs/<job_id>", view_func=JobStatusView.as_view("job_status"))
+app.add_url_rule("/jobs/<job_id>/download", view_func=JobDownloadView.as_view("job_download"))
 app.add_url_rule("/passwords", view_func=PasswordManagerView.as_view("password_manager"))
+app.add_url_rule("/api/passwords", view_func=PasswordsApiView.as_view("api_passwords"))
+app.add_url_rule(
+    "/api/passwords/<int:password_id>/reveal", view_func=PasswordRevealView.as_view("reveal_password"), methods=["POST"]
+)
+app.add_url_rule("/api/dashboard", view_func=DashboardApiView.as_view("api_dashboard"))
+app.add_url_rule("/api/analytics", view_func=AnalyticsApiView.as_view("api_analytics"))
+app.add_url_rule("/api/analytics/trends", view_func=TrendsApiView.as_view("api_trends"))
+app.add_url_rule("/api/data/<sub_category>", view_func=DataApiView.as_view("api_data"))
+app.add_url_rule("/stats/db-pool", view_func=PoolStatsView.as_view("db_pool_stats"))
+app.add_url_rule("/stats/cache", view_func=CacheStatsView.as_view("cache_stats"))
+app.add_url_rule("/stats/model", view_func=ModelStatsView.as_view("model_stats"))
+app.add_url_rule("/stats/predictions", view_func=PredictionCacheStatsView.as_view("prediction_cache_stats"))
+app.add_url_rule("/stats/group-commit", view_func=GroupCommitStatsView.as_view("group_commit_stats"))
+app.add_url_rule("/stats/vault-keys", view_func=VaultKeyStatsView.as_view("vault_key_stats"))
+app.add_url_rule("/metrics", view_func=MetricsView.as_view("metrics"))
 
 @app.route("/signup", methods=["GET", "POST"])
 def signup():
@@ -350,14 +840,13 @@ def signup():
         password = request.form["password"]
         hashed_password = generate_password_hash(password)
         try:
-            conn = get_db()
-            cur = conn.cursor()
-            cur.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_password))
-            conn.commit()
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_password))
+                conn.commit()
             flash("Signup successful! Please log in.", "success")
             return redirect(url_for("login"))
         except Exception as ex:
-            print("Signup failed: %s", ex)
+            app.logger.error("Signup failed: %s", ex)
             flash("Signup failed. Try a different username.", "danger")
     return render_template("signup.html")
 
@@ -367,17 +856,16 @@ def login():
         username = request.form["username"]
         password = request.form["password"]
         try:
-            conn = get_db()
-            cur = conn.cursor()
-            cur.execute("SELECT id, password FROM users WHERE username = %s", (username,))
-            user = cur.fetchone()
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute("SELECT id, password FROM users WHERE username = %s", (username,))
+                user = cur.fetchone()
             if user and check_password_hash(user[1], password):
                 session["user_id"] = user[0]
                 flash("Login successful!", "success")
                 return redirect(url_for("index"))
             flash("Invalid credentials.", "danger")
         except Exception as ex:
-            print("Login failed: %s", ex)
+            app.logger.error("Login failed: %s", ex)
             flash("Login failed. Please try again.", "danger")
     return render_template("login.html")
 
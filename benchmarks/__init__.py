@@ -0,0 +1 @@
+"""Standalone performance scripts. Run them with ``python -m benchmarks.<name>``."""
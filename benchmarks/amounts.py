@@ -0,0 +1,106 @@
+# benchmarks/amounts.py
+"""Accuracy and speed of amount extraction against a labelled corpus.
+
+Compares the previous extractor (every whitespace token through the token
+classifier) with the two-stage lexer + classifier in services/utils.py, with
+the token cache cleared before every call so only the extractor is timed.
+Exits non-zero if the current extractor is less accurate than the previous one.
+
+    python -m benchmarks.amounts --repeat 20
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from services import utils
+from services.prediction_cache import amount_token_cache
+
+CORPUS = os.path.join(os.path.dirname(__file__), "amount_corpus.tsv")
+
+
+def load_corpus(path=CORPUS):
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line or line.startswith("#"):
+                continue
+            text, expected = line.split("\t")
+            samples.append((text, float(expected)))
+    return samples
+
+
+def legacy_extract(text):
+    tokens = text.split()
+    if not tokens:
+        return 0
+    labels = utils.amount_model().predict(tokens)
+    amounts = []
+    for token, label in zip(tokens, labels):
+        if label == "AMOUNT":
+            clean_token = re.sub(r'[^\d.]', '', token)
+            if clean_token:
+                amounts.append(float(clean_token))
+    return sum(amounts) if amounts else 0
+
+
+def current_extract(text):
+    amount_token_cache.backend.clear()
+    return utils.extract_amounts(text)
+
+
+def current_extract_batch(texts):
+    amount_token_cache.backend.clear()
+    return utils.extract_amounts_many(texts)
+
+
+def score(extract, samples, verbose=False):
+    correct = 0
+    for text, expected in samples:
+        got = extract(text)
+        if abs(got - expected) < 1e-6:
+            correct += 1
+        elif verbose:
+            print(f"  {extract.__name__} miss: {text!r} -> {got} (expected {expected})")
+    return correct / len(samples)
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="list misclassified lines")
+    args = parser.parse_args()
+
+    if utils.amount_model() is None:
+        sys.exit("amount_extractor.pkl could not be loaded")
+    samples = load_corpus(args.corpus)
+    texts = [text for text, _ in samples]
+
+    legacy_accuracy = score(legacy_extract, samples, args.verbose)
+    current_accuracy = score(current_extract, samples, args.verbose)
+    legacy_s = timed(lambda: [legacy_extract(t) for t in texts], args.repeat)
+    current_s = timed(lambda: [current_extract(t) for t in texts], args.repeat)
+    batch_s = timed(lambda: current_extract_batch(texts), args.repeat)
+
+    per_line = lambda seconds: seconds / len(texts) * 1e6
+    print(f"{len(samples)} labelled lines")
+    print(f"  previous:         accuracy {legacy_accuracy:6.1%}  {per_line(legacy_s):8.1f} us/line")
+    print(f"  two-stage:        accuracy {current_accuracy:6.1%}  {per_line(current_s):8.1f} us/line")
+    print(f"  two-stage, batch:                   {per_line(batch_s):8.1f} us/line")
+
+    if current_accuracy < legacy_accuracy:
+        sys.exit("two-stage extractor is less accurate than the previous one")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/batch_add.py
+"""Throughput of /add: one POST per line versus one batched POST.
+
+Drives the Flask app in-process with its test client against DATABASE_URL, using
+a throwaway user whose rows are removed afterwards.
+
+    DATABASE_URL=... python -m benchmarks.batch_add --lines 1000
+"""
+import argparse
+import random
+import time
+import uuid
+
+from app import app
+from services.db import get_db
+
+SAMPLES = [
+    "tea 15", "lunch 200", "petrol 1000", "wifi bill 800", "bus ticket 50",
+    "salary credited 25000", "invest 2000 in stock", "i sent 500 to friend",
+    "coffee 20", "electricity bill 1200", "recharge 300", "dinner 300",
+]
+
+
+def make_lines(count):
+    return [f"{random.choice(SAMPLES).rsplit(' ', 1)[0]} {random.randint(10, 5000)}" for _ in range(count)]
+
+
+def cleanup(username):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("SELECT id FROM users WHERE username = %s", (username,))
+        row = cur.fetchone()
+        if row:
+            cur.execute("DELETE FROM transactions WHERE user_id = %s", row)
+            cur.execute("DELETE FROM monthly_rollups WHERE user_id = %s", row)
+            cur.execute("DELETE FROM users WHERE id = %s", row)
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1000)
+    args = parser.parse_args()
+
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    client = app.test_client()
+    client.post("/signup", data={"username": username, "password": "bench"})
+    client.post("/login", data={"username": username, "password": "bench"})
+    lines = make_lines(args.lines)
+
+    try:
+        started = time.perf_counter()
+        for line in lines:
+            assert client.post("/add", data={"text": line}).get_json()["success"]
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        response = client.post("/add", json=lines).get_json()
+        batch = time.perf_counter() - started
+        assert response["success"] and len(response["txns"]) == len(lines)
+    finally:
+        cleanup(username)
+
+    print(f"{args.lines} lines")
+    print(f"  one request per line: {single:8.3f}s  {args.lines / single:10.1f} lines/s")
+    print(f"  single batch request: {batch:8.3f}s  {args.lines / batch:10.1f} lines/s")
+    print(f"  speedup: {single / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/export.py
+"""Peak RSS and time-to-first-byte of the backup export.
+
+Seeds a throwaway user with N transactions, then runs each export in a fresh
+process and reports time to first byte, total time, bytes and the peak RSS
+growth over the process baseline. ``--legacy`` adds the old pandas
+read_sql/to_excel path (of every user's rows) for comparison.
+
+    DATABASE_URL=... python -m benchmarks.export --rows 100000 1000000
+"""
+import argparse
+import io
+import multiprocessing
+import resource
+import time
+import uuid
+
+from services.db import get_db
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(rows):
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("INSERT INTO users (username, password) VALUES (%s, '-') RETURNING id", (username,))
+        user_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO transactions (user_id, category, sub_category, description, amount, date_time)
+            SELECT %s, 'Expenses', 'Food & Drinks', 'seeded row ' || g, (random() * 1000)::real,
+                   now() - g * interval '1 minute'
+            FROM generate_series(1, %s) AS g
+        """, (user_id, rows))
+        conn.commit()
+    return user_id
+
+
+def cleanup(user_id):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM transactions WHERE user_id = %s", (user_id,))
+        cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        conn.commit()
+
+
+def legacy_export():
+    import pandas as pd
+
+    with get_db() as conn:
+        df = pd.read_sql_query("SELECT * FROM transactions", conn)
+    df["date_time"] = df["date_time"].dt.tz_localize(None)
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    yield buf.getvalue()
+
+
+def run(mode, user_id, results):
+    from services.backup_service import BackupService
+
+    baseline = peak_rss_mb()
+    service = BackupService()
+    body = {"csv": service.export_csv, "xlsx": service.export_xlsx}.get(mode, lambda _: legacy_export())(user_id)
+    started = time.perf_counter()
+    ttfb, size = None, 0
+    for chunk in body:
+        if ttfb is None and chunk:
+            ttfb = time.perf_counter() - started
+        size += len(chunk)
+    results.put({
+        "mode": mode,
+        "ttfb_ms": ttfb * 1000,
+        "total_s": time.perf_counter() - started,
+        "mb": size / 1e6,
+        "peak_rss_growth_mb": peak_rss_mb() - baseline,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--legacy", action="store_true", help="also time the old pandas export")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    modes = ["csv", "xlsx"] + (["legacy"] if args.legacy else [])
+    for rows in args.rows:
+        user_id = seed(rows)
+        try:
+            print(f"--- {rows} rows")
+            for mode in modes:
+                results = ctx.Queue()
+                proc = ctx.Process(target=run, args=(mode, user_id, results))
+                proc.start()
+                proc.join()
+                if proc.exitcode != 0:
+                    print(f"{mode:>7}: failed (exit code {proc.exitcode})")
+                    continue
+                r = results.get(timeout=5)
+                print(
+                    f"{r['mode']:>7}: ttfb {r['ttfb_ms']:8.1f} ms  total {r['total_s']:7.2f} s  "
+                    f"size {r['mb']:7.1f} MB  peak RSS +{r['peak_rss_growth_mb']:.1f} MB"
+                )
+        finally:
+            cleanup(user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/group_commit.py
+"""Single-line insert throughput under a burst, with and without group commit.
+
+``--threads`` threads each insert ``--lines`` single transactions through
+``classify_and_insert`` (the /add single-line path) as fast as they can, once
+per group-commit window in ``--windows`` (milliseconds; 0 = a transaction per
+row), against DATABASE_URL with throwaway users whose rows are removed
+afterwards. Reports rows/s, commits and per-insert latency.
+
+    DATABASE_URL=... python -m benchmarks.group_commit --threads 16 --lines 200 --windows 0,1,2,5
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from benchmarks.batch_add import cleanup, make_lines
+from services.db import get_db
+from services.utils import classify_and_insert, classify_lines, insert_committer
+
+
+def create_user(username):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("INSERT INTO users (username, password) VALUES (%s, 'bench') RETURNING id", (username,))
+        user_id = cur.fetchone()[0]
+        conn.commit()
+    return user_id
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def burst(window_ms, users, lines):
+    insert_committer.window = window_ms / 1000
+    groups_before = insert_committer.stats()["groups"]
+    latencies = [[] for _ in users]
+    failures = []
+    start = threading.Barrier(len(users) + 1)
+
+    def worker(i):
+        start.wait()
+        for line in lines[i]:
+            began = time.perf_counter()
+            if classify_and_insert(line, user_id=users[i]) is None:
+                failures.append(line)
+            latencies[i].append(time.perf_counter() - began)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(users))]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    rows = sum(len(chunk) for chunk in lines)
+    all_latencies = [value for chunk in latencies for value in chunk]
+    commits = insert_committer.stats()["groups"] - groups_before if window_ms else rows
+    return {
+        "rows_per_second": rows / elapsed,
+        "commits": commits,
+        "p50_ms": percentile(all_latencies, 0.5) * 1000,
+        "p99_ms": percentile(all_latencies, 0.99) * 1000,
+        "failures": len(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--lines", type=int, default=200, help="inserts per thread and window")
+    parser.add_argument("--windows", default="0,1,2,5", help="comma-separated GROUP_COMMIT_MS values")
+    args = parser.parse_args()
+
+    usernames = [f"bench-{uuid.uuid4().hex[:8]}" for _ in range(args.threads)]
+    users = [create_user(username) for username in usernames]
+    # Classify every line up front so the runs measure the write path, not the model
+    all_lines = make_lines(args.threads * args.lines)
+    classify_lines(all_lines)
+    lines = [all_lines[i::args.threads] for i in range(args.threads)]
+
+    print(f"{args.threads} threads x {args.lines} single-line inserts")
+    print(f"{'window ms':>10}{'rows/s':>10}{'commits':>9}{'p50 ms':>9}{'p99 ms':>9}{'failed':>8}")
+    try:
+        for window in args.windows.split(","):
+            result = burst(float(window), users, lines)
+            print(
+                f"{float(window):>10g}{result['rows_per_second']:>10.0f}{result['commits']:>9}"
+                f"{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['failures']:>8}"
+            )
+    finally:
+        for username in usernames:
+            cleanup(username)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+# benchmarks/load.py
+"""Concurrent load test of the main views with a JSON report for comparing commits.
+
+Seeds throwaway users with transactions spread over the last few years (category
+mix and amounts modelled on ``CATEGORIES``), starts the app in a threaded server
+(or targets ``--url``), and has ``--clients`` logged-in clients replay a weighted
+mix of requests: dashboard, /add, the data list with and without search,
+analytics, edits and the backup endpoints. Reports p50/p95/p99 latency and
+throughput per scenario plus database statements per request per endpoint (read
+from /metrics, so with several gunicorn workers it is one worker's sample).
+
+    DATABASE_URL=... python -m benchmarks.load --users 20 --transactions 5000 --years 3 \\
+        --clients 8 --requests 4000 --out load-$(git rev-parse --short HEAD).json
+"""
+import argparse
+import csv
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from werkzeug.security import generate_password_hash
+
+from services.db import get_db, init_db
+from services.rollup_service import rebuild_rollups
+from services.utils import CATEGORIES
+
+PASSWORD = "load-test"
+
+# Share of transactions per top-level category
+CATEGORY_WEIGHTS = {"Expenses": 0.78, "Usne-Pasne": 0.09, "Savings / Investments": 0.08, "Income": 0.05}
+
+# sub_category -> (relative weight within its category, descriptions, amount range)
+SUBCATEGORY_PROFILES = {
+    "Salary": (8, ["salary credited", "monthly salary"], (20000, 150000)),
+    "Other Income Sources": (2, ["freelance payment", "interest credited", "cashback"], (50, 20000)),
+    "Food & Drinks": (30, ["tea", "coffee with friends", "lunch at office", "dinner", "swiggy order", "groceries"], (10, 1500)),
+    "Shopping": (10, ["amazon order", "new shoes", "clothes", "flipkart"], (200, 8000)),
+    "Personal Care": (4, ["haircut", "salon", "medicine", "pharmacy"], (50, 2000)),
+    "Transport": (15, ["petrol", "uber to airport", "bus ticket", "metro card recharge", "auto"], (20, 3000)),
+    "Loans & EMI": (3, ["home loan emi", "car emi", "credit card bill"], (2000, 40000)),
+    "Education": (2, ["course fee", "books", "udemy course"], (300, 20000)),
+    "Bills & Utilities": (10, ["electricity bill", "wifi bill", "mobile recharge", "gas cylinder"], (150, 4000)),
+    "Housing": (4, ["rent", "maintenance charges", "plumber"], (500, 30000)),
+    "Entertainment": (6, ["movie tickets", "netflix", "concert"], (150, 3000)),
+    "Gifts": (2, ["gift for mom", "birthday gift", "wedding gift"], (300, 10000)),
+    "Others": (4, ["misc", "donation", "parking"], (20, 2000)),
+    "Money Sent": (6, ["sent to rahul", "paid back priya", "i sent money to friend"], (100, 10000)),
+    "Money Received": (4, ["received from amit", "got back from neha"], (100, 10000)),
+    "Savings": (4, ["moved to savings", "fd deposit"], (1000, 50000)),
+    "Mutual Fund": (4, ["sip mutual fund", "index fund"], (500, 20000)),
+    "Stock": (2, ["bought shares", "invest in stock"], (500, 30000)),
+    "Crypto": (1, ["bitcoin", "eth purchase"], (500, 10000)),
+    "Forex": (1, ["usd purchase"], (1000, 50000)),
+    "Property": (1, ["land advance", "property tax"], (5000, 200000)),
+}
+
+ADD_LINES = [
+    "tea {n}", "lunch {n}", "petrol {n}", "wifi bill {n}", "bus ticket {n}", "salary credited {n}",
+    "invest {n} in stock", "i sent {n} to friend", "coffee {n}", "electricity bill {n}", "dinner {n}",
+]
+SEARCHES = ["petrol", "bill", "coffee", "rent >5000", "salary", "uber"]
+
+# name -> relative weight in the request mix
+SCENARIOS = {
+    "index": 20,
+    "add": 10,
+    "data": 15,
+    "data_search": 10,
+    "analytics": 10,
+    "edit": 5,
+    "backup_download": 1,
+    "backup_upload": 1,
+    "backup_export": 1,
+}
+
+
+# -------------------- Seeding --------------------
+def _subcategory_choices():
+    choices = []
+    for category, subcategories in CATEGORIES.items():
+        total = sum(SUBCATEGORY_PROFILES[sub][0] for sub in subcategories)
+        for sub in subcategories:
+            choices.append((category, sub, CATEGORY_WEIGHTS[category] * SUBCATEGORY_PROFILES[sub][0] / total))
+    return choices
+
+
+def make_transactions(rng, count, years):
+    """``count`` realistic (category, sub_category, description, amount, date_time) rows."""
+    choices = _subcategory_choices()
+    picks = rng.choices(choices, weights=[weight for _, _, weight in choices], k=count)
+    now = datetime.now().astimezone()
+    span = years * 365 * 24 * 3600
+    rows = []
+    for category, sub, _ in picks:
+        _, descriptions, (low, high) = SUBCATEGORY_PROFILES[sub]
+        amount = round(rng.uniform(low, high))
+        rows.append((
+            category, sub, f"{rng.choice(descriptions)} {amount}", amount,
+            (now - timedelta(seconds=rng.uniform(0, span))).isoformat(),
+        ))
+    return rows
+
+
+def seed(rng, users, transactions, years):
+    """Create ``users`` users with ``transactions`` rows each; returns ``[(user_id, username)]``."""
+    init_db()  # a fresh database (e.g. a new SQLite file) has no schema yet
+    password = generate_password_hash(PASSWORD)
+    created = []
+    with get_db() as conn, conn.cursor() as cur:
+        for _ in range(users):
+            username = f"load-{uuid.uuid4().hex[:10]}"
+            cur.execute("INSERT INTO users (username, password) VALUES (%s, %s) RETURNING id", (username, password))
+            user_id = cur.fetchone()[0]
+            buf = io.StringIO()
+            csv.writer(buf).writerows(row + (user_id,) for row in make_transactions(rng, transactions, years))
+            buf.seek(0)
+            cur.copy_expert("""
+                COPY transactions (category, sub_category, description, amount, date_time, user_id)
+                FROM STDIN WITH (FORMAT csv)
+            """, buf)
+            rebuild_rollups(cur, user_id)
+            conn.commit()
+            created.append((user_id, username))
+        cur.execute("ANALYZE transactions")
+        conn.commit()
+    return created
+
+
+def transaction_ids(user_id, limit=500):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, category, sub_category, description, amount FROM transactions
+            WHERE user_id = %s ORDER BY date_time DESC LIMIT %s
+        """, (user_id, limit))
+        return cur.fetchall()
+
+
+def cleanup(user_ids):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM transactions WHERE user_id = ANY(%s)", (user_ids,))
+        cur.execute("DELETE FROM users WHERE id = ANY(%s)", (user_ids,))
+        conn.commit()
+
+
+# -------------------- Server --------------------
+def serve(port):
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def start_server(port):
+    process = multiprocessing.get_context("spawn").Process(target=serve, args=(port,), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/login")
+            conn.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+# -------------------- Clients --------------------
+class Client:
+    """One keep-alive HTTP connection with its own session cookie."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        connection = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.conn = connection(parts.hostname, parts.port, timeout=120)
+        self.prefix = parts.path.rstrip("/")
+        self.cookie = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        try:
+            self.conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Server closed the keep-alive connection: reconnect once
+            self.conn.close()
+            self.conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        data = response.read()
+        cookie = response.getheader("Set-Cookie")
+        if cookie and cookie.startswith("session="):
+            self.cookie = cookie.split(";", 1)[0]
+        return response.status, data
+
+    def form(self, path, fields):
+        return self.request("POST", path, urlencode(fields), {"Content-Type": "application/x-www-form-urlencoded"})
+
+    def upload(self, path, filename, content):
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n"
+        ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+        return self.request("POST", path, body, {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+
+def backup_csv(rng, rows=20):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["id", "category", "sub_category", "description", "amount", "date_time"])
+    for category, sub, description, amount, date_time in make_transactions(rng, rows, 1):
+        writer.writerow(["", category, sub, description, amount, date_time])
+    return buf.getvalue().encode()
+
+
+def run_scenario(name, client, rng, txns):
+    """Issue one request of scenario ``name``; returns the HTTP status."""
+    if name == "index":
+        return client.request("GET", "/")[0]
+    if name == "add":
+        return client.form("/add", {"text": rng.choice(ADD_LINES).format(n=rng.randint(10, 5000))})[0]
+    if name == "data":
+        return client.request("GET", "/data/all")[0]
+    if name == "data_search":
+        return client.request("GET", "/data/all?" + urlencode({"search": rng.choice(SEARCHES)}))[0]
+    if name == "analytics":
+        return client.request("GET", "/analytics?range=" + rng.choice(["3m", "6m", "12m"]))[0]
+    if name == "edit":
+        txn_id, category, sub, description, amount = rng.choice(txns)
+        return client.form(f"/edit/{txn_id}", {
+            "description": description, "amount": amount, "category": category, "sub_category": sub,
+        })[0]
+    if name == "backup_download":
+        return client.request("GET", "/backup/download?format=csv")[0]
+    if name == "backup_upload":
+        return client.upload("/backup/upload?format=json", "load.csv", backup_csv(rng))[0]
+    if name == "backup_export":
+        return client.request("POST", "/backup/export?format=csv")[0]
+    raise ValueError(name)
+
+
+def client_loop(index, base_url, account, txns, count, warmup, seed_value, samples, errors):
+    rng = random.Random(seed_value * 1000 + index)
+    client = Client(base_url)
+    status, _ = client.form("/login", {"username": account[1], "password": PASSWORD})
+    if status != 302:
+        raise RuntimeError(f"login failed for {account[1]}: {status}")
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name] for name in names]
+    for i in range(warmup + count):
+        name = rng.choices(names, weights=weights)[0]
+        started = time.perf_counter()
+        status = run_scenario(name, client, rng, txns)
+        elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        samples.append((name, elapsed))
+        if status >= 400:
+            errors.append((name, status))
+
+
+# -------------------- Reporting --------------------
+METRIC_LINE = re.compile(r'^http_request_queries_(sum|count)\{endpoint="([^"]+)"\} (\S+)$')
+
+
+def scrape_queries(base_url):
+    """``{endpoint: [sum, count]}`` of statements per request from /metrics."""
+    headers = {}
+    if os.environ.get("METRICS_TOKEN"):
+        headers["Authorization"] = f"Bearer {os.environ['METRICS_TOKEN']}"
+    status, body = Client(base_url).request("GET", "/metrics", headers=headers)
+    if status != 200:
+        return {}
+    totals = {}
+    for line in body.decode().splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            totals.setdefault(match[2], [0.0, 0.0])[0 if match[1] == "sum" else 1] = float(match[3])
+    return totals
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(durations, seconds, errors):
+    values = sorted(durations)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": len(values) / seconds if seconds else None,
+        "mean_ms": sum(values) / len(values) * 1000 if values else None,
+        "p50_ms": percentile(values, 50) * 1000 if values else None,
+        "p95_ms": percentile(values, 95) * 1000 if values else None,
+        "p99_ms": percentile(values, 99) * 1000 if values else None,
+        "max_ms": values[-1] * 1000 if values else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--transactions", type=int, default=2000, help="per user")
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000, help="total, split across clients")
+    parser.add_argument("--warmup", type=int, default=5, help="unrecorded requests per client")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--out", default="load-report.json")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded users")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"seeding {args.users} users x {args.transactions} transactions over {args.years} years...")
+    started = time.perf_counter()
+    accounts = seed(rng, args.users, args.transactions, args.years)
+    seed_seconds = time.perf_counter() - started
+
+    server = None
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        if not args.url:
+            server = start_server(args.port)
+        txns = {user_id: transaction_ids(user_id) for user_id, _ in accounts}
+        before = scrape_queries(base_url)
+
+        samples, errors, threads = [], [], []
+        per_client = args.requests // args.clients
+        for i in range(args.clients):
+            account = accounts[i % len(accounts)]
+            threads.append(threading.Thread(target=client_loop, args=(
+                i, base_url, account, txns[account[0]], per_client, args.warmup, args.seed, samples, errors,
+            )))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+
+        after = scrape_queries(base_url)
+    finally:
+        if server is not None:
+            server.terminate()
+        if not args.keep:
+            cleanup([user_id for user_id, _ in accounts])
+
+    by_scenario = {}
+    for name, elapsed in samples:
+        by_scenario.setdefault(name, []).append(elapsed)
+    error_counts = {}
+    for name, _ in errors:
+        error_counts[name] = error_counts.get(name, 0) + 1
+
+    queries = {}
+    for endpoint, (total, count) in after.items():
+        old_total, old_count = before.get(endpoint, (0.0, 0.0))
+        if count > old_count:
+            queries[endpoint] = round((total - old_total) / (count - old_count), 2)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().astimezone().isoformat(),
+            "python": platform.python_version(),
+            "target": args.url or "local threaded werkzeug server",
+            "seed_seconds": round(seed_seconds, 2),
+            "args": vars(args),
+        },
+        "total": summarize([elapsed for _, elapsed in samples], seconds, len(errors)),
+        "scenarios": {
+            name: summarize(by_scenario[name], seconds, error_counts.get(name, 0)) for name in sorted(by_scenario)
+        },
+        "queries_per_request": queries,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'scenario':<18}{'reqs':>7}{'err':>5}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, stats in list(report["scenarios"].items()) + [("total", report["total"])]:
+        print(
+            f"{name:<18}{stats['requests']:>7}{stats['errors']:>5}{stats['throughput_rps']:>8.1f}"
+            f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+        )
+    print("statements per request:", json.dumps(queries))
+    print(f"report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/models.py
+"""Parity, load time and inference speed of the model artifacts against the pickles.
+
+For both models (the transaction classifier and the amount token classifier),
+checks that ``services.model_artifact`` gives exactly the scikit-learn
+decision scores (bit for bit) and labels on a test corpus: the labelled amount
+corpus, the load test's descriptions with amounts and case/spacing variants,
+and their tokens. Then times, each in a fresh interpreter, loading the pickle
+(joblib, including importing scikit-learn) against opening the artifact, and the
+per-call latency of predicting one text and a batch. Exits non-zero on any
+mismatch.
+
+    python -m benchmarks.models --repeat 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from benchmarks.amounts import CORPUS, load_corpus
+from benchmarks.load import ADD_LINES, SUBCATEGORY_PROFILES
+from services import model_artifact
+from services.model_registry import MODEL_ARTIFACT, MODEL_PATH
+from services.utils import AMOUNT_MODEL_ARTIFACT, AMOUNT_MODEL_PATH
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOAD_PICKLE = "import joblib; joblib.load({path!r})"
+LOAD_ARTIFACT = "from services import model_artifact; model_artifact.load({path!r})"
+# Peak RSS from VmHWM: ru_maxrss would include the (large) parent's, inherited over fork
+TIMED = """
+import json, time
+started = time.perf_counter()
+{code}
+seconds = time.perf_counter() - started
+peak = next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmHWM:"))
+print(json.dumps([seconds, peak]))
+"""
+
+
+def corpus():
+    texts = [text for text, _ in load_corpus(CORPUS)]
+    for _, descriptions, (low, high) in SUBCATEGORY_PROFILES.values():
+        for description in descriptions:
+            texts += [description, f"{description} {low}", f"{description.upper()}  paid\t{high} rs"]
+    texts += [line.format(n=n) for line in ADD_LINES for n in (5, 250, 12000)]
+    texts += ["", "   ", "zz", "Ünïcödé café 12", "₹1,50,000 for rent"]
+    tokens = sorted({token.lower() for text in texts for token in text.split()})
+    return texts, tokens
+
+
+def sklearn_scores(pickled, texts):
+    vectorizer, clf, extra = pickled
+    scores = clf.decision_function(vectorizer.transform(texts))
+    labels = clf.predict(vectorizer.transform(texts))
+    if hasattr(extra, "inverse_transform"):
+        labels = extra.inverse_transform(labels)
+    return scores.reshape(len(texts), -1), [str(label) for label in labels]
+
+
+def parity(name, pickle_path, artifact_path, texts):
+    pickled = joblib.load(pickle_path)
+    model = model_artifact.load(artifact_path)
+    expected_scores, expected_labels = sklearn_scores(pickled, texts)
+    scores, labels = model.decision_function(texts), model.predict(texts)
+    mismatched = [text for text, a, b in zip(texts, expected_labels, labels) if a != b]
+    result = {
+        "texts": len(texts),
+        "scores_identical": bool(np.array_equal(expected_scores, scores)),
+        "max_score_diff": float(np.abs(expected_scores - scores).max()) if len(texts) else 0.0,
+        "label_mismatches": len(mismatched),
+    }
+    print(
+        f"{name:<9} {len(texts):>5} texts  scores identical: {result['scores_identical']}"
+        f"  label mismatches: {len(mismatched)}"
+    )
+    for text in mismatched[:10]:
+        print(f"  mismatch: {text!r}")
+    return result, pickled, model
+
+
+def cold_load(code, repeat):
+    """Median seconds and peak RSS (MB) of running ``code`` in a fresh interpreter (Linux)."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", TIMED.format(code=code)], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    runs.sort()
+    return runs[len(runs) // 2][0], max(rss for _, rss in runs) / 1024
+
+
+def per_call(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="calls per latency measurement")
+    parser.add_argument("--loads", type=int, default=5, help="fresh interpreters per load-time measurement")
+    args = parser.parse_args()
+
+    texts, tokens = corpus()
+    models = {
+        "category": (MODEL_PATH, MODEL_ARTIFACT, texts),
+        "amount": (AMOUNT_MODEL_PATH, AMOUNT_MODEL_ARTIFACT, tokens),
+    }
+    ok = True
+    for name, (pickle_path, artifact_path, inputs) in models.items():
+        result, pickled, model = parity(name, pickle_path, artifact_path, inputs)
+        ok = ok and result["scores_identical"] and not result["label_mismatches"]
+
+        vectorizer, clf, _ = pickled
+        single = inputs[len(inputs) // 2]
+        sk_one = per_call(lambda: clf.predict(vectorizer.transform([single])), args.repeat)
+        np_one = per_call(lambda: model.predict([single]), args.repeat)
+        batch_repeat = max(args.repeat // 20, 1)
+        sk_batch = per_call(lambda: clf.predict(vectorizer.transform(inputs)), batch_repeat) / len(inputs)
+        np_batch = per_call(lambda: model.predict(inputs), batch_repeat) / len(inputs)
+        print(f"  predict 1 text:   sklearn {sk_one * 1e6:8.1f} us   artifact {np_one * 1e6:8.1f} us")
+        print(f"  batch, per text:  sklearn {sk_batch * 1e6:8.1f} us   artifact {np_batch * 1e6:8.1f} us")
+
+        pickle_s, pickle_mb = cold_load(LOAD_PICKLE.format(path=pickle_path), args.loads)
+        artifact_s, artifact_mb = cold_load(LOAD_ARTIFACT.format(path=artifact_path), args.loads)
+        print(f"  cold load:        pickle  {pickle_s * 1e3:8.1f} ms ({pickle_mb:.0f} MB)"
+              f"   artifact {artifact_s * 1e3:8.1f} ms ({artifact_mb:.0f} MB)")
+
+    if not ok:
+        sys.exit("artifact predictions differ from scikit-learn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/query_plans.py
+"""Before/after query plans for the dashboard month filter.
+
+Seeds two scratch tables with the same synthetic history, one with the legacy
+TEXT ``date_time`` column filtered through ``date_time::timestamp`` and one with
+the TIMESTAMPTZ column plus the ``(user_id, date_time)`` indexes, then prints
+``EXPLAIN ANALYZE`` for the dashboard summary query on both.
+
+    DATABASE_URL=... python -m benchmarks.query_plans --rows 1000000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from services.db import get_db, CATEGORY_INDEXES
+
+SEED = """
+    INSERT INTO {table} (user_id, category, sub_category, description, amount, date_time)
+    SELECT
+        1 + (g %% %(users)s),
+        (ARRAY['Expenses','Expenses','Expenses','Income','Savings / Investments','Usne-Pasne'])[1 + g %% 6],
+        (ARRAY['Food & Drinks','Transport','Shopping','Salary','Savings','Money Sent'])[1 + g %% 6],
+        'seeded row ' || g,
+        (random() * 1000)::real,
+        ({start}::timestamptz + (g %% %(span_days)s) * interval '1 day' + (g %% 86400) * interval '1 second'){cast}
+    FROM generate_series(1, %(rows)s) AS g
+"""
+
+BEFORE = """
+    SELECT category, sub_category, SUM(amount) as total
+    FROM bench_txn_text
+    WHERE user_id = %s AND date_time::timestamp >= %s AND date_time::timestamp < %s
+    GROUP BY category, sub_category
+"""
+
+AFTER = """
+    SELECT category, sub_category, SUM(amount) as total
+    FROM bench_txn_tz
+    WHERE user_id = %s AND date_time >= %s AND date_time < %s
+    GROUP BY category, sub_category
+"""
+
+
+def explain(cur, query, params):
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+    plan = [row[0] for row in cur.fetchall()]
+    started = time.perf_counter()
+    cur.execute(query, params)
+    cur.fetchall()
+    return plan, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    params = {"rows": args.rows, "users": args.users, "span_days": args.years * 365}
+    start = f"'{datetime.now().year - args.years + 1}-01-01'"
+    month_start, month_end = datetime(datetime.now().year, 1, 1), datetime(datetime.now().year, 2, 1)
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE bench_txn_text (
+                id SERIAL PRIMARY KEY, user_id INTEGER, category TEXT, sub_category TEXT,
+                description TEXT, amount REAL, date_time TEXT
+            )
+        """)
+        cur.execute("CREATE TEMP TABLE bench_txn_tz (LIKE bench_txn_text INCLUDING ALL)")
+        cur.execute("ALTER TABLE bench_txn_tz ALTER COLUMN date_time TYPE TIMESTAMPTZ USING date_time::timestamptz")
+
+        started = time.perf_counter()
+        cur.execute(SEED.format(table="bench_txn_text", start=start, cast="::text"), params)
+        cur.execute(SEED.format(table="bench_txn_tz", start=start, cast=""), params)
+        cur.execute("CREATE INDEX ON bench_txn_tz (user_id, date_time)")
+        for category in CATEGORY_INDEXES.values():
+            cur.execute(
+                "CREATE INDEX ON bench_txn_tz (user_id, date_time) INCLUDE (sub_category, amount) WHERE category = %s",
+                (category,),
+            )
+        cur.execute("ANALYZE bench_txn_text")
+        cur.execute("ANALYZE bench_txn_tz")
+        print(f"Seeded {args.rows} rows x2 in {time.perf_counter() - started:.1f}s\n")
+
+        for label, query in (("BEFORE (TEXT + ::timestamp cast)", BEFORE), ("AFTER (TIMESTAMPTZ + index)", AFTER)):
+            plan, elapsed = explain(cur, query, (1, month_start, month_end))
+            print(f"=== {label}: {elapsed:.2f} ms")
+            print("\n".join(plan))
+            print()
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
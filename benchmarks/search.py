@@ -0,0 +1,118 @@
+# benchmarks/search.py
+"""Latency of the transaction search: leading-wildcard ILIKE versus the indexed engine.
+
+Seeds N transactions spread over three years across throwaway users, then times
+each query both ways for one of them (first page of 50 rows, the selected month
+unless the query has a date operator) and removes the users afterwards.
+"passport" is a rare word, the others match about one row in twenty.
+
+    DATABASE_URL=... python -m benchmarks.search --rows 1000000 --users 100
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+
+from services.data_service import DataService
+from services.db import get_db
+from services.search_service import SearchQuery
+
+DESCRIPTIONS = [
+    "tea", "coffee with friends", "lunch at office", "dinner", "petrol", "bus ticket", "uber to airport",
+    "electricity bill", "wifi bill", "mobile recharge", "rent", "groceries", "medicine", "movie tickets",
+    "gift for mom", "salary credited", "sip mutual fund", "bitcoin", "sent to rahul", "gym membership",
+]
+
+QUERIES = [
+    "petrol", "wifi bill", "petrol >500", "groc", "passport", "petrl",
+    "lunch 2025-03", "passport 2023-01..2026-12", "dinner 2023-01..2026-12",
+]
+
+
+def seed(rows, users):
+    with get_db() as conn, conn.cursor() as cur:
+        user_ids = []
+        for _ in range(users):
+            cur.execute(
+                "INSERT INTO users (username, password) VALUES (%s, '-') RETURNING id",
+                (f"bench-{uuid.uuid4().hex[:8]}",),
+            )
+            user_ids.append(cur.fetchone()[0])
+        cur.execute("""
+            INSERT INTO transactions (user_id, category, sub_category, description, amount, date_time)
+            SELECT (%s::int[])[1 + g %% %s], 'Expenses', 'Others',
+                   CASE WHEN g %% 4999 = 0 THEN 'passport renewal' ELSE (%s::text[])[1 + g / %s %% %s] END
+                       || ' ' || (g %% 997),
+                   (g %% 997)::real,
+                   now() - (g / %s %% (3 * 365 * 24)) * interval '1 hour'
+            FROM generate_series(1, %s) AS g
+        """, (user_ids, users, DESCRIPTIONS, users, len(DESCRIPTIONS), users, rows))
+        cur.execute("ANALYZE transactions")
+        conn.commit()
+    return user_ids
+
+
+def cleanup(user_ids):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM transactions WHERE user_id = ANY(%s)", (user_ids,))
+        cur.execute("DELETE FROM users WHERE id = ANY(%s)", (user_ids,))
+        conn.commit()
+
+
+def ilike_search(user_id, text, start, end):
+    """The previous query: every word as a leading-wildcard ILIKE, newest first."""
+    query = SearchQuery(text)
+    where, params = "user_id = %s AND date_time >= %s AND date_time < %s", [user_id, start, end]
+    filters, filter_params = query.filters()
+    if filters:
+        where += " AND " + filters
+        params += filter_params
+    for word in query.words:
+        where += " AND (description ILIKE %s OR category ILIKE %s OR sub_category ILIKE %s)"
+        params += [f"%{word}%"] * 3
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT id FROM transactions WHERE {where} ORDER BY date_time DESC LIMIT 50", params)
+        return cur.fetchall()
+
+
+def timed(fn, repeat):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    service = DataService()
+    now = datetime.now()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_end = month_start + relativedelta(months=1)
+
+    print(f"seeding {args.rows} rows for {args.users} users...")
+    user_ids = seed(args.rows, args.users)
+    user_id = user_ids[0]
+    try:
+        print(f"{'query':<30}{'ILIKE ms':>10}{'engine ms':>11}{'rows':>6}")
+        for text in QUERIES:
+            query = SearchQuery(text)
+            start, end = (query.start, query.end) if query.has_dates else (month_start, month_end)
+            old_ms, _ = timed(lambda: ilike_search(user_id, text, start, end), args.repeat)
+            new_ms, page = timed(
+                lambda: service.fetch_transactions("all", month_start, month_end, text, user_id, page_size=50),
+                args.repeat,
+            )
+            print(f"{text:<30}{old_ms:>10.2f}{new_ms:>11.2f}{len(page['transactions']):>6}")
+    finally:
+        cleanup(user_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# benchmarks/startup.py
+"""Startup time and memory per gunicorn worker, with a JSON report for comparing commits.
+
+First audits ``import app`` in a fresh interpreter: wall time, RSS, the slowest
+top-level packages (from ``python -X importtime``) and the cost of then loading
+the models. Then starts gunicorn with ``gunicorn.conf.py`` once per mode:
+
+    preload     app and models loaded once in the master, shared copy-on-write
+    per-worker  every worker imports the app and loads the models itself
+    lazy        every worker imports the app; models load on first use
+
+and reports the time until every worker is serving, plus RSS, PSS (shared pages
+split between the processes sharing them) and USS (private pages) of the master
+and each worker after ``--requests`` warm-up requests. Linux only (reads
+/proc/<pid>/smaps_rollup).
+
+    DATABASE_URL=... python -m benchmarks.startup --workers 4 --out startup-$(git rev-parse --short HEAD).json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = os.path.join(ROOT, "gunicorn.conf.py")
+
+MODES = {
+    "preload": {"GUNICORN_PRELOAD": "1", "MODEL_PRELOAD": "1"},
+    "per-worker": {"GUNICORN_PRELOAD": "0", "MODEL_PRELOAD": "1"},
+    "lazy": {"GUNICORN_PRELOAD": "0", "MODEL_PRELOAD": "0"},
+}
+
+# Runs in a fresh interpreter: import the app, then load the models
+AUDIT_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+rss_import = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = [m for m in ("numpy", "scipy", "pandas", "sklearn", "joblib", "openpyxl") if m in sys.modules]
+from services.utils import preload_models
+preload_models()
+print(json.dumps({
+    "import_seconds": round(imported - started, 3),
+    "import_rss_mb": round(rss_import / 1024, 1),
+    "heavy_modules_after_import": heavy,
+    "model_load_seconds": round(time.perf_counter() - imported, 3),
+    "rss_with_models_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+}))
+"""
+
+# Wraps the repo's gunicorn.conf.py so each worker reports when it is serving
+WRAPPER = """
+import os
+exec(compile(open({config!r}).read(), {config!r}, "exec"))
+_post_worker_init = post_worker_init
+
+
+def post_worker_init(worker):
+    _post_worker_init(worker)
+    open(os.path.join({ready!r}, str(os.getpid())), "w").close()
+"""
+
+
+def child_env(**extra):
+    env = dict(os.environ, DB_INIT_ON_START="0", LOG_LEVEL="WARNING", **extra)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+# -------------------- Import audit --------------------
+def import_audit(top):
+    result = subprocess.run(
+        [sys.executable, "-c", AUDIT_SCRIPT], cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    audit = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # importtime lines: "import time: self [us] | cumulative | <indent>package"
+    timing = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    packages = {}
+    for line in timing.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    audit["slowest_packages_ms"] = {name: round(us / 1000, 1) for name, us in slowest}
+    return audit
+
+
+# -------------------- Gunicorn --------------------
+def memory(pid):
+    """RSS, PSS and USS of a process in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "uss_mb": round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1),
+    }
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def run_mode(name, env_overrides, workers, port, requests, timeout):
+    with tempfile.TemporaryDirectory() as ready:
+        config = os.path.join(ready, "gunicorn.conf.py")
+        with open(config, "w") as f:
+            f.write(WRAPPER.format(config=CONFIG, ready=ready))
+        env = child_env(**env_overrides, WEB_CONCURRENCY=str(workers))
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", config, "-b", f"127.0.0.1:{port}", "app:app"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            pids = []
+            while len(pids) < workers:
+                if server.poll() is not None:
+                    raise RuntimeError(f"gunicorn exited ({name}): {server.stderr.read()[-2000:]}")
+                if time.perf_counter() - started > timeout:
+                    raise RuntimeError(f"{name}: workers not ready after {timeout}s")
+                time.sleep(0.02)
+                pids = [entry for entry in os.listdir(ready) if entry.isdigit()]
+            ready_seconds = time.perf_counter() - started
+            for _ in range(requests):
+                get(port, "/login")
+            processes = [memory(pid) for pid in pids]
+            master = memory(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return {
+        "ready_seconds": round(ready_seconds, 2),
+        "master": master,
+        "workers": processes,
+        "worker_avg": {key: round(sum(p[key] for p in processes) / len(processes), 1) for key in master},
+        "total_pss_mb": round(master["pss_mb"] + sum(p["pss_mb"] for p in processes), 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset of " + ", ".join(MODES))
+    parser.add_argument("--requests", type=int, default=50, help="warm-up requests before measuring memory")
+    parser.add_argument("--port", type=int, default=5078)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--top", type=int, default=8, help="slowest packages listed in the import audit")
+    parser.add_argument("--out", default="startup-report.json")
+    args = parser.parse_args()
+
+    audit = import_audit(args.top)
+    print(
+        f"import app: {audit['import_seconds']:.2f}s, {audit['import_rss_mb']:.0f} MB RSS; "
+        f"models: +{audit['model_load_seconds']:.2f}s, {audit['rss_with_models_mb']:.0f} MB RSS"
+    )
+    print("heavy modules after import:", ", ".join(audit["heavy_modules_after_import"]) or "none")
+    print("slowest packages (ms):", json.dumps(audit["slowest_packages_ms"]))
+
+    modes = {}
+    for name in args.modes.split(","):
+        modes[name] = run_mode(name, MODES[name], args.workers, args.port, args.requests, args.timeout)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().astimezone().isoformat(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "import": audit,
+        "modes": modes,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'mode':<12}{'ready s':>9}{'master MB':>11}{'worker RSS':>12}{'worker PSS':>12}{'worker USS':>12}{'total PSS':>11}")
+    for name, stats in modes.items():
+        avg = stats["worker_avg"]
+        print(
+            f"{name:<12}{stats['ready_seconds']:>9.2f}{stats['master']['rss_mb']:>11.1f}"
+            f"{avg['rss_mb']:>12.1f}{avg['pss_mb']:>12.1f}{avg['uss_mb']:>12.1f}{stats['total_pss_mb']:>11.1f}"
+        )
+    print(f"report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
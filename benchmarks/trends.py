@@ -0,0 +1,82 @@
+# benchmarks/trends.py
+"""Time of the analytics trend engine over a synthetic history.
+
+Generates ``--years`` of per-day label totals (a few labels a day, like the
+``DAILY_LABEL_TOTALS_SQL`` rows of an active user), then times building the
+``DailyTotals`` matrix and computing every metric with
+``services.analytics_engine``, against a plain-Python loop computing just the
+daily rolling averages and monthly totals from the same rows.
+
+    python -m benchmarks.trends --years 10 --repeat 50
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from services import analytics_engine
+from services.utils import CATEGORIES
+
+
+def make_rows(years, today, seed=0):
+    """``(labels, day numbers, totals)`` ordered by label, as the query returns them."""
+    rng = random.Random(seed)
+    labels = [f"{category}|{sub}" for category, subs in CATEGORIES.items() for sub in subs]
+    first = today - timedelta(days=365 * years)
+    rows = []
+    for offset in range((today - first).days + 1):
+        day = (first + timedelta(days=offset) - date(1970, 1, 1)).days
+        for label in rng.sample(labels, rng.randint(1, 6)):
+            rows.append((label, day, round(rng.uniform(10, 2000), 2)))
+    rows.sort()
+    return tuple(zip(*rows))
+
+
+def python_reference(labels, days, totals):
+    """Daily expense rolling means and monthly category totals, one row at a time."""
+    daily, monthly = defaultdict(float), defaultdict(float)
+    for label, day, total in zip(labels, days, totals):
+        category = label.partition("|")[0]
+        if category == analytics_engine.EXPENSES:
+            daily[day] += total
+        month = (date(1970, 1, 1) + timedelta(days=day)).strftime("%Y-%m")
+        monthly[month, category] += total
+    first, last = min(days), max(days)
+    series = [daily.get(day, 0.0) for day in range(first, last + 1)]
+    rolling = {
+        window: [sum(series[max(i - window + 1, 0):i + 1]) / min(i + 1, window) for i in range(len(series))]
+        for window in analytics_engine.ROLLING_WINDOWS
+    }
+    return rolling, monthly
+
+
+def timed(fn, repeat):
+    began = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - began) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    today = date.today()
+    labels, days, totals = make_rows(args.years, today)
+    build_ms, daily_totals = timed(
+        lambda: analytics_engine.DailyTotals.from_rows(days, labels, totals, today), args.repeat
+    )
+    compute_ms, _ = timed(lambda: analytics_engine.compute(daily_totals, today), args.repeat)
+    reference_ms, _ = timed(lambda: python_reference(labels, days, totals), max(args.repeat // 10, 1))
+
+    print(f"{len(labels)} label-day rows, {daily_totals.matrix.shape[0]} x {daily_totals.matrix.shape[1]} matrix")
+    print(f"{'engine build':<22}{build_ms:>10.2f} ms")
+    print(f"{'engine compute':<22}{compute_ms:>10.2f} ms")
+    print(f"{'python loop (subset)':<22}{reference_ms:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# gunicorn.conf.py -- picked up automatically by `gunicorn app:app` (see Procfile)
+"""Gunicorn settings and hooks.
+
+With ``preload_app`` (the default) the master imports the app, migrates the
+schema and loads both models once, then forks the workers. The workers share
+those pages copy-on-write instead of each unpickling its own copy, and start
+serving as soon as they are forked. ``gc.freeze()`` moves everything loaded so
+far out of the collector's reach, so garbage collection in a worker does not
+write to (and thereby un-share) the inherited objects.
+
+Set ``GUNICORN_PRELOAD=0`` to let every worker import the app itself (e.g. to
+reload code with a HUP); the schema is still migrated once, in the master.
+
+The master warns at startup when ``VAULT_MASTER_KEY`` (see README.md) is unset.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# Opt-in: more than one thread switches the workers to the gthread class
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+if "GUNICORN_TIMEOUT" in os.environ:
+    timeout = int(os.environ["GUNICORN_TIMEOUT"])
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+# Load the models at startup (in the master when preloading, else in each worker)
+# rather than on the first request that needs them
+MODEL_PRELOAD = os.environ.get("MODEL_PRELOAD", "1") == "1"
+
+# Workers must not each run the schema DDL on import; on_starting runs it once
+os.environ["DB_INIT_ON_START"] = "0"
+
+
+def on_starting(server):
+    from services import vault
+    from services.db import close_pool, init_db
+
+    if not vault.keys.configured:
+        server.log.warning(vault.UNCONFIGURED_MESSAGE)
+    try:
+        init_db()
+    except Exception as ex:
+        server.log.error("Database initialization failed: %s", ex)
+    # Connections opened by the master must not be inherited by the workers
+    close_pool()
+    if server.cfg.preload_app and MODEL_PRELOAD:
+        from services.utils import preload_models
+
+        preload_models()
+    if server.cfg.preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app and MODEL_PRELOAD:
+        from services.utils import preload_models
+
+        preload_models()
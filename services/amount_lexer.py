@@ -0,0 +1,71 @@
+# services/amount_lexer.py
+"""First stage of amount extraction: a compiled lexer over whitespace tokens.
+
+Tokens without a digit are dropped (currency and multiplier words are kept
+only as context for their neighbours). Numbers carrying a currency marker
+(₹500, Rs 200, 1200rs, 800/-) or a multiplier (5k, 1.5 lakh, 2 crore) are
+amounts outright. Everything else that contains a digit ("15", "2026", "3x")
+is ambiguous and left to the token classifier.
+"""
+import re
+
+MULTIPLIERS = {
+    "k": 1_000, "thousand": 1_000,
+    "lakh": 100_000, "lakhs": 100_000, "lac": 100_000, "lacs": 100_000,
+    "cr": 10_000_000, "crore": 10_000_000, "crores": 10_000_000,
+}
+CURRENCY_WORDS = frozenset({"₹", "rs", "rs.", "inr", "rupee", "rupees"})
+
+NUMBER_TOKEN = re.compile(
+    r"""^(?P<prefix>₹|rs\.?|inr)?
+        (?P<number>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)
+        (?P<suffix>k|thousand|lakhs?|lacs?|cr|crores?|rs\.?|rupees?|inr|₹|/-)?
+        [.,!?;:)]*$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+HAS_DIGIT = re.compile(r"\d")
+
+
+def lex_amounts(text):
+    """Split ``text`` into ``(amounts, ambiguous_tokens)``.
+
+    ``amounts`` are values the lexer is sure about; ``ambiguous_tokens`` are the
+    original whitespace tokens that still need the classifier.
+    """
+    tokens = text.split()
+    lowered = [token.lower() for token in tokens]
+    amounts, ambiguous = [], []
+    for i, token in enumerate(tokens):
+        if not HAS_DIGIT.search(token):
+            continue
+        match = NUMBER_TOKEN.match(token)
+        if match is None:
+            ambiguous.append(token)
+            continue
+
+        value = float(match["number"].replace(",", ""))
+        prefix, suffix = match["prefix"], (match["suffix"] or "").lower()
+        following = lowered[i + 1] if i + 1 < len(lowered) else ""
+        preceding = lowered[i - 1] if i else ""
+
+        if suffix in MULTIPLIERS:
+            amounts.append(value * MULTIPLIERS[suffix])
+        elif following in MULTIPLIERS:
+            amounts.append(value * MULTIPLIERS[following])
+        elif prefix or suffix or preceding in CURRENCY_WORDS or following in CURRENCY_WORDS:
+            amounts.append(value)
+        else:
+            ambiguous.append(token)
+    return amounts, ambiguous
+
+
+def token_value(token):
+    """Numeric value of a token the classifier labelled AMOUNT, or ``None``."""
+    match = NUMBER_TOKEN.match(token)
+    if match is not None:
+        return float(match["number"].replace(",", ""))
+    digits = re.sub(r"[^\d.]", "", token)
+    try:
+        return float(digits) if digits else None
+    except ValueError:
+        return None
@@ -1,63 +1,145 @@
 # services/analytics_service.py
 
-from services.db import get_db
-from services.utils import rows_to_dict
-from datetime import datetime
+from services.db import dialect, get_db
+from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from flask import session
+from services.cache import result_cache
+
+# Preset ranges for the analytics page, in months including the current one
+RANGES = {"3m": 3, "6m": 6, "12m": 12}
+
+DAY = dialect.day("date_time")
+# The day of rows inside the daily window, NULL for the rest of the history
+WINDOW_DAY = f"CASE WHEN date_time >= %(daily_start)s AND date_time < %(daily_end)s THEN {DAY} END"
+MONTH = dialect.month_label("date_time")
+
+# Per-day totals of every (category, sub_category) label, ordered by label (see
+# services.analytics_engine.DailyTotals)
+DAILY_LABEL_TOTALS_SQL = f"""
+    SELECT COALESCE(category, '') || '|' || COALESCE(sub_category, '') AS label,
+           {dialect.day_number("date_time")} AS day,
+           SUM(CAST(amount AS DOUBLE PRECISION)) AS total
+    FROM transactions
+    WHERE user_id = %s AND date_time IS NOT NULL
+    GROUP BY 1, 2
+    ORDER BY 1
+"""
+
+# The four series of a day or month group
+SERIES_COLUMNS = """
+    SUM(amount) FILTER (
+        WHERE category = 'Expenses'
+          AND date_time >= %(daily_start)s AND date_time < %(daily_end)s
+    ) AS expenses,
+    SUM(amount) FILTER (WHERE category = 'Income') AS income,
+    SUM(amount) FILTER (WHERE category = 'Savings / Investments') AS savings,
+    COUNT(*) FILTER (WHERE category = 'Usne-Pasne') AS up_count,
+    COALESCE(SUM(amount) FILTER (WHERE category = 'Usne-Pasne' AND sub_category = 'Money Sent'), 0) AS sent,
+    COALESCE(SUM(amount) FILTER (WHERE category = 'Usne-Pasne' AND sub_category = 'Money Received'), 0) AS received
+"""
+
 
 class AnalyticsService:
-    def fetch_analytics(self):
+    def resolve_range(self, range_key=None, start=None, end=None):
+        """Return ``(daily_start, daily_end, monthly_start, monthly_end)`` datetimes.
+
+        By default the daily series covers the current month and the monthly series
+        the whole history (``monthly_start`` is ``None``). A preset (``3m``/``6m``/
+        ``12m``) or a custom ``start``/``end`` date (``YYYY-MM-DD``, end inclusive)
+        applies to both series.
+        """
         now = datetime.now()
         start_of_month = datetime(now.year, now.month, 1)
         next_month = start_of_month + relativedelta(months=1)
 
-        # convert datetimes → strings (since date_time is stored as text in DB)
-        start_str = start_of_month.strftime("%Y-%m-%d %H:%M:%S")
-        next_str = next_month.strftime("%Y-%m-%d %H:%M:%S")
-
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-
-            # Expenses: sum per day
-            cur.execute("""
-                SELECT date(date_time::timestamp) as day, SUM(amount) as total
-                FROM transactions
-                WHERE user_id = %s AND category='Expenses' AND date_time::timestamp >= %s AND date_time::timestamp < %s
-                GROUP BY day ORDER BY day ASC
-            """, (session["user_id"], start_str, next_str))
-            expenses_rows = rows_to_dict(cur, cur.fetchall())
-            expenses_data = {row["day"].isoformat(): row["total"] for row in expenses_rows}
-
-            # Income: sum per month
-            cur.execute("""
-                SELECT to_char(date_time::timestamp, 'YYYY-MM') as month, SUM(amount) as total
-                FROM transactions WHERE user_id = %s AND category='Income'
-                GROUP BY month ORDER BY month ASC
-            """, (session["user_id"],))
-            income_rows = rows_to_dict(cur, cur.fetchall())
-
-            # Savings/Investments: sum per month
-            cur.execute("""
-                SELECT to_char(date_time::timestamp, 'YYYY-MM') as month, SUM(amount) as total
-                FROM transactions WHERE user_id = %s AND category='Savings / Investments'
-                GROUP BY month ORDER BY month ASC
-            """, (session["user_id"],))
-            savings_rows = rows_to_dict(cur, cur.fetchall())
-
-            # Usne-Pasne: sent vs received per month
-            cur.execute("""
-                SELECT to_char(date_time::timestamp, 'YYYY-MM') as month,
-                    SUM(CASE WHEN sub_category='Money Sent' THEN amount ELSE 0 END) as sent,
-                    SUM(CASE WHEN sub_category='Money Received' THEN amount ELSE 0 END) as received
-                FROM transactions WHERE user_id = %s AND category='Usne-Pasne'
-                GROUP BY month ORDER BY month ASC
-            """, (session["user_id"],))
-            up_rows = rows_to_dict(cur, cur.fetchall())
-
-        finally:
-            cur.close()
-            conn.close()
+        if range_key in RANGES:
+            range_start = start_of_month - relativedelta(months=RANGES[range_key] - 1)
+            return range_start, next_month, range_start, next_month
+        if range_key == "custom" and start and end:
+            try:
+                range_start = datetime.strptime(start, "%Y-%m-%d")
+                range_end = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1)
+            except ValueError:
+                # Malformed dates fall back to the default range, like an empty one
+                return start_of_month, next_month, None, None
+            if range_start < range_end:
+                return range_start, range_end, range_start, range_end
+        return start_of_month, next_month, None, None
+
+    def fetch_analytics(self, range_key=None, start=None, end=None):
+        # Relative ranges move with the calendar, so today's date is part of the key
+        params = (range_key, start, end, date.today())
+        return result_cache.get_or_load(
+            session["user_id"], "analytics", params, lambda: self.fetch_series(range_key, start, end)
+        )
+
+    def fetch_series(self, range_key=None, start=None, end=None):
+        daily_start, daily_end, monthly_start, monthly_end = self.resolve_range(range_key, start, end)
+
+        # One pass over the user's rows: GROUPING SETS yields per-day and per-month
+        # groups side by side and FILTER splits each group into the four series.
+        # Only days inside the daily window get a day group; the rest of the
+        # history falls into one NULL day group, dropped by HAVING. Engines
+        # without GROUPING SETS scan twice and UNION the two groupings.
+        range_filter = ""
+        params = {"user_id": session["user_id"], "daily_start": daily_start, "daily_end": daily_end}
+        if monthly_start is not None:
+            range_filter = "AND date_time >= %(monthly_start)s AND date_time < %(monthly_end)s"
+            params.update(monthly_start=monthly_start, monthly_end=monthly_end)
+
+        where = f"WHERE user_id = %(user_id)s {range_filter}"
+        if dialect.grouping_sets:
+            query = f"""
+                SELECT GROUPING({WINDOW_DAY}) = 1 AS is_month, {WINDOW_DAY} AS day, {MONTH} AS month,
+                       {SERIES_COLUMNS}
+                FROM transactions {where}
+                GROUP BY GROUPING SETS (({WINDOW_DAY}), ({MONTH}))
+                HAVING GROUPING({WINDOW_DAY}) = 1 OR {WINDOW_DAY} IS NOT NULL
+            """
+        else:
+            query = f"""
+                SELECT 0 AS is_month, {DAY} AS day, NULL AS month, {SERIES_COLUMNS}
+                FROM transactions {where} AND date_time >= %(daily_start)s AND date_time < %(daily_end)s
+                GROUP BY {DAY}
+                UNION ALL
+                SELECT 1, NULL, {MONTH}, {SERIES_COLUMNS}
+                FROM transactions {where} GROUP BY {MONTH}
+            """
+        with get_db(readonly=True) as conn, conn.cursor() as cur:
+            cur.execute(query + " ORDER BY is_month, day, month", params)
+            rows = cur.fetchall()
+
+        expenses_data, income_rows, savings_rows, up_rows = {}, [], [], []
+        for is_month, day, month, expenses, income, savings, up_count, sent, received in rows:
+            if not is_month:
+                if expenses is not None:
+                    expenses_data[str(day)] = expenses
+                continue
+            if income is not None:
+                income_rows.append({"month": month, "total": income})
+            if savings is not None:
+                savings_rows.append({"month": month, "total": savings})
+            if up_count:
+                up_rows.append({"month": month, "sent": sent, "received": received})
 
         return expenses_data, income_rows, savings_rows, up_rows
+
+    def fetch_trends(self, range_key=None, start=None, end=None):
+        """Rolling averages, month-over-month changes, savings rate, category share and projection."""
+        params = (range_key, start, end, date.today())
+        return result_cache.get_or_load(
+            session["user_id"], "trends", params, lambda: self.compute_trends(range_key, start, end)
+        )
+
+    def compute_trends(self, range_key=None, start=None, end=None):
+        # Deferred: NumPy is not needed until the first analytics request
+        from services import analytics_engine
+
+        with get_db(readonly=True) as conn, conn.cursor() as cur:
+            cur.execute(DAILY_LABEL_TOTALS_SQL, (session["user_id"],))
+            rows = cur.fetchall()
+        labels, days, totals = zip(*rows) if rows else ((), (), ())
+        today = date.today()
+        daily_totals = analytics_engine.DailyTotals.from_rows(days, labels, totals, today)
+        return analytics_engine.compute(daily_totals, today, *self.resolve_range(range_key, start, end))
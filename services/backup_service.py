@@ -1,35 +1,289 @@
+import csv
+import io
+import math
 import os
-import pandas as pd
-from flask import current_app
-from services.db import get_db
+import re
+import time
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from services.db import dialect, get_db
+from services.cache import bump_data_version
+from services.rollup_service import apply_rollup_deltas
+from services.xlsx_stream import stream_xlsx
+
+# Rows validated, COPY'd and merged per transaction while restoring
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+
+# Rows fetched per round-trip from the server-side cursor while exporting
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 2000))
+
+IMPORT_COLUMNS = ("id", "category", "sub_category", "description", "amount", "date_time")
+EXPORT_COLUMNS = IMPORT_COLUMNS
+
+# Start tag of a worksheet row in sheet XML
+ROW_TAG = re.compile(rb"<row[ >]")
+
+# Merge one staged chunk: insert new rows for the user, skip ids that already
+# exist, and fold the inserted rows into monthly_rollups, all in one statement.
+MERGE_SQL = """
+    WITH inserted AS (
+        INSERT INTO transactions (id, category, sub_category, description, amount, date_time, user_id)
+        SELECT COALESCE(id, nextval(pg_get_serial_sequence('transactions', 'id'))),
+               category, sub_category, description, amount, date_time, %(user_id)s
+        FROM import_staging
+        ON CONFLICT (id) DO NOTHING
+        RETURNING date_time, category, sub_category, amount
+    ), rolled AS (
+        INSERT INTO monthly_rollups (user_id, month, category, sub_category, total, count)
+        SELECT %(user_id)s, date_trunc('month', date_time)::date,
+               COALESCE(category, ''), COALESCE(sub_category, ''), SUM(amount::float8), COUNT(*)
+        FROM inserted
+        GROUP BY 2, 3, 4
+        ON CONFLICT (user_id, month, category, sub_category) DO UPDATE
+        SET total = monthly_rollups.total + EXCLUDED.total,
+            count = monthly_rollups.count + EXCLUDED.count
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM inserted
+"""
+
+# Engines without writable CTEs insert the chunk and return the inserted rows, whose
+# rollup deltas are applied from Python on the same transaction. (WHERE true keeps
+# SQLite from reading ON CONFLICT as a join constraint.)
+INSERT_STAGED_SQL = """
+    INSERT INTO transactions (id, category, sub_category, description, amount, date_time, user_id)
+    SELECT id, category, sub_category, description, amount, date_time, %(user_id)s
+    FROM import_staging WHERE true
+    ON CONFLICT (id) DO NOTHING
+    RETURNING user_id, date_time, category, sub_category, amount
+"""
+
+
+def _iter_rows(file_path):
+    """Yield one dict per data row, streaming from a CSV or a read-only workbook."""
+    if file_path.lower().endswith(".csv"):
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [str(h or "").strip().lower() for h in next(reader, [])]
+            for values in reader:
+                yield dict(zip(header, values))
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h or "").strip().lower() for h in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _coerce(row):
+    """Return a staging tuple for a backup row, or ``None`` if it must be rejected."""
+    try:
+        raw_id = row.get("id")
+        txn_id = None if _blank(raw_id) else int(float(raw_id))
+
+        amount = float(row.get("amount"))
+        if not math.isfinite(amount):
+            return None
+
+        date_time = row.get("date_time")
+        if isinstance(date_time, str):
+            date_time = datetime.fromisoformat(date_time.strip())
+        elif isinstance(date_time, datetime) and date_time.tzinfo is None:
+            # Workbook cells carry no offset; exported workbooks hold UTC
+            date_time = date_time.replace(tzinfo=timezone.utc)
+        if not isinstance(date_time, datetime):
+            return None
+    except (TypeError, ValueError):
+        return None
+
+    text = lambda key: None if _blank(row.get(key)) else str(row.get(key))
+    return (txn_id, text("category"), text("sub_category"), text("description"), amount, date_time.isoformat())
+
+
+def count_rows(file_path):
+    """Cheap estimate of the data rows in a backup file, or ``None`` if unknown."""
+    if file_path.lower().endswith(".csv"):
+        with open(file_path, "rb") as f:
+            lines = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+        return max(lines - 1, 0)
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        # Taken from the sheet's stored dimension, so nothing is parsed
+        max_row = workbook.active.max_row
+    finally:
+        workbook.close()
+    if max_row:
+        return max_row - 1
+
+    # No stored dimension (streamed workbooks): count <row> tags in the first sheet
+    with zipfile.ZipFile(file_path) as archive:
+        sheets = sorted(name for name in archive.namelist() if name.startswith("xl/worksheets/sheet"))
+        if not sheets:
+            return None
+        with archive.open(sheets[0]) as sheet:
+            rows, tail = 0, b""
+            for chunk in iter(lambda: sheet.read(1 << 20), b""):
+                # Keep 4 bytes back: too short to hold a whole match, enough to finish one
+                data = tail + chunk
+                rows += len(ROW_TAG.findall(data))
+                tail = data[-4:]
+    return max(rows - 1, 0)
+
 
 class BackupService:
-    def export_xlsx(self):
-        conn = get_db()
-        try:
-            df = pd.read_sql_query("SELECT * FROM transactions", conn)
-        finally:
-            conn.close()
-        file_path = os.path.join(current_app.config["UPLOAD_FOLDER"], "backup.xlsx")
-        df.to_excel(file_path, index=False)
-        return file_path
-
-    def import_xlsx(self, file_path):
-        df = pd.read_excel(file_path)
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-            for _, row in df.iterrows():
-                cur.execute("""
-                    INSERT INTO transactions (id, category, sub_category, description, amount, date_time)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (id) DO NOTHING
-                """, (
-                    int(row.get("id")) if row.get("id") else None, row.get("category"),
-                    row.get("sub_category"), row.get("description"),
-                    row.get("amount"), row.get("date_time")
-                ))
+    def count_transactions(self, user_id):
+        with get_db(readonly=True) as conn, conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM transactions WHERE user_id = %s", (user_id,))
+            return cur.fetchone()[0]
+
+    def iter_transactions(self, user_id, batch_size=EXPORT_BATCH_SIZE, progress=None):
+        """Yield a user's transactions through a server-side cursor, ``batch_size`` rows per fetch.
+
+        ``progress(rows_so_far)`` is called after every ``batch_size`` rows and at the end.
+        """
+        with get_db(readonly=True) as conn:
+            with conn.cursor(name=f"export_{user_id}_{uuid.uuid4().hex}") as cur:
+                cur.itersize = batch_size
+                cur.execute(f"""
+                    SELECT {', '.join(EXPORT_COLUMNS)} FROM transactions
+                    WHERE user_id = %s ORDER BY id
+                """, (user_id,))
+                count = 0
+                for count, row in enumerate(cur, 1):
+                    yield row
+                    if progress and count % batch_size == 0:
+                        progress(count)
+                if progress:
+                    progress(count)
+            conn.commit()
+
+    def export_csv(self, user_id, progress=None):
+        """Stream a user's backup as CSV text chunks."""
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_COLUMNS)
+        for count, row in enumerate(self.iter_transactions(user_id, progress=progress), 1):
+            writer.writerow(value.isoformat() if isinstance(value, datetime) else value for value in row)
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    def export_xlsx(self, user_id, progress=None):
+        """Stream a user's backup as XLSX bytes."""
+        return stream_xlsx(EXPORT_COLUMNS, self.iter_transactions(user_id, progress=progress), sheet_name="transactions")
+
+    def import_backup(self, file_path, user_id, progress=None, chunk_size=IMPORT_CHUNK_SIZE):
+        """Restore an .xlsx or .csv backup into ``user_id``'s transactions.
+
+        Rows are streamed and handled ``chunk_size`` at a time: validated, COPY'd into
+        a temporary staging table and merged with one set-based INSERT ... ON CONFLICT
+        (ids that already exist are skipped), so memory stays bounded by the chunk
+        size. Rows without an id wait in ``import_pending`` until every explicit id
+        is in and the serial sequence is past them, so the ids they draw cannot be
+        one a later chunk brings. ``progress(report)`` is called after each
+        committed chunk. Returns a report with row counts and throughput.
+        """
+        report = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "seconds": 0.0, "rows_per_second": 0.0}
+        started = time.monotonic()
+
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS import_staging (
+                    id INTEGER, category TEXT, sub_category TEXT, description TEXT,
+                    amount REAL, date_time TIMESTAMPTZ
+                ) {"ON COMMIT DELETE ROWS" if dialect.writable_ctes else ""}
+            """)
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS import_pending (
+                    pos {"SERIAL" if dialect.name == "postgres" else "INTEGER"} PRIMARY KEY,
+                    category TEXT, sub_category TEXT, description TEXT, amount REAL, date_time TIMESTAMPTZ
+                )
+            """)
+            # Left over by an import that failed on this pooled connection
+            cur.execute("DELETE FROM import_pending")
+            pending_columns = ", ".join(IMPORT_COLUMNS[1:])
+
+            def flush(chunk):
+                buf = io.StringIO()
+                csv.writer(buf).writerows(chunk)
+                buf.seek(0)
+                cur.copy_expert(f"COPY import_staging ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+                cur.execute(f"""
+                    INSERT INTO import_pending ({pending_columns})
+                    SELECT {pending_columns} FROM import_staging WHERE id IS NULL
+                """)
+                deferred = cur.rowcount
+                if deferred:
+                    cur.execute("DELETE FROM import_staging WHERE id IS NULL")
+                merge(len(chunk) - deferred)
+
+            def merge(staged):
+                """Merge the ``staged`` rows of import_staging and commit."""
+                if dialect.writable_ctes:
+                    cur.execute(MERGE_SQL, {"user_id": user_id})
+                    inserted = cur.fetchone()[0]
+                else:
+                    cur.execute(INSERT_STAGED_SQL, {"user_id": user_id})
+                    rows = cur.fetchall()
+                    apply_rollup_deltas(cur, rows)
+                    inserted = len(rows)
+                    cur.execute("DELETE FROM import_staging")
+                if inserted:
+                    bump_data_version(cur, user_id)
+                # Explicit ids from the backup may be ahead of the serial sequence
+                dialect.sync_serial(cur, "transactions")
+                conn.commit()
+                report["inserted"] += inserted
+                report["duplicates"] += staged - inserted
+                if progress:
+                    progress(dict(report))
+
+            chunk = []
+            for row in _iter_rows(file_path):
+                if all(_blank(value) for value in row.values()):
+                    continue
+                report["rows"] += 1
+                staged = _coerce(row)
+                if staged is None:
+                    report["rejected"] += 1
+                    continue
+                chunk.append(staged)
+                if len(chunk) >= chunk_size:
+                    flush(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+
+            # Every explicit id is in: the id-less rows can draw theirs now
+            cur.execute("SELECT COALESCE(MAX(pos), 0) FROM import_pending")
+            last_pos = cur.fetchone()[0]
+            for first in range(0, last_pos, chunk_size):
+                cur.execute(f"""
+                    INSERT INTO import_staging ({pending_columns})
+                    SELECT {pending_columns} FROM import_pending WHERE pos > %s AND pos <= %s
+                """, (first, first + chunk_size))
+                merge(cur.rowcount)
+
+            cur.execute("DROP TABLE IF EXISTS import_staging")
+            cur.execute("DROP TABLE IF EXISTS import_pending")
             conn.commit()
-        finally:
-            cur.close()
-            conn.close()
+
+        report["seconds"] = time.monotonic() - started
+        report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+        return report
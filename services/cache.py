@@ -0,0 +1,190 @@
+# services/cache.py
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from flask import g, has_request_context
+from services.db import get_db, note_write
+
+CACHE_URL = os.environ.get('CACHE_URL', 'memory://')
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 300))
+
+
+class CacheBackend:
+    """Interface for result-cache storage. Values must be picklable."""
+
+    def get(self, key):
+        """Return the cached value or ``None``."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def size(self):
+        return None
+
+
+class InMemoryBackend(CacheBackend):
+    """Per-process LRU with a per-entry TTL, bounded to ``max_entries`` items."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def size(self):
+        return len(self._data)
+
+
+class RedisBackend(CacheBackend):
+    """Shared backend for any Redis-protocol server, so all workers share hits.
+
+    Eviction is left to the server (e.g. ``maxmemory-policy allkeys-lru``).
+    """
+
+    def __init__(self, url, prefix="expense:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+def forget_data_version():
+    """Drop the data version this request has read (it is about to change).
+
+    The request's later reads then go to the primary, which has the write.
+    """
+    if has_request_context():
+        g.pop("data_version", None)
+    note_write()
+
+
+def bump_data_version(cur, user_id):
+    """Mark a user's data as changed; call on the write's cursor before commit."""
+    forget_data_version()
+    cur.execute(
+        "UPDATE users SET data_version = data_version + 1, data_updated_at = now() WHERE id = %s",
+        (user_id,),
+    )
+
+
+def bump_data_versions(cur, user_ids):
+    """``bump_data_version`` for several users in one statement."""
+    forget_data_version()
+    # Sorted, so concurrent multi-user writes lock the rows in the same order
+    cur.execute(
+        "UPDATE users SET data_version = data_version + 1, data_updated_at = now() WHERE id = ANY(%s)",
+        (sorted(user_ids),),
+    )
+
+
+def fetch_data_version(user_id):
+    """Return ``(data_version, data_updated_at)`` for a user, read once per request."""
+    if has_request_context():
+        cached = g.get("data_version")
+        if cached is not None and cached[0] == user_id:
+            return cached[1]
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("SELECT data_version, data_updated_at FROM users WHERE id = %s", (user_id,))
+        row = cur.fetchone()
+    row = tuple(row) if row else (0, None)
+    if has_request_context():
+        g.data_version = (user_id, row)
+    return row
+
+
+class ResultCache:
+    """Caches per-user view results, invalidated by the user's data version.
+
+    Every write path bumps ``users.data_version`` in its own transaction, so a key
+    built from the current version can never return data older than the last
+    committed write, whichever worker served it.
+    """
+
+    def __init__(self, backend, ttl=CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _count(self, view, outcome):
+        with self._lock:
+            counters = self._counters.setdefault(view, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get_or_load(self, user_id, view, params, loader, version=None):
+        if version is None:
+            version = fetch_data_version(user_id)[0]
+        key = f"{view}:{user_id}:{version}:{params!r}"
+        value = self.backend.get(key)
+        if value is not None:
+            self._count(view, "hits")
+            return value
+        self._count(view, "misses")
+        value = loader()
+        self.backend.set(key, value, self.ttl)
+        return value
+
+    def stats(self):
+        with self._lock:
+            views = {view: dict(counters) for view, counters in self._counters.items()}
+        hits = sum(c["hits"] for c in views.values())
+        misses = sum(c["misses"] for c in views.values())
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "evictions": getattr(self.backend, "evictions", None),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "views": views,
+        }
+
+
+def _make_backend(url):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return InMemoryBackend()
+
+
+result_cache = ResultCache(_make_backend(CACHE_URL))
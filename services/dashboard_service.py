@@ -1,8 +1,9 @@
 from services.db import get_db
 from services.utils import rows_to_dict, CATEGORIES
-from datetime import datetime
+from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 from flask import session
+from services.cache import result_cache
 
 class DashboardService:
     def __init__(self, month_filter=None):
@@ -18,28 +19,23 @@ class DashboardService:
             self.next_month = datetime(self.year, self.month + 1, 1)
 
     def fetch_summary_networth(self):
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-            # ✅ Cast text to timestamp
+        with get_db(readonly=True) as conn, conn.cursor() as cur:
+            # Both figures come from the pre-aggregated monthly_rollups table
             cur.execute("""
-                SELECT category, sub_category, SUM(amount) as total
-                FROM transactions
-                WHERE user_id = %s AND date_time::timestamp >= %s AND date_time::timestamp < %s
-                GROUP BY category, sub_category
-            """, (session["user_id"], self.start_of_month, self.next_month))
+                SELECT NULLIF(category, '') as category, NULLIF(sub_category, '') as sub_category,
+                       CAST(round(CAST(total AS NUMERIC), 2) AS DOUBLE PRECISION) as total
+                FROM monthly_rollups
+                WHERE user_id = %s AND month = %s AND count > 0
+            """, (session["user_id"], self.start_of_month.date()))
             data = rows_to_dict(cur, cur.fetchall())
 
             cur.execute("""
-                SELECT SUM(amount) as networth 
-                FROM transactions
-                WHERE user_id = %s AND date_time::timestamp >= %s AND date_time::timestamp < %s
-            """, (session["user_id"], datetime(self.current_year, 1, 1), datetime(self.current_year + 1, 1, 1)))
+                SELECT CAST(round(CAST(SUM(total) AS NUMERIC), 2) AS DOUBLE PRECISION) as networth
+                FROM monthly_rollups
+                WHERE user_id = %s AND month >= %s AND month < %s
+            """, (session["user_id"], date(self.current_year, 1, 1), date(self.current_year + 1, 1, 1)))
             networth_row = cur.fetchone()
             networth = networth_row[0] or 0
-        finally:
-            cur.close()
-            conn.close()
 
         summary, totals = self.prepare_summary(data)
         return summary, totals, networth
@@ -58,7 +54,9 @@ class DashboardService:
         return summary, totals
 
     def get_context(self):
-        summary, totals, networth = self.fetch_summary_networth()
+        summary, totals, networth = result_cache.get_or_load(
+            session["user_id"], "dashboard", (self.month_filter, self.current_year), self.fetch_summary_networth
+        )
         return {
             "summary": summary,
             "totals": totals,
@@ -1,10 +1,13 @@
 from services.db import get_db
-from services.utils import rows_to_dict, CATEGORIES
+from services.utils import CATEGORIES
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
+from services.cache import result_cache
+from services.pagination import PAGE_SIZE, fetch_page
+from services.search_service import SearchQuery, set_trigram_threshold, trigram_available
 
 class DataService:
-    def fetch(self, sub_category, month_filter, search, user_id):
+    def fetch(self, sub_category, month_filter, search, user_id, cursor=None, page_size=PAGE_SIZE):
         now = datetime.now()
         months = [(now - relativedelta(months=i)).strftime("%Y-%m") for i in range(12)]
         if not month_filter or month_filter not in months:
@@ -14,32 +17,44 @@ class DataService:
         start_of_month = datetime(year, month, 1)
         next_month = datetime(year, month+1, 1) if month < 12 else datetime(year+1, 1, 1)
 
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-            if sub_category.lower() == "all":
-                query = """
-                    SELECT * FROM transactions 
-                    WHERE user_id = %s AND date_time::timestamp >= %s AND date_time::timestamp < %s
-                """
-                params = [user_id, start_of_month, next_month]
-            else:
-                query = """
-                    SELECT * FROM transactions 
-                    WHERE sub_category=%s AND user_id = %s AND date_time::timestamp >= %s AND date_time::timestamp < %s
-                """
-                params = [sub_category, user_id, start_of_month, next_month]
-
-            if search:
-                query += " AND (description ILIKE %s OR category ILIKE %s OR sub_category ILIKE %s)"
-                params.extend([f"%{search}%"] * 3)
-
-            query += " ORDER BY date_time DESC"
-            cur.execute(query, params)
-            txns = rows_to_dict(cur, cur.fetchall())
-        finally:
-            cur.close()
-            conn.close()
+        page = result_cache.get_or_load(
+            user_id, "data", (sub_category, month_filter, search, cursor, page_size),
+            lambda: self.fetch_transactions(sub_category, start_of_month, next_month, search, user_id, cursor, page_size)
+        )
 
         subcat_list = [{"category": cat, "sub_category": sub} for cat, subs in CATEGORIES.items() for sub in subs]
-        return txns, subcat_list, months, month_filter
+        return page, subcat_list, months, month_filter
+
+    def fetch_transactions(self, sub_category, start_of_month, next_month, search, user_id, cursor=None, page_size=PAGE_SIZE):
+        """One keyset page of the month's transactions, newest first.
+
+        With a search, results are ranked by relevance instead, and date
+        operators in the search (e.g. ``2026-03``) replace the selected month.
+        """
+        query = SearchQuery(search or "")
+        where = "user_id = %s"
+        params = [user_id]
+        if not query.has_dates:
+            where += " AND date_time >= %s AND date_time < %s"
+            params += [start_of_month, next_month]
+        if sub_category.lower() != "all":
+            where += " AND sub_category = %s"
+            params.append(sub_category)
+
+        filters, filter_params = query.filters()
+        if filters:
+            where += " AND " + filters
+            params += filter_params
+
+        trigram = trigram_available() if query.words else False
+        match = query.text_match(trigram)
+        rank, rank_params = None, ()
+        if match:
+            text_where, text_params, rank, rank_params = match
+            where += f" AND ({text_where})"
+            params += text_params
+
+        with get_db(readonly=True) as conn, conn.cursor() as cur:
+            if trigram:
+                set_trigram_threshold(cur)
+            return fetch_page(cur, where, params, cursor, page_size, rank, rank_params)
@@ -1,81 +1,588 @@
 # db.py
-import psycopg2
-from flask import abort
+import itertools
+import logging
 import os
+import threading
+import time
+from datetime import timedelta
+import psycopg2
+from psycopg2 import extensions, extras
+from psycopg2.extras import Json  # noqa: F401 -- re-exported; adapted by both engines
+from flask import abort, g, has_request_context, session
+from services import sqlite_engine
+from services.metrics import ACQUIRE_SECONDS, READ_TARGETS, REPLICA_LAG, observe_query
+
+logger = logging.getLogger(__name__)
 
 
 
 DATABASE_URL  = os.environ.get('DATABASE_URL')
+DB_SSLMODE = os.environ.get('DB_SSLMODE', 'require')
+# Storage engine: 'sqlite' for DATABASE_URL=sqlite:///path/to/file.db (embedded,
+# WAL mode), otherwise 'postgres'
+DB_ENGINE = 'sqlite' if (DATABASE_URL or '').startswith('sqlite:') else 'postgres'
 
-def get_db():
-    """Return a new database connection."""
-    try:
-        conn = psycopg2.connect(DATABASE_URL, sslmode="require")
+# Pool sizing / health-check knobs (per gunicorn worker process)
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', 30))
+
+# Read replicas (Postgres): comma-separated DSNs that get_db(readonly=True) reads from
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# Replicas further behind the primary than this many seconds are skipped
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+# Seconds between lag checks of a replica, and before an ejected replica is tried again
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 2))
+REPLICA_RETRY_AFTER = float(os.environ.get('REPLICA_RETRY_AFTER', 30))
+REPLICA_CONNECT_TIMEOUT = int(os.environ.get('REPLICA_CONNECT_TIMEOUT', 2))
+# A user's reads go to a replica only once it has replayed this long past their last
+# write's data_updated_at (a transaction's now() is its start, not its commit)
+READ_YOUR_WRITES_MARGIN = float(os.environ.get('READ_YOUR_WRITES_MARGIN', 1))
+
+# Rows converted per transaction while backfilling transactions.date_time
+DATE_TIME_BACKFILL_BATCH = int(os.environ.get('DATE_TIME_BACKFILL_BATCH', 5000))
+# Rows per transaction while backfilling transactions.search_vector
+SEARCH_VECTOR_BACKFILL_BATCH = int(os.environ.get('SEARCH_VECTOR_BACKFILL_BATCH', 5000))
+
+# Text search configuration of transactions.search_vector ('simple': no stemming,
+# descriptions are short and often not English)
+SEARCH_CONFIG = 'simple'
+
+# Partial (user_id, date_time) indexes, one per top-level category
+CATEGORY_INDEXES = {
+    "income": "Income",
+    "expenses": "Expenses",
+    "usne_pasne": "Usne-Pasne",
+    "savings": "Savings / Investments",
+}
+
+
+class PostgresDialect:
+    """SQL fragments that differ between the storage engines.
+
+    Service queries are written in the SQL both engines share and splice these
+    in where they need dates or an engine-only feature.
+    """
+    name = "postgres"
+    # GROUP BY GROUPING SETS, and data-modifying statements inside WITH
+    grouping_sets = True
+    writable_ctes = True
+
+    def day(self, column):
+        return f"date({column})"
+
+    def day_number(self, column):
+        """Days since 1970-01-01 of a timestamp's date, as an integer."""
+        return f"(date({column}) - DATE '1970-01-01')"
+
+    def month(self, column):
+        """First day of the month of a timestamp, as a DATE."""
+        return f"date_trunc('month', {column})::date"
+
+    def month_label(self, column):
+        """``YYYY-MM`` text of a timestamp."""
+        return f"to_char(date_trunc('month', {column}), 'YYYY-MM')"
+
+    def sync_serial(self, cur, table):
+        """Move ``table``'s id sequence past rows inserted with explicit ids."""
+        cur.execute(f"""
+            SELECT setval(pg_get_serial_sequence('{table}', 'id'),
+                          GREATEST(COALESCE((SELECT MAX(id) FROM {table}), 0), 1))
+        """)
+
+
+class SQLiteDialect(PostgresDialect):
+    name = "sqlite"
+    grouping_sets = False
+    writable_ctes = False
+
+    # Timestamps are stored in UTC; days and months are those of the local time
+    # zone, like a TIMESTAMPTZ read in the server's zone. '%%' because service
+    # queries are parameterized.
+    def day(self, column):
+        return f"date({column}, 'localtime')"
+
+    def day_number(self, column):
+        return f"CAST(julianday({column}, 'localtime', 'start of day') - 2440587.5 AS INTEGER)"
+
+    def month(self, column):
+        return f"date({column}, 'localtime', 'start of month')"
+
+    def month_label(self, column):
+        return f"strftime('%%Y-%%m', {column}, 'localtime')"
+
+    def sync_serial(self, cur, table):
+        # INTEGER PRIMARY KEY always continues after the largest id
+        pass
+
+
+dialect = SQLiteDialect() if DB_ENGINE == 'sqlite' else PostgresDialect()
+
+
+def execute_values(cur, sql, argslist, template=None, page_size=100, fetch=False):
+    """``psycopg2.extras.execute_values`` on either engine's cursor."""
+    if isinstance(cur, sqlite_engine.SQLiteCursor):
+        return sqlite_engine.execute_values(cur, sql, argslist, template, page_size, fetch)
+    return extras.execute_values(cur, sql, argslist, template, page_size, fetch)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be borrowed within the pool timeout."""
+
+
+class ConnectionPool:
+    """Small thread-safe pool of database connections (psycopg2 or SQLite).
+
+    Connections idle for longer than ``ping_after`` seconds are checked with a
+    ``SELECT 1`` when borrowed and transparently replaced if the socket went stale.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10, ping_after=30, connect=psycopg2.connect,
+                 **connect_kwargs):
+        self.dsn = dsn
+        self.connect = connect
+        self.minconn = minconn
+        self.maxconn = max(maxconn, 1)
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.connect_kwargs = connect_kwargs
+        self._idle = []  # [(conn, returned_at)]
+        self._borrowed = 0
+        self._cond = threading.Condition()
+        self._stats = {"borrows": 0, "timeouts": 0, "reconnects": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+        self.created_at = time.time()
+
+    def _connect(self):
+        return self.connect(self.dsn, **self.connect_kwargs)
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def getconn(self):
+        """Borrow a connection, waiting up to ``timeout`` seconds for a free slot."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while not self._idle and self._borrowed >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"no connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, None
+            self._borrowed += 1
+            waited = time.monotonic() - started
+            self._stats["borrows"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, time.monotonic() - returned_at):
+                self._discard(conn)
+                conn = None
+                with self._cond:
+                    self._stats["reconnects"] += 1
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._borrowed -= 1
+                self._cond.notify()
+            raise
         return conn
+
+    def putconn(self, conn, discard=False):
+        """Give a borrowed connection back, rolling back any open transaction."""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                discard = True
+        with self._cond:
+            self._borrowed -= 1
+            if discard or conn.closed or len(self._idle) >= self.maxconn:
+                keep = False
+            else:
+                keep = True
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def prefill(self):
+        """Open ``minconn`` connections up front so the first requests skip the handshake."""
+        with self._cond:
+            missing = self.minconn - len(self._idle) - self._borrowed
+        for _ in range(max(missing, 0)):
+            conn = self._connect()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "borrowed": self._borrowed,
+                "idle": len(self._idle),
+                "min": self.minconn,
+                "max": self.maxconn,
+            })
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["borrows"] if stats["borrows"] else 0.0
+        return stats
+
+
+class TimedCursor(extensions.cursor):
+    """Cursor that records every statement's latency and row count in ``services.metrics``."""
+
+    def _timed(self, method, query, *args):
+        started = time.perf_counter()
+        try:
+            result = method(query, *args)
+        except Exception:
+            observe_query(query, time.perf_counter() - started, failed=True)
+            raise
+        observe_query(query, time.perf_counter() - started, self.rowcount)
+        return result
+
+    def execute(self, query, vars=None):
+        return self._timed(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(super().executemany, query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(super().copy_expert, sql, file, size)
+
+
+class PooledConnection:
+    """Proxy around a borrowed connection; ``close()`` hands it back to the pool.
+
+    Use it as a context manager (``with get_db() as conn:``) so the connection is
+    always returned, with any uncommitted work rolled back.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        self._pool.putconn(conn)
+
+
+# Replayed-through time of a replica: everything committed on the primary before it
+# is visible there. Caught up (everything received is replayed) means now().
+REPLICA_LAG_SQL = """
+    SELECT CASE
+               WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN now()
+               ELSE pg_last_xact_replay_timestamp()
+           END,
+           now()
+"""
+
+
+class Replica:
+    """A read replica's pool plus its health and replication lag.
+
+    The lag is measured on a borrowed connection at most every
+    ``REPLICA_CHECK_INTERVAL`` seconds. A replica that cannot be reached, fails
+    the check or loses a connection is ejected for ``REPLICA_RETRY_AFTER`` seconds.
+    """
+
+    def __init__(self, dsn, pool, name):
+        params = extensions.parse_dsn(dsn)
+        # Host, port and database only (the DSN may carry a password), for the logs
+        self.address = f"{params.get('host', 'localhost')}:{params.get('port', 5432)}/{params.get('dbname', '')}"
+        # What stats and metrics report, so they do not reveal the database's address
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self.replayed_through = None
+        self.checked_at = float("-inf")
+        self.ejected_until = 0.0
+        self._stats = {"reads": 0, "ejections": 0, "skipped_stale": 0}
+
+    def eject(self, reason):
+        self.ejected_until = time.monotonic() + REPLICA_RETRY_AFTER
+        self.checked_at = float("-inf")
+        self._stats["ejections"] += 1
+        logger.warning("Replica %s (%s) ejected for %ss: %s", self.name, self.address, REPLICA_RETRY_AFTER, reason)
+
+    def fresh_for(self, floor):
+        """Whether the last check found this replica usable for reads that must see ``floor``."""
+        if self.lag is None or self.lag > REPLICA_MAX_LAG:
+            return False
+        return floor is None or self.replayed_through >= floor + timedelta(seconds=READ_YOUR_WRITES_MARGIN)
+
+    def _check(self, conn):
+        with conn.cursor() as cur:
+            cur.execute(REPLICA_LAG_SQL)
+            replayed_through, now = cur.fetchone()
+        conn.rollback()
+        self.checked_at = time.monotonic()
+        self.replayed_through = replayed_through
+        # Nothing replayed yet since the replica started: unknown, treated as too far behind
+        self.lag = (now - replayed_through).total_seconds() if replayed_through is not None else None
+        REPLICA_LAG.set(self.lag if self.lag is not None else float("inf"), replica=self.name)
+
+    def borrow(self, floor):
+        """A connection to this replica if it is healthy and fresh enough for ``floor``, else ``None``."""
+        now = time.monotonic()
+        if now < self.ejected_until:
+            return None
+        due = now - self.checked_at >= REPLICA_CHECK_INTERVAL
+        if not due and not self.fresh_for(floor):
+            self._stats["skipped_stale"] += 1
+            return None
+        try:
+            conn = self.pool.getconn()
+        except Exception as ex:
+            self.eject(ex)
+            return None
+        if due:
+            try:
+                self._check(conn)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as ex:
+                self.pool.putconn(conn, discard=True)
+                self.eject(ex)
+                return None
+            if not self.fresh_for(floor):
+                self._stats["skipped_stale"] += 1
+                self.pool.putconn(conn)
+                return None
+        self._stats["reads"] += 1
+        return PooledConnection(self, conn)
+
+    def putconn(self, conn, discard=False):
+        if conn.closed:
+            self.eject("connection lost")
+        self.pool.putconn(conn, discard)
+
+    def stats(self):
+        stats = dict(self._stats, name=self.name, lag_seconds=self.lag)
+        stats["ejected_for"] = max(self.ejected_until - time.monotonic(), 0.0)
+        stats["pool"] = self.pool.stats()
+        return stats
+
+
+class ReplicaSet:
+    """Round-robin over the replicas, skipping ejected and lagging ones."""
+
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self._next = itertools.count()
+
+    def borrow(self, floor):
+        start = next(self._next)
+        for i in range(len(self.replicas)):
+            conn = self.replicas[(start + i) % len(self.replicas)].borrow(floor)
+            if conn is not None:
+                return conn
+        return None
+
+    def closeall(self):
+        for replica in self.replicas:
+            replica.pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_replicas = None
+# Pools inherited over fork() are never closed in the child: closing them would
+# terminate the parent's server sessions that share the same sockets.
+_inherited_pools = []
+
+
+def _reset_pool_after_fork():
+    global _pool, _pool_lock, _replicas
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    if _replicas is not None:
+        _inherited_pools.extend(replica.pool for replica in _replicas.replicas)
+    _pool = None
+    _replicas = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def get_pool():
+    """Return this process's connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if DB_ENGINE == 'sqlite':
+                    # A local file never goes stale, so borrowed connections are not pinged
+                    pool = ConnectionPool(
+                        DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, float('inf'),
+                        connect=sqlite_engine.connect, busy_timeout=DB_POOL_TIMEOUT,
+                    )
+                else:
+                    pool = ConnectionPool(
+                        DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_PING_AFTER,
+                        sslmode=DB_SSLMODE, cursor_factory=TimedCursor,
+                    )
+                pool.prefill()
+                _pool = pool
+    return _pool
+
+
+def get_replicas():
+    """This process's ``ReplicaSet``, or ``None`` without ``DATABASE_REPLICA_URLS``."""
+    global _replicas
+    if not DATABASE_REPLICA_URLS or DB_ENGINE == 'sqlite':
+        return None
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                # Replica pools open lazily: a replica that is down must not fail startup
+                _replicas = ReplicaSet([
+                    Replica(dsn, ConnectionPool(
+                        dsn, 0, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_PING_AFTER,
+                        sslmode=DB_SSLMODE, cursor_factory=TimedCursor, connect_timeout=REPLICA_CONNECT_TIMEOUT,
+                    ), f"replica{position}")
+                    for position, dsn in enumerate(DATABASE_REPLICA_URLS, 1)
+                ])
+    return _replicas
+
+
+if DATABASE_REPLICA_URLS and DB_ENGINE == 'sqlite':
+    logger.warning("DATABASE_REPLICA_URLS is ignored with the SQLite engine")
+
+
+def close_pool():
+    """Close idle connections, e.g. in the gunicorn master before workers fork."""
+    global _pool, _replicas
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+        if _replicas is not None:
+            _replicas.closeall()
+            _replicas = None
+
+
+def pool_stats():
+    """Borrowed/idle counts and wait times of this process's pool (and its replicas')."""
+    if _pool is None:
+        stats = {"borrowed": 0, "idle": 0, "min": DB_POOL_MIN, "max": DB_POOL_MAX, "borrows": 0}
+    else:
+        stats = _pool.stats()
+    if _replicas is not None:
+        stats["replicas"] = [replica.stats() for replica in _replicas.replicas]
+    return stats
+
+
+def note_write():
+    """Send the rest of this request's reads to the primary: it has just written."""
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _replica_floor():
+    """``(use_replica, floor)`` for this request's reads.
+
+    A replica must have replayed the user's last write (``users.data_updated_at``,
+    read from the primary and cached for the request) before it serves them, so a
+    user always sees their own adds, edits and deletes. Reads outside a request
+    (background jobs) only need a replica within ``REPLICA_MAX_LAG``.
+    """
+    if not has_request_context():
+        return True, None
+    if g.get("db_wrote"):
+        return False, None
+    user_id = session.get("user_id")
+    if user_id is None:
+        return True, None
+    # Deferred: services.cache imports this module
+    from services.cache import fetch_data_version
+
+    return True, fetch_data_version(user_id)[1]
+
+
+def _replica_connection():
+    replicas = get_replicas()
+    if replicas is None:
+        return None
+    use_replica, floor = _replica_floor()
+    conn = replicas.borrow(floor) if use_replica else None
+    READ_TARGETS.inc(target="replica" if conn is not None else "primary")
+    return conn
+
+
+def get_db(readonly=False):
+    """Borrow a pooled database connection (return it with ``close()`` or ``with``).
+
+    With ``readonly`` (only SELECTs will run on it) the connection may come from a
+    read replica (``DATABASE_REPLICA_URLS``); without a healthy, fresh enough one
+    it comes from the primary.
+    """
+    try:
+        if readonly:
+            started = time.perf_counter()
+            conn = _replica_connection()
+            if conn is not None:
+                ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+                return conn
+        started = time.perf_counter()
+        pool = get_pool()
+        conn = pool.getconn()
+        ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+        return PooledConnection(pool, conn)
     except Exception as ex:
-        print(f"❌ DB Connection Failed: {ex}")
+        logger.error("DB connection failed: %s", ex)
         abort(500)
 
-def init_db():
-    """Initialize DB table and sequence."""
-    try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id SERIAL PRIMARY KEY,
-                    category TEXT,
-                    sub_category TEXT,
-                    description TEXT,
-                    amount REAL,
-                    date_time TEXT
-                )
-        """)
-        conn.commit()
-
-        # Sync sequence
-        cur.execute("""
-            SELECT setval(
-                pg_get_serial_sequence('transactions', 'id'),
-                COALESCE((SELECT MAX(id) FROM transactions), 0) + 1,
-                true
-            )
-        """)
-        conn.commit()
-
-        # Add users table to the database
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL
-            )
-        """)
-        conn.commit()
 
-        # Add user_id column to transactions table
-        cur.execute("""
-            ALTER TABLE transactions
-            ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES users(id)
-        """)
-        conn.commit()
-
-        # Add passwords table to the database
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS passwords (
-                id SERIAL PRIMARY KEY,
-                category TEXT NOT NULL,
-                username TEXT NOT NULL,
-                password TEXT NOT NULL,
-                date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER REFERENCES users(id)
-            )
-        """)
-        conn.commit()
+def init_db():
+    """Bring the schema up to date (see ``services.migrations``)."""
+    from services.migrations import migrate
 
-        cur.close()
-        conn.close()
-        print("✅ DB initialized and sequence synced")
+    try:
+        applied = migrate()
+        if applied:
+            logger.info("DB migrated to version %s", applied[-1])
     except Exception as ex:
-        print(f"❌ DB Initialization failed: {ex}")
+        logger.error("DB initialization failed: %s", ex)
         abort(500)
@@ -1,14 +1,16 @@
 # services/delete_service.py
 
 from services.db import get_db
+from services.rollup_service import apply_rollup_deltas
+from services.cache import bump_data_version
 
 class DeleteService:
     def delete_transaction(self, txn_id, user_id):
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM transactions WHERE id=%s AND user_id=%s", (txn_id, user_id))
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM transactions WHERE id=%s AND user_id=%s
+                RETURNING user_id, date_time, category, sub_category, amount
+            """, (txn_id, user_id))
+            apply_rollup_deltas(cur, cur.fetchall(), sign=-1)
+            bump_data_version(cur, user_id)
             conn.commit()
-        finally:
-            cur.close()
-            conn.close()
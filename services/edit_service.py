@@ -2,40 +2,39 @@
 
 from services.db import get_db
 from services.utils import rows_to_dict
-import joblib
+from services.rollup_service import apply_rollup_deltas
+from services.cache import bump_data_version
+from services.model_registry import model_registry
 from flask import session
 
 class EditService:
     def fetch_transaction(self, txn_id):
-        conn = get_db()
-        try:
-            cur = conn.cursor()
+        with get_db() as conn, conn.cursor() as cur:
             cur.execute("SELECT * FROM transactions WHERE id=%s AND user_id=%s", (txn_id, session["user_id"]))
-            txn = rows_to_dict(cur, cur.fetchall())[0] if cur.rowcount > 0 else None
-        finally:
-            cur.close()
-            conn.close()
-        return txn
+            rows = rows_to_dict(cur, cur.fetchall())
+        return rows[0] if rows else None
 
     def update_transaction(self, txn_id, description, amount, category, sub_category):
-        conn = get_db()
-        try:
-            cur = conn.cursor()
+        with get_db() as conn, conn.cursor() as cur:
+            # Lock the row and read the pre-update values so the rollups can be moved
+            cur.execute("""
+                SELECT user_id, date_time, category, sub_category, amount FROM transactions
+                WHERE id=%s AND user_id=%s FOR UPDATE
+            """, (txn_id, session["user_id"]))
+            old = cur.fetchall()
+            if not old:
+                return
             cur.execute("""
                 UPDATE transactions
                 SET description=%s, amount=%s, category=%s, sub_category=%s
-                WHERE id=%s AND user_id=%s
-            """, (description, amount, category, sub_category, txn_id, session["user_id"]))
+                WHERE id=%s
+                RETURNING user_id, date_time, category, sub_category, amount
+            """, (description, amount, category, sub_category, txn_id))
+            new = cur.fetchall()
+            apply_rollup_deltas(cur, old, sign=-1)
+            apply_rollup_deltas(cur, new)
+            bump_data_version(cur, session["user_id"])
             conn.commit()
-        finally:
-            cur.close()
-            conn.close()
 
-        # Update ML model with new label
-        new_label = f"{category}|{sub_category}"
-        v, m, c = joblib.load("money_ai_model.pkl")
-        if new_label not in c:
-            c = list(c) + [new_label]
-        X_new = v.transform([description])
-        m.partial_fit(X_new, [new_label], classes=c)
-        joblib.dump((v, m, c), "money_ai_model.pkl")
+        # Learn the corrected label in the background, off the request path
+        model_registry.record_correction(description, f"{category}|{sub_category}")
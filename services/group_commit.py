@@ -0,0 +1,135 @@
+# services/group_commit.py
+"""Group commit: coalesce concurrent single-row writes into one transaction.
+
+With ``GROUP_COMMIT_MS`` > 0, rows submitted by concurrent requests of one
+worker process are gathered by a background thread: the first row waits up to
+``GROUP_COMMIT_MS`` for others (or until ``GROUP_COMMIT_MAX_ROWS``), then the
+whole group is written with one multi-row statement and one commit, and every
+caller gets its own created row back. Callers still block until their row is
+committed, so a response means what it meant before; under bursts the database
+sees one commit (one WAL flush) per group instead of one per request, at the cost
+of up to ``GROUP_COMMIT_MS`` of extra latency for a lone request.
+
+If a group's transaction fails, its rows are retried one at a time, so a bad
+row only fails its own caller.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from services.metrics import Histogram, ROW_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds the first row of a group waits for more (0 disables group commit)
+GROUP_COMMIT_MS = float(os.environ.get('GROUP_COMMIT_MS', 0))
+GROUP_COMMIT_MAX_ROWS = int(os.environ.get('GROUP_COMMIT_MAX_ROWS', 100))
+
+GROUP_ROWS = Histogram("db_group_commit_rows", "Rows written per group commit.", buckets=ROW_BUCKETS)
+
+
+class _Pending:
+    __slots__ = ("row", "done", "result", "error")
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GroupCommitter:
+    """Feeds rows to ``write(rows) -> created rows`` (same order), in groups."""
+
+    def __init__(self, write, window_ms=GROUP_COMMIT_MS, max_rows=GROUP_COMMIT_MAX_ROWS):
+        self.write = write
+        self.window = window_ms / 1000
+        self.max_rows = max(max_rows, 1)
+        self._reset_worker()
+        self._stats = {"rows": 0, "groups": 0, "retried_groups": 0, "failed_rows": 0}
+
+    def _reset_worker(self):
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, row):
+        """Write ``row`` as part of the next group; returns its created row or raises its error."""
+        pending = _Pending(row)
+        self._queue.put(pending)
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._worker.start()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_group(self):
+        """Block for the first row, then gather more until the group is full or due."""
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(group) < self.max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                group.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while True:
+            self.flush(self._next_group())
+
+    def flush(self, group):
+        """Write one group and wake its callers."""
+        try:
+            try:
+                created = self.write([pending.row for pending in group])
+                for pending, row in zip(group, created):
+                    pending.result = row
+            except Exception as ex:
+                if len(group) == 1:
+                    group[0].error = ex
+                else:
+                    logger.warning("Group commit of %s rows failed, retrying them one by one: %s", len(group), ex)
+                    self._stats["retried_groups"] += 1
+                    for pending in group:
+                        try:
+                            pending.result = self.write([pending.row])[0]
+                        except Exception as row_ex:
+                            pending.error = row_ex
+            self._stats["failed_rows"] += sum(pending.error is not None for pending in group)
+        finally:
+            self._stats["rows"] += len(group)
+            self._stats["groups"] += 1
+            GROUP_ROWS.observe(len(group))
+            for pending in group:
+                pending.done.set()
+
+    def stats(self):
+        return dict(self._stats, pending=self._queue.qsize(), window_ms=self.window * 1000)
+
+
+_committers = []
+
+
+def _reset_after_fork():
+    # The worker thread does not survive fork; queued rows belong to the parent
+    for committer in _committers:
+        committer._reset_worker()
+
+
+def group_committer(write, **kwargs):
+    """A ``GroupCommitter`` whose worker thread is reset in forked children."""
+    committer = GroupCommitter(write, **kwargs)
+    _committers.append(committer)
+    return committer
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
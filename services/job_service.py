@@ -0,0 +1,254 @@
+# services/job_service.py
+"""Background jobs for work too long for a request (backup restore and export).
+
+Jobs are persisted in the ``jobs`` table and run on a small per-process thread
+pool, so the request that starts one returns at once and a restore never holds
+a worker slot that page traffic needs. Progress (rows processed, ETA) is written
+back to the row and can be polled from any worker.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from services.db import DB_POOL_MAX, Json, get_db
+from services.backup_service import BackupService, count_rows
+
+logger = logging.getLogger(__name__)
+
+# Jobs run at the same time per process; more are queued. Capped at a quarter of
+# the connection pool (a job holds up to two) so pages always find a connection.
+JOB_WORKERS = min(int(os.environ.get('JOB_WORKERS', 2)), max(DB_POOL_MAX // 4, 1))
+JOB_RESULT_DIR = os.environ.get('JOB_RESULT_DIR', os.path.join(os.environ.get('UPLOAD_FOLDER', 'uploads'), 'jobs'))
+# Export files are deleted this many seconds after the job finished
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 24 * 3600))
+# A running job that has not reported progress for this long is considered dead
+JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', 600))
+# Minimum seconds between progress writes
+JOB_PROGRESS_INTERVAL = 0.5
+
+ACTIVE = ("queued", "running")
+JOB_COLUMNS = (
+    "id", "user_id", "kind", "status", "params", "total_rows", "processed_rows", "report",
+    "result_path", "error", "owner", "created_at", "started_at", "updated_at", "finished_at",
+)
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class JobRunner:
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = max(workers, 1)
+        self._reset()
+
+    def _reset(self):
+        global OWNER
+        OWNER = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        return self._executor
+
+    # ---------- submitting ----------
+    def submit(self, user_id, kind, params, target, owned_files=()):
+        """Persist a queued job and schedule ``target(job_id, params, progress)`` to run it.
+
+        ``owned_files`` (e.g. an upload) belong to the job: they are deleted when it
+        ends, whether it succeeded or failed, or right away if it cannot be queued.
+        """
+        queued = False
+        try:
+            self.purge_expired()
+            job_id = uuid.uuid4().hex
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO jobs (id, user_id, kind, params, owner) VALUES (%s, %s, %s, %s, %s)
+                """, (job_id, user_id, kind, Json(params), OWNER))
+                conn.commit()
+            self._pool().submit(self._run, job_id, params, target, owned_files)
+            queued = True
+        finally:
+            if not queued:
+                _remove_files(owned_files)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = %s" for name in fields)
+        values = [Json(v) if isinstance(v, dict) else v for v in fields.values()]
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(f"UPDATE jobs SET {assignments}, updated_at = now() WHERE id = %s", values + [job_id])
+            conn.commit()
+
+    def _run(self, job_id, params, target, owned_files=()):
+        last_write = [0.0]
+
+        def progress(processed, total=None, report=None, force=False):
+            now = time.monotonic()
+            if not force and now - last_write[0] < JOB_PROGRESS_INTERVAL:
+                return
+            last_write[0] = now
+            fields = {"processed_rows": processed}
+            if total is not None:
+                fields["total_rows"] = total
+            if report is not None:
+                fields["report"] = report
+            self._update(job_id, **fields)
+
+        try:
+            self._update(job_id, status="running", started_at=datetime.now(timezone.utc))
+            result = target(job_id, params, progress) or {}
+            self._update(job_id, status="done", finished_at=datetime.now(timezone.utc), **result)
+        except Exception as ex:
+            logger.exception("Job %s failed: %s", job_id, ex)
+            self._update(job_id, status="failed", error=str(ex), finished_at=datetime.now(timezone.utc))
+        finally:
+            _remove_files(owned_files)
+
+    # ---------- reading ----------
+    def get(self, job_id, user_id):
+        """Return the user's job as a dict with rate and ETA, or ``None``."""
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = %s AND user_id = %s", (job_id, user_id))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        if self._is_orphaned(job):
+            self._update(job_id, status="failed", error="interrupted", finished_at=datetime.now(timezone.utc))
+            job.update(status="failed", error="interrupted")
+        return self.describe(job)
+
+    def _is_orphaned(self, job):
+        """Whether an unfinished job's process is gone (same host) or has gone silent."""
+        if job["status"] not in ACTIVE:
+            return False
+        host, _, pid = (job["owner"] or "").rpartition(":")
+        if host == socket.gethostname() and pid.isdigit():
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+        return job["status"] == "running" and job["updated_at"] < datetime.now(timezone.utc) - timedelta(seconds=JOB_STALE_AFTER)
+
+    @staticmethod
+    def describe(job):
+        processed, total = job["processed_rows"], job["total_rows"]
+        rate = eta = percent = None
+        if job["started_at"] is not None:
+            end = job["finished_at"] or datetime.now(timezone.utc)
+            elapsed = (end - job["started_at"]).total_seconds()
+            rate = processed / elapsed if elapsed > 0 else None
+        if total:
+            percent = min(100.0, processed * 100.0 / total) if job["status"] != "done" else 100.0
+            if job["status"] == "running" and rate:
+                eta = max(total - processed, 0) / rate
+        return {
+            "id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "processed_rows": processed,
+            "total_rows": total,
+            "percent": percent,
+            "rows_per_second": rate,
+            "eta_seconds": eta,
+            "report": job["report"],
+            "error": job["error"],
+            "has_result": job["status"] == "done" and bool(job["result_path"]),
+            "created_at": job["created_at"].isoformat(),
+            "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+        }
+
+    def result_file(self, job_id, user_id):
+        """``(path, params)`` of a finished job's result file, or ``None``."""
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT result_path, params FROM jobs WHERE id = %s AND user_id = %s AND status = 'done'",
+                (job_id, user_id),
+            )
+            row = cur.fetchone()
+        if row is None or not row[0] or not os.path.exists(row[0]):
+            return None
+        return row[0], row[1]
+
+    def purge_expired(self):
+        """Delete result files of jobs that finished more than ``JOB_RESULT_TTL`` ago."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=JOB_RESULT_TTL)
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, result_path FROM jobs
+                WHERE result_path IS NOT NULL AND finished_at < %s
+                FOR UPDATE SKIP LOCKED
+            """, (cutoff,))
+            expired = cur.fetchall()
+            if expired:
+                cur.execute("UPDATE jobs SET result_path = NULL WHERE id = ANY(%s)", ([row[0] for row in expired],))
+            conn.commit()
+        paths = [row[1] for row in expired]
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# -------------------- Backup jobs --------------------
+def run_import(job_id, params, progress):
+    """Restore an uploaded backup file (submitted as one of the job's ``owned_files``)."""
+    file_path = params["file_path"]
+    total = count_rows(file_path)
+    progress(0, total=total, force=True)
+    report = BackupService().import_backup(
+        file_path, params["user_id"],
+        progress=lambda report: progress(report["rows"], report=report),
+    )
+    return {"processed_rows": report["rows"], "report": report}
+
+
+def run_export(job_id, params, progress):
+    """Write the user's backup to a result file for download."""
+    service = BackupService()
+    user_id, fmt = params["user_id"], params["format"]
+    total = service.count_transactions(user_id)
+    progress(0, total=total, force=True)
+
+    os.makedirs(JOB_RESULT_DIR, exist_ok=True)
+    path = os.path.join(JOB_RESULT_DIR, f"{job_id}.{fmt}")
+    rows = [0]
+
+    def on_rows(count):
+        rows[0] = count
+        progress(count)
+
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            for chunk in service.export_csv(user_id, progress=on_rows):
+                f.write(chunk)
+    else:
+        with open(path, "wb") as f:
+            for chunk in service.export_xlsx(user_id, progress=on_rows):
+                f.write(chunk)
+    return {"processed_rows": rows[0], "result_path": path}
+
+
+job_runner = JobRunner()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=job_runner._reset)
@@ -0,0 +1,216 @@
+# services/metrics.py
+"""In-process request, query and model metrics in the Prometheus text format.
+
+Histograms and counters are kept per worker process (a scrape of ``/metrics``
+sees the worker that served it) and cost one lock and a bisect per observation.
+Database statements are timed by ``services.db.TimedCursor``; queries slower
+than ``SLOW_QUERY_MS`` are also logged.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Log statements slower than this many milliseconds (0 disables the slow-query log)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 0))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# Statement label of a query: its leading keyword, so the label set stays small
+STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY", "DECLARE", "CREATE", "ALTER", "DROP")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(((key, self._copy(value)) for key, value in self._values.items()), key=lambda item: item[0])
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts plus +Inf, then sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _copy(self, value):
+        return value[0][:], value[1]
+
+    def _render_series(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY = []
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint.", ("endpoint", "method", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_queries", "Database statements run while handling a request (streamed bodies excluded).",
+    ("endpoint",), buckets=QUERY_COUNT_BUCKETS,
+)
+QUERY_SECONDS = Histogram("db_query_duration_seconds", "Database statement latency.", ("statement",))
+QUERY_ROWS = Histogram(
+    "db_query_rows", "Rows returned or affected per statement.", ("statement",), buckets=ROW_BUCKETS,
+)
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", ("statement",))
+QUERY_ERRORS = Counter("db_query_errors_total", "Statements that raised.", ("statement",))
+ACQUIRE_SECONDS = Histogram("db_connection_acquire_seconds", "Time to borrow a pooled connection.")
+POOL_CONNECTIONS = Gauge("db_pool_connections", "Pooled connections by state.", ("state",))
+POOL_EVENTS = Gauge("db_pool_events", "Pool borrows, timeouts and reconnects since start.", ("event",))
+READ_TARGETS = Counter("db_reads_total", "Read-only connections borrowed, by where they went.", ("target",))
+REPLICA_LAG = Gauge("db_replica_lag_seconds", "Replication lag measured at the last check.", ("replica",))
+INFERENCE_SECONDS = Histogram("model_inference_seconds", "Model predict calls (cache misses only).", ("model",))
+INFERENCE_ITEMS = Counter("model_inference_items_total", "Texts or tokens sent to a model.", ("model",))
+
+
+def statement_label(query):
+    """Leading SQL keyword of ``query`` (str or bytes), or ``OTHER``."""
+    if isinstance(query, bytes):
+        query = query[:32].decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        query = str(query)[:32]
+    word = query.lstrip(" \t\r\n(").split(None, 1)[0].upper() if query.strip() else ""
+    return word if word in STATEMENTS else "OTHER"
+
+
+# Statements run by the request this thread is handling (None outside requests)
+_request = threading.local()
+
+
+def begin_request():
+    _request.queries = 0
+
+
+def end_request(endpoint):
+    queries = getattr(_request, "queries", None)
+    if queries is not None:
+        REQUEST_QUERIES.observe(queries, endpoint=endpoint)
+        _request.queries = None
+
+
+def observe_query(query, seconds, rows=-1, failed=False):
+    """Record one executed statement; ``rows`` < 0 means unknown."""
+    if getattr(_request, "queries", None) is not None:
+        _request.queries += 1
+    statement = statement_label(query)
+    QUERY_SECONDS.observe(seconds, statement=statement)
+    if failed:
+        QUERY_ERRORS.inc(statement=statement)
+    elif rows >= 0:
+        QUERY_ROWS.observe(rows, statement=statement)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(statement=statement)
+        if isinstance(query, bytes):
+            query = query.decode("utf-8", "replace")
+        logger.warning("Slow query (%.1f ms, %s rows): %s", seconds * 1000, rows, " ".join(str(query).split())[:500])
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _reset_after_fork():
+    # Children start counting from zero; the parent's numbers belong to the parent
+    for metric in REGISTRY:
+        metric._lock = threading.Lock()
+        metric._values = {}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,580 @@
+# services/migrations.py
+"""Versioned schema migrations.
+
+Every schema change is a numbered function in ``MIGRATIONS``, and the versions a
+database has applied are recorded in ``schema_version``. At startup
+``migrate()`` reads the current version with a single query and returns if it
+is up to date, so booting a worker costs one round-trip instead of re-running
+the DDL. When migrations are pending, the process takes an advisory lock (on
+SQLite, the database write lock), re-reads the version -- another process may
+have migrated meanwhile -- and applies the rest in order, each committed
+together with its ``schema_version`` row.
+
+Indexes on populated tables are not built by migrations: ``INDEXES`` lists them
+and ``build_indexes()`` (``flask build-indexes``) creates the missing ones with
+``CREATE INDEX CONCURRENTLY``, which does not block writes, outside the boot
+path. Only a database created by the same run gets them inline, while its
+tables are still empty. SQLite has no concurrent builds; its indexes are part of
+its migrations. Likewise migrations marked ``online`` (backfills of existing
+rows) are not applied at startup but by ``flask build-indexes`` -- the Procfile
+release step -- before the indexes; startup applies the versions before them.
+
+To change the schema, append a migration with the next version. Databases
+created before versioning start at version 0 and apply every migration once, so
+migrations must tolerate objects that already exist (``IF NOT EXISTS``).
+"""
+import logging
+import sqlite3
+import time
+from collections import namedtuple
+import psycopg2
+from psycopg2 import errors
+from services import sqlite_engine
+from services.db import (
+    CATEGORY_INDEXES, DATE_TIME_BACKFILL_BATCH, SEARCH_CONFIG, SEARCH_VECTOR_BACKFILL_BATCH, dialect, get_db,
+)
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key held by the process applying migrations
+SCHEMA_MIGRATION_LOCK = 720000
+
+VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL
+    )
+"""
+
+Migration = namedtuple("Migration", "version name apply engines online")
+MIGRATIONS = []
+
+# Stored for transactions whose legacy TEXT date_time could not be read (migration 4)
+DATE_TIME_FALLBACK = "1970-01-01 00:00:00+00"
+
+# The legacy value as a timestamp, or NULL where Postgres cannot read it (instead of an error)
+TRY_TIMESTAMPTZ = """
+    CREATE OR REPLACE FUNCTION try_timestamptz(value TEXT) RETURNS TIMESTAMPTZ AS $$
+    BEGIN
+        RETURN value::timestamptz;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql STABLE
+"""
+
+# Fills date_time_tz of the unconverted rows, narrowed by ``{batch}``
+CONVERT_DATE_TIME = """
+    UPDATE transactions t SET
+        date_time_tz = COALESCE(batch.parsed, %(fallback)s),
+        date_time_legacy = CASE WHEN batch.parsed IS NULL THEN t.date_time END
+    FROM (
+        SELECT id, try_timestamptz(date_time) AS parsed FROM transactions
+        WHERE date_time_tz IS NULL {batch}
+    ) batch
+    WHERE t.id = batch.id
+"""
+
+
+def search_document(row=""):
+    """``search_vector`` of a transaction; ``row`` qualifies the columns (``"NEW."`` in the trigger)."""
+    return (
+        f"to_tsvector('{SEARCH_CONFIG}', coalesce({row}description, '') || ' ' || "
+        f"coalesce({row}category, '') || ' ' || coalesce({row}sub_category, ''))"
+    )
+
+
+def migration(version, name, engines=("postgres", "sqlite"), online=False):
+    """Register ``fn(conn, cur)`` as migration ``version``.
+
+    On engines not listed the version is recorded without running anything (for
+    SQLite: its initial schema already has the change). ``online`` migrations
+    rewrite or backfill existing rows: startup stops before them and leaves them
+    (and every later version) to ``flask build-indexes``.
+    """
+    def register(fn):
+        assert not MIGRATIONS or MIGRATIONS[-1].version == version - 1, "migration versions must be consecutive"
+        MIGRATIONS.append(Migration(version, name, fn, engines, online))
+        return fn
+    return register
+
+
+# -------------------- Migrations --------------------
+@migration(1, "initial schema")
+def initial_schema(conn, cur):
+    if dialect.name == "sqlite":
+        sqlite_engine.init_schema(conn, CATEGORY_INDEXES)
+        return
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id SERIAL PRIMARY KEY,
+            category TEXT,
+            sub_category TEXT,
+            description TEXT,
+            amount REAL,
+            date_time TIMESTAMPTZ
+        )
+    """)
+    # Databases restored from a dump may have rows past the sequence
+    cur.execute("""
+        SELECT setval(
+            pg_get_serial_sequence('transactions', 'id'),
+            COALESCE((SELECT MAX(id) FROM transactions), 0) + 1,
+            true
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+    """)
+    cur.execute("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES users(id)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS passwords (
+            id SERIAL PRIMARY KEY,
+            category TEXT NOT NULL,
+            username TEXT NOT NULL,
+            password TEXT NOT NULL,
+            date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER REFERENCES users(id)
+        )
+    """)
+
+
+@migration(2, "users data version", engines=("postgres",))
+def users_data_version(conn, cur):
+    # Per-user data version, bumped by every write (cache invalidation)
+    cur.execute("""
+        ALTER TABLE users
+        ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS data_updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    """)
+
+
+@migration(3, "jobs", engines=("postgres",))
+def jobs_table(conn, cur):
+    # Background jobs (backup import/export) and their progress
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            params JSONB NOT NULL DEFAULT '{}',
+            total_rows INTEGER,
+            processed_rows INTEGER NOT NULL DEFAULT 0,
+            report JSONB,
+            result_path TEXT,
+            error TEXT,
+            owner TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            started_at TIMESTAMPTZ,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            finished_at TIMESTAMPTZ
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at)")
+
+
+@migration(4, "transactions.date_time as timestamptz", engines=("postgres",), online=True)
+def date_time_timestamptz(conn, cur, batch_size=DATE_TIME_BACKFILL_BATCH):
+    """Convert the legacy TEXT ``transactions.date_time`` column to TIMESTAMPTZ NOT NULL online.
+
+    A shadow ``date_time_tz`` column is backfilled in small committed batches, so the
+    table is never locked for long and old code keeps working on the TEXT column.
+    Values Postgres cannot read as a timestamp (and missing ones) get
+    ``DATE_TIME_FALLBACK``; their original text is kept in ``date_time_legacy``.
+    Only the final swap (catch-up of rows written meanwhile + rename) takes an
+    exclusive lock.
+    """
+    cur.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'transactions' AND column_name = 'date_time'
+    """)
+    row = cur.fetchone()
+    if row and row[0] == "text":
+        cur.execute("""
+            ALTER TABLE transactions
+            ADD COLUMN IF NOT EXISTS date_time_tz TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS date_time_legacy TEXT
+        """)
+        cur.execute(TRY_TIMESTAMPTZ)
+        conn.commit()
+
+        last_id = converted = 0
+        while True:
+            batch = CONVERT_DATE_TIME.format(batch="AND id > %(after)s ORDER BY id LIMIT %(limit)s")
+            cur.execute(f"{batch} RETURNING t.id", {
+                "fallback": DATE_TIME_FALLBACK, "after": last_id, "limit": batch_size,
+            })
+            ids = [row[0] for row in cur.fetchall()]
+            conn.commit()
+            if not ids:
+                break
+            last_id = max(ids)
+            converted += len(ids)
+            logger.info("date_time backfill: %s rows converted", converted)
+
+        cur.execute("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE")
+        cur.execute(CONVERT_DATE_TIME.format(batch=""), {"fallback": DATE_TIME_FALLBACK})
+        converted += cur.rowcount
+        cur.execute("ALTER TABLE transactions DROP COLUMN date_time")
+        cur.execute("ALTER TABLE transactions RENAME COLUMN date_time_tz TO date_time")
+        cur.execute("DROP FUNCTION try_timestamptz(TEXT)")
+        cur.execute("SELECT COUNT(*) FROM transactions WHERE date_time_legacy IS NOT NULL")
+        unparsed = cur.fetchone()[0]
+        conn.commit()
+        logger.info("transactions.date_time migrated to TIMESTAMPTZ (%s rows)", converted)
+        if unparsed:
+            logger.warning(
+                "%s transactions had an unreadable date_time: set to %s, original kept in date_time_legacy",
+                unparsed, DATE_TIME_FALLBACK,
+            )
+    else:
+        cur.execute("UPDATE transactions SET date_time = %s WHERE date_time IS NULL", (DATE_TIME_FALLBACK,))
+        conn.commit()
+
+    # SET NOT NULL skips its full-table scan (under an exclusive lock) when a
+    # validated CHECK already proves it; VALIDATE does not block writes
+    cur.execute("ALTER TABLE transactions DROP CONSTRAINT IF EXISTS transactions_date_time_not_null")
+    cur.execute("""
+        ALTER TABLE transactions ADD CONSTRAINT transactions_date_time_not_null
+        CHECK (date_time IS NOT NULL) NOT VALID
+    """)
+    conn.commit()
+    cur.execute("ALTER TABLE transactions VALIDATE CONSTRAINT transactions_date_time_not_null")
+    conn.commit()
+    cur.execute("ALTER TABLE transactions ALTER COLUMN date_time SET NOT NULL")
+    cur.execute("ALTER TABLE transactions DROP CONSTRAINT transactions_date_time_not_null")
+
+
+@migration(5, "transactions full-text search", engines=("postgres",), online=True)
+def search_vector(conn, cur, batch_size=SEARCH_VECTOR_BACKFILL_BATCH):
+    """Add ``search_vector``, maintained by a trigger and backfilled in batches, and pg_trgm.
+
+    A nullable column without a default is added without rewriting the table;
+    the trigger fills it for rows written from then on, the committed batches
+    for the existing ones. Without pg_trgm search falls back to full-text prefix
+    matching only.
+    """
+    cur.execute("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS search_vector tsvector")
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION transactions_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {search_document("NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS transactions_search_vector ON transactions")
+    cur.execute("""
+        CREATE TRIGGER transactions_search_vector
+        BEFORE INSERT OR UPDATE OF description, category, sub_category ON transactions
+        FOR EACH ROW EXECUTE FUNCTION transactions_search_vector()
+    """)
+    conn.commit()
+
+    last_id = filled = 0
+    while True:
+        cur.execute(f"""
+            UPDATE transactions SET search_vector = {search_document()}
+            WHERE id IN (SELECT id FROM transactions WHERE id > %s ORDER BY id LIMIT %s)
+            RETURNING id
+        """, (last_id, batch_size))
+        ids = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        if not ids:
+            break
+        last_id = max(ids)
+        filled += len(ids)
+        logger.info("search_vector backfill: %s rows", filled)
+
+    cur.execute("SAVEPOINT pg_trgm")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except psycopg2.Error as ex:
+        cur.execute("ROLLBACK TO SAVEPOINT pg_trgm")
+        logger.warning("pg_trgm unavailable, search uses full-text matching only: %s", ex)
+
+
+@migration(6, "monthly rollups", engines=("postgres",))
+def monthly_rollups(conn, cur):
+    """Create ``monthly_rollups`` and fill it from existing transactions."""
+    from services.rollup_service import rebuild_rollups
+
+    cur.execute("SELECT to_regclass('monthly_rollups') IS NULL")
+    missing = cur.fetchone()[0]
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS monthly_rollups (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            month DATE NOT NULL,
+            category TEXT NOT NULL DEFAULT '',
+            sub_category TEXT NOT NULL DEFAULT '',
+            total DOUBLE PRECISION NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month, category, sub_category)
+        )
+    """)
+    if missing:
+        rows = rebuild_rollups(cur)
+        logger.info("monthly_rollups built (%s rows)", rows)
+
+
+@migration(7, "encrypted password vault")
+def password_vault(conn, cur):
+    """Add ``passwords.secret`` (encrypted), make the plaintext column optional and encrypt it.
+
+    Without ``VAULT_MASTER_KEY`` existing plaintext is left in place (and still
+    revealed) until ``flask encrypt-passwords`` runs with the key set.
+    """
+    from services import vault
+    from services.password_service import encrypt_plaintext_passwords
+
+    if dialect.name == "sqlite":
+        # SQLite cannot drop NOT NULL in place: rebuild the (small) table
+        cur.execute("""
+            CREATE TABLE passwords_new (
+                id INTEGER PRIMARY KEY,
+                category TEXT NOT NULL,
+                username TEXT NOT NULL,
+                password TEXT,
+                secret BLOB,
+                date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                user_id INTEGER REFERENCES users(id)
+            )
+        """)
+        cur.execute("""
+            INSERT INTO passwords_new (id, category, username, password, date_time, user_id)
+            SELECT id, category, username, password, date_time, user_id FROM passwords
+        """)
+        cur.execute("DROP TABLE passwords")
+        cur.execute("ALTER TABLE passwords_new RENAME TO passwords")
+        cur.execute(
+            "CREATE INDEX idx_passwords_user_category_username ON passwords (user_id, category, username, id)"
+        )
+    else:
+        cur.execute("ALTER TABLE passwords ADD COLUMN IF NOT EXISTS secret BYTEA")
+        cur.execute("ALTER TABLE passwords ALTER COLUMN password DROP NOT NULL")
+
+    cur.execute("SELECT COUNT(*) FROM passwords WHERE secret IS NULL AND password IS NOT NULL")
+    plaintext = cur.fetchone()[0]
+    if not plaintext:
+        return
+    if not vault.keys.configured:
+        logger.warning(
+            "%s passwords stored in plaintext; set VAULT_MASTER_KEY and run `flask encrypt-passwords`", plaintext
+        )
+        return
+    encrypted = 0
+    while True:
+        done = encrypt_plaintext_passwords(cur)
+        if not done:
+            break
+        encrypted += done
+    logger.info("Encrypted %s stored passwords", encrypted)
+
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# -------------------- Indexes (Postgres) --------------------
+# ``definition`` follows "CREATE INDEX [CONCURRENTLY] IF NOT EXISTS <name>";
+# ``extension`` is one the index needs (not built while it is not installed)
+Index = namedtuple("Index", "name definition params extension", defaults=((), None))
+
+INDEXES = [
+    # (date_time, id) is the keyset order of the paginated transaction lists
+    Index("idx_transactions_user_date_id", "ON transactions (user_id, date_time, id)"),
+    Index(
+        "idx_transactions_user_subcat_date_id",
+        "ON transactions (user_id, category, sub_category, date_time, id)",
+    ),
+    *(
+        Index(
+            f"idx_transactions_user_date_{slug}",
+            "ON transactions (user_id, date_time) INCLUDE (sub_category, amount) WHERE category = %s",
+            (category,),
+        )
+        for slug, category in CATEGORY_INDEXES.items()
+    ),
+    Index("idx_transactions_search_vector", "ON transactions USING gin (search_vector)"),
+    # Substring and typo matching in search
+    Index(
+        "idx_transactions_description_trgm", "ON transactions USING gin (description gin_trgm_ops)",
+        extension="pg_trgm",
+    ),
+    # Keyset order of the password manager listings
+    Index("idx_passwords_user_category_username", "ON passwords (user_id, category, username, id)"),
+    # Substring and typo matching in password search (same expression as services.password_service)
+    Index(
+        "idx_passwords_search_trgm", "ON passwords USING gin ((category || ' ' || username) gin_trgm_ops)",
+        extension="pg_trgm",
+    ),
+]
+
+# Superseded indexes, dropped by build_indexes()
+OBSOLETE_INDEXES = ["idx_transactions_user_date"]
+
+
+def missing_indexes(cur):
+    """Buildable ``INDEXES`` not present, or left invalid by an interrupted concurrent build."""
+    cur.execute("SELECT extname FROM pg_extension")
+    installed = {row[0] for row in cur.fetchall()}
+    cur.execute("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relnamespace = current_schema()::regnamespace AND c.relname = ANY(%s) AND i.indisvalid
+    """, ([index.name for index in INDEXES],))
+    valid = {row[0] for row in cur.fetchall()}
+    return [
+        index for index in INDEXES
+        if index.name not in valid and (index.extension is None or index.extension in installed)
+    ]
+
+
+def build_indexes(conn, concurrently=True):
+    """Create the missing ``INDEXES`` and drop ``OBSOLETE_INDEXES``; returns the names built.
+
+    With ``concurrently`` every statement runs in autocommit mode, so reads and
+    writes continue while an index is built; an invalid index left behind by an
+    interrupted build is dropped and rebuilt. Otherwise the statements run in the
+    caller's transaction (used on a just-created, empty database).
+    """
+    if dialect.name == "sqlite":
+        return []
+    concurrent = "CONCURRENTLY " if concurrently else ""
+    built = []
+    if concurrently:
+        conn.rollback()
+        conn.set_session(autocommit=True)
+    try:
+        with conn.cursor() as cur:
+            for name in OBSOLETE_INDEXES:
+                cur.execute(f"DROP INDEX {concurrent}IF EXISTS {name}")
+            for index in missing_indexes(cur):
+                started = time.perf_counter()
+                # An invalid leftover would make IF NOT EXISTS a no-op
+                cur.execute(f"DROP INDEX {concurrent}IF EXISTS {index.name}")
+                cur.execute(f"CREATE INDEX {concurrent}IF NOT EXISTS {index.name} {index.definition}", index.params)
+                logger.info("Built index %s in %.1fs", index.name, time.perf_counter() - started)
+                built.append(index.name)
+    finally:
+        if concurrently:
+            conn.set_session(autocommit=False)
+    return built
+
+
+# -------------------- Runner --------------------
+def _read_version(cur):
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+
+def current_version(conn):
+    """Highest applied migration; 0 for a database without ``schema_version``."""
+    with conn.cursor() as cur:
+        try:
+            version = _read_version(cur)
+        except (errors.UndefinedTable, sqlite3.OperationalError):
+            version = 0
+    conn.rollback()
+    return version
+
+
+def _apply(conn, cur, pending):
+    for step in pending:
+        started = time.perf_counter()
+        if dialect.name in step.engines:
+            step.apply(conn, cur)
+        cur.execute(
+            "INSERT INTO schema_version (version, name, applied_at) VALUES (%s, %s, now())",
+            (step.version, step.name),
+        )
+        if dialect.name != "sqlite":
+            conn.commit()
+        logger.info("Applied migration %s (%s) in %.2fs", step.version, step.name, time.perf_counter() - started)
+
+
+def _deferred(pending):
+    """Index of the first pending migration startup must leave to ``flask build-indexes``, or ``None``."""
+    for position, step in enumerate(pending):
+        if step.online and dialect.name in step.engines:
+            return position
+    return None
+
+
+def _migrate_locked(conn, online):
+    """Apply pending migrations under the lock; returns the versions applied."""
+    with conn.cursor() as cur:
+        if dialect.name == "sqlite":
+            # One transaction holding the write lock; SQLite DDL is transactional
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(VERSION_TABLE)
+            pending = [step for step in MIGRATIONS if step.version > _read_version(cur)]
+            _apply(conn, cur, pending)
+            conn.commit()
+            return [step.version for step in pending]
+
+        cur.execute("SELECT pg_advisory_lock(%s)", (SCHEMA_MIGRATION_LOCK,))
+        try:
+            cur.execute("SELECT to_regclass('transactions') IS NULL")
+            fresh = cur.fetchone()[0]
+            cur.execute(VERSION_TABLE)
+            conn.commit()
+            pending = [step for step in MIGRATIONS if step.version > _read_version(cur)]
+            # Tables a fresh database has just created are empty: nothing to backfill
+            deferred = None if online or fresh else _deferred(pending)
+            if deferred is not None:
+                step = pending[deferred]
+                logger.warning(
+                    "Migration %s (%s) rewrites existing rows and is not applied at startup; "
+                    "run `flask build-indexes` (%s migrations pending)",
+                    step.version, step.name, len(pending) - deferred,
+                )
+                pending = pending[:deferred]
+            _apply(conn, cur, pending)
+            if fresh:
+                build_indexes(conn, concurrently=False)
+                conn.commit()
+            elif pending and not online:
+                missing = [index.name for index in missing_indexes(cur)]
+                if missing:
+                    logger.warning("Missing indexes (run `flask build-indexes`): %s", ", ".join(missing))
+            return [step.version for step in pending]
+        finally:
+            conn.rollback()
+            cur.execute("SELECT pg_advisory_unlock(%s)", (SCHEMA_MIGRATION_LOCK,))
+            conn.commit()
+
+
+def migrate(online=False):
+    """Bring the schema to ``LATEST_VERSION``; returns the versions applied.
+
+    Costs one query when the database is already up to date. Unless ``online``
+    (or the database is new), stops before the first online migration.
+    """
+    with get_db() as conn:
+        version = current_version(conn)
+        if version > LATEST_VERSION:
+            logger.warning("Database schema version %s is newer than this code (%s)", version, LATEST_VERSION)
+        if version >= LATEST_VERSION:
+            return []
+        return _migrate_locked(conn, online)
+
+
+def schema_status():
+    """Applied version, pending migrations and missing indexes."""
+    with get_db() as conn:
+        version = current_version(conn)
+        missing = []
+        if dialect.name != "sqlite" and version:
+            with conn.cursor() as cur:
+                missing = [index.name for index in missing_indexes(cur)]
+    return {
+        "version": version,
+        "latest": LATEST_VERSION,
+        "pending": [f"{step.version} {step.name}" for step in MIGRATIONS if step.version > version],
+        "missing_indexes": missing,
+    }
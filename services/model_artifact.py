@@ -0,0 +1,253 @@
+# services/model_artifact.py
+"""Compact on-disk format and NumPy-only inference for the TF-IDF text classifiers.
+
+An artifact is a directory:
+
+    meta.json     format version, the vectorizer's analyzer settings, vocabulary
+                  and the output label of every class
+    idf.npy       float64[n_features] inverse document frequencies
+    weights.npy   float64[n_features + 1, n_outputs]: the classifier's coef_
+                  transposed, with intercept_ as the last row
+
+The arrays are opened with ``np.load(mmap_mode="r")``, so every process maps the
+same page-cache pages instead of unpickling a private copy, and loading needs
+neither scikit-learn nor joblib. Online learning only changes the weights, which
+``write_weights`` replaces atomically (temp file + rename); processes still
+mapping the old file keep reading it until they reload.
+
+``LinearTextModel`` reproduces ``TfidfVectorizer.transform`` followed by a
+linear classifier's ``predict`` with the same floating-point operations in the
+same order (per-row sums over the sorted feature indices, as scikit-learn's
+sparse kernels do), so its predictions and scores match bit for bit.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+import numpy as np
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+IDF_FILE = "idf.npy"
+WEIGHTS_FILE = "weights.npy"
+
+WHITE_SPACES = re.compile(r"\s\s+")
+
+
+# -------------------- Analyzers --------------------
+def _word_ngrams(tokens, min_n, max_n):
+    if max_n == 1:
+        return tokens
+    original, tokens = tokens, []
+    if min_n == 1:
+        tokens = list(original)
+        min_n += 1
+    for n in range(min_n, min(max_n + 1, len(original) + 1)):
+        for i in range(len(original) - n + 1):
+            tokens.append(" ".join(original[i:i + n]))
+    return tokens
+
+
+def _char_ngrams(text, min_n, max_n):
+    text = WHITE_SPACES.sub(" ", text)
+    ngrams = []
+    if min_n == 1:
+        ngrams = list(text)
+        min_n += 1
+    for n in range(min_n, min(max_n + 1, len(text) + 1)):
+        for i in range(len(text) - n + 1):
+            ngrams.append(text[i:i + n])
+    return ngrams
+
+
+def build_analyzer(spec):
+    """Text -> list of terms, as the exported vectorizer's ``build_analyzer()`` did."""
+    lowercase = spec["lowercase"]
+    min_n, max_n = spec["ngram_range"]
+    if spec["analyzer"] == "char":
+        def analyze(text):
+            return _char_ngrams(text.lower() if lowercase else text, min_n, max_n)
+    else:
+        tokenize = re.compile(spec["token_pattern"]).findall
+
+        def analyze(text):
+            return _word_ngrams(tokenize(text.lower() if lowercase else text), min_n, max_n)
+    return analyze
+
+
+# -------------------- Inference --------------------
+class LinearTextModel:
+    """TF-IDF features dotted with a linear classifier's coefficients, in NumPy."""
+
+    def __init__(self, meta, idf, weights):
+        self.meta = meta
+        self.vocabulary = meta["vocabulary"]
+        self.classes = meta["classes"]
+        self.analyze = build_analyzer(meta)
+        self.idf = idf if meta["use_idf"] else None
+        self.weights = weights
+        self._coef = weights[:-1]
+        self._intercept = weights[-1]
+        self._labels = np.array(self.classes, dtype=object)
+
+    def features(self, text):
+        """Sorted feature indices and TF-IDF values of one text (a CSR row)."""
+        counts = {}
+        for term in self.analyze(text):
+            index = self.vocabulary.get(term)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        indices = sorted(counts)
+        data = np.array([counts[i] for i in indices], dtype=np.float64)
+        indices = np.array(indices, dtype=np.intp)
+        if not len(indices):
+            return indices, data
+        meta = self.meta
+        if meta["binary"]:
+            data[:] = 1.0
+        if meta["sublinear_tf"]:
+            data = np.log(data) + 1.0
+        if self.idf is not None:
+            data = data * self.idf[indices]
+        if meta["norm"] == "l2":
+            # Sequential sum of squares (cumsum, not pairwise np.sum), like normalize()
+            squares = np.cumsum(data * data)[-1]
+            if squares != 0.0:
+                data = data / np.sqrt(squares)
+        return indices, data
+
+    def decision_function(self, texts):
+        """Scores of shape ``(len(texts), n_outputs)``."""
+        scores = np.zeros((len(texts), self._coef.shape[1]))
+        for row, text in enumerate(texts):
+            indices, data = self.features(text)
+            if len(indices):
+                # Row-by-row accumulation in index order, like the CSR x dense product
+                scores[row] = np.cumsum(data[:, None] * self._coef[indices], axis=0)[-1]
+        return scores + self._intercept
+
+    def predict(self, texts):
+        """Predicted label per text."""
+        if not texts:
+            return []
+        scores = self.decision_function(texts)
+        if scores.shape[1] == 1:
+            chosen = (scores[:, 0] > 0).astype(np.intp)
+        else:
+            chosen = scores.argmax(axis=1)
+        return self._labels[chosen].tolist()
+
+
+def load(path):
+    """Open the artifact directory at ``path`` (arrays memory-mapped read-only)."""
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported model artifact format {meta.get('format')!r}")
+    idf = np.load(os.path.join(path, IDF_FILE), mmap_mode="r")
+    weights = np.load(os.path.join(path, WEIGHTS_FILE), mmap_mode="r")
+    outputs = 1 if len(meta["classes"]) == 2 else len(meta["classes"])
+    if weights.shape != (len(meta["vocabulary"]) + 1, outputs) or idf.shape != (len(meta["vocabulary"]),):
+        # e.g. read halfway through a re-export; the caller keeps its current model
+        raise ValueError(f"{path}: weights {weights.shape} do not match the vocabulary")
+    return LinearTextModel(meta, idf, weights)
+
+
+# -------------------- Export --------------------
+def _check_exportable(vectorizer):
+    params = vectorizer.get_params()
+    unsupported = [
+        name for name in ("preprocessor", "tokenizer", "stop_words", "strip_accents") if params.get(name) is not None
+    ]
+    if params["analyzer"] not in ("word", "char"):
+        unsupported.append("analyzer")
+    if params["norm"] not in ("l2", None):
+        unsupported.append("norm")
+    if np.dtype(params["dtype"]) != np.float64:
+        unsupported.append("dtype")
+    if unsupported:
+        raise ValueError(f"cannot export vectorizer settings: {', '.join(unsupported)}")
+    return params
+
+
+def _stacked_weights(clf):
+    return np.ascontiguousarray(np.vstack([clf.coef_.T, clf.intercept_[None, :]]), dtype=np.float64)
+
+
+def _save_array(directory, name, array):
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files readable by the owner only
+        os.replace(tmp_path, os.path.join(directory, name))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def export(vectorizer, clf, path, labels=None):
+    """Write a fitted ``TfidfVectorizer`` and linear classifier as an artifact at ``path``.
+
+    ``labels`` maps the classifier's ``classes_`` to output labels (e.g. a
+    ``LabelEncoder``'s ``classes_``). An existing artifact is replaced whole.
+    """
+    params = _check_exportable(vectorizer)
+    classes = [labels[c] if labels is not None else c for c in clf.classes_]
+    meta = {
+        "format": FORMAT_VERSION,
+        "analyzer": params["analyzer"],
+        "ngram_range": list(params["ngram_range"]),
+        "lowercase": params["lowercase"],
+        "token_pattern": params["token_pattern"],
+        "binary": params["binary"],
+        "sublinear_tf": params["sublinear_tf"],
+        "use_idf": params["use_idf"],
+        "norm": params["norm"],
+        "classes": [str(c) for c in classes],
+        "vocabulary": {term: int(index) for term, index in sorted(vectorizer.vocabulary_.items())},
+    }
+    idf = vectorizer.idf_ if params["use_idf"] else np.ones(len(vectorizer.vocabulary_))
+
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}-", suffix=".tmp", dir=parent)
+    try:
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+        _save_array(tmp_dir, IDF_FILE, np.ascontiguousarray(idf, dtype=np.float64))
+        _save_array(tmp_dir, WEIGHTS_FILE, _stacked_weights(clf))
+        os.chmod(tmp_dir, 0o755)
+        if os.path.isdir(path):
+            old = os.path.join(parent, f".{os.path.basename(path)}-{uuid.uuid4().hex}.old")
+            os.rename(path, old)
+            os.rename(tmp_dir, path)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.rename(tmp_dir, path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def write_weights(path, clf):
+    """Publish new coefficients for an artifact whose vocabulary is unchanged."""
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        n_features = len(json.load(f)["vocabulary"])
+    weights = _stacked_weights(clf)
+    if weights.shape[0] != n_features + 1:
+        raise ValueError(f"{path}: classifier has {weights.shape[0] - 1} features, artifact {n_features}")
+    _save_array(path, WEIGHTS_FILE, weights)
+
+
+def export_pickle(pickle_path, path):
+    """Export a joblib-pickled ``(vectorizer, clf, classes | label_encoder)`` tuple."""
+    import joblib
+
+    vectorizer, clf, extra = joblib.load(pickle_path)
+    labels = extra.classes_ if hasattr(extra, "inverse_transform") else None
+    export(vectorizer, clf, path, labels)
@@ -0,0 +1,253 @@
+# services/model_registry.py
+"""Live transaction classifier shared by the request handlers of one process.
+
+Requests predict with the compact artifact at ``MODEL_ARTIFACT`` (see
+``services.model_artifact``): memory-mapped arrays and NumPy-only inference, no
+scikit-learn. Label corrections from edits are queued and applied in
+mini-batches by a background thread to the scikit-learn model pickled at
+``MODEL_PATH`` (the training state, loaded only by processes that learn), which
+then publishes the pickle and the artifact's new weights atomically (temp file +
+rename). Other worker processes notice the new weights' mtime and reload, so
+the model in use is never more than ``MODEL_MAX_STALENESS`` seconds behind the
+last correction.
+"""
+import copy
+import fcntl
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.environ.get('MODEL_PATH', 'money_ai_model.pkl')
+# Serving artifact directory; exported from MODEL_PATH on first use if missing
+MODEL_ARTIFACT = os.environ.get('MODEL_ARTIFACT', 'money_ai_model')
+# Corrections applied per partial_fit call
+MODEL_BATCH_SIZE = int(os.environ.get('MODEL_BATCH_SIZE', 64))
+# Upper bound, in seconds, on how long a correction waits before it is learned
+# and published, and on how old another worker's copy of the model can get
+MODEL_MAX_STALENESS = float(os.environ.get('MODEL_MAX_STALENESS', 10))
+
+
+class ModelRegistry:
+    def __init__(self, path=MODEL_PATH, artifact=MODEL_ARTIFACT, batch_size=MODEL_BATCH_SIZE,
+                 max_staleness=MODEL_MAX_STALENESS):
+        self.path = path
+        self.artifact = artifact
+        self.batch_size = max(batch_size, 1)
+        self.max_staleness = max_staleness
+        self.version = 0
+        self._model = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._trainer = None  # (mtime, (vectorizer, clf, classes)) of MODEL_PATH
+        self._lock = threading.Lock()
+        self._reset_worker()
+        self._stats = {"reloads": 0, "corrections": 0, "skipped": 0, "batches": 0, "publishes": 0, "failures": 0}
+
+    def _reset_worker(self):
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    # ---------- reading ----------
+    def _weights_path(self):
+        from services.model_artifact import WEIGHTS_FILE
+
+        return os.path.join(self.artifact, WEIGHTS_FILE)
+
+    def _export_artifact(self):
+        """Create the serving artifact from the pickle (first boot after upgrading)."""
+        from services.model_artifact import export_pickle
+
+        with open(self.path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if os.path.exists(self._weights_path()) or not os.path.exists(self.path):
+                return
+            try:
+                export_pickle(self.path, self.artifact)
+                logger.info("Exported %s to %s", self.path, self.artifact)
+            except Exception as ex:
+                logger.error("AI model export failed: %s", ex)
+
+    def _load(self):
+        """(Re)load the artifact if its weights changed. Caller holds ``_lock``."""
+        try:
+            mtime = os.stat(self._weights_path()).st_mtime_ns
+        except OSError as ex:
+            if self._model is None:
+                logger.error("AI model loading failed: %s", ex)
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            from services.model_artifact import load
+
+            model = load(self.artifact)
+        except Exception as ex:
+            logger.error("AI model loading failed: %s", ex)
+            return
+        self._model, self._mtime = model, mtime
+        self.version += 1
+        self._stats["reloads"] += 1
+
+    def get(self):
+        """Return the current ``LinearTextModel``, or ``None`` if unavailable.
+
+        The weights file is stat'ed at most every ``max_staleness / 2`` seconds to
+        pick up versions published by other processes.
+        """
+        now = time.monotonic()
+        if self._model is None and not os.path.exists(self._weights_path()):
+            # Outside _lock: exporting takes the file lock, which apply() holds while taking _lock
+            self._export_artifact()
+        if self._model is None or now - self._checked_at >= self.max_staleness / 2:
+            with self._lock:
+                self._checked_at = now
+                self._load()
+        return self._model
+
+    def snapshot(self):
+        """Return ``(version, model)`` read together, for caches keyed on the version."""
+        self.get()
+        with self._lock:
+            return self.version, self._model
+
+    # ---------- learning ----------
+    def record_correction(self, description, label):
+        """Queue a user's corrected ``"category|sub_category"`` label for ``description``."""
+        self._queue.put((time.monotonic(), description, label))
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="model-registry", daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        """Block for the first correction, then gather more until the batch is full or due."""
+        queued_at, description, label = self._queue.get()
+        batch = [(description, label)]
+        deadline = queued_at + self.max_staleness / 2
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                _, description, label = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append((description, label))
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.apply(batch)
+            except Exception as ex:
+                self._stats["failures"] += 1
+                logger.error("Model update failed: %s", ex)
+
+    def _load_trainer(self):
+        """The pickled scikit-learn model, reloaded if another process published one.
+
+        Caller holds the file lock.
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        if self._trainer is None or self._trainer[0] != mtime:
+            # Deferred: importing joblib (and unpickling) pulls in numpy and scikit-learn
+            import joblib
+
+            self._trainer = (mtime, joblib.load(self.path))
+        return self._trainer[1]
+
+    def apply(self, batch):
+        """Learn a batch of ``(description, label)`` pairs and publish the new model.
+
+        The file lock serializes the load/fit/publish cycle across worker processes,
+        so corrections learned by another worker are never overwritten.
+        """
+        from services.model_artifact import write_weights
+
+        with open(self.path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                vectorizer, clf, classes = self._load_trainer()
+            except Exception as ex:
+                logger.error("AI model loading failed: %s", ex)
+                return
+
+            # SGDClassifier cannot grow its label set in partial_fit
+            known = set(clf.classes_)
+            texts = [text for text, label in batch if label in known]
+            labels = [label for text, label in batch if label in known]
+            self._stats["corrections"] += len(batch)
+            self._stats["skipped"] += len(batch) - len(labels)
+            if not labels:
+                return
+
+            # Fit a copy so a failed fit leaves the cached training state untouched
+            clf = copy.deepcopy(clf)
+            clf.partial_fit(vectorizer.transform(texts), labels, classes=clf.classes_)
+            model = (vectorizer, clf, classes)
+            self._publish(model)
+            self._trainer = (os.stat(self.path).st_mtime_ns, model)
+            write_weights(self.artifact, clf)
+
+            with self._lock:
+                self._load()
+            self._stats["batches"] += 1
+            self._stats["publishes"] += 1
+
+    def _publish(self, model):
+        import joblib
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".model-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                joblib.dump(model, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def flush(self):
+        """Apply queued corrections now, in the caller's thread (tests, shutdown)."""
+        batch = []
+        while True:
+            try:
+                _, description, label = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append((description, label))
+        if batch:
+            self.apply(batch)
+
+    def stats(self):
+        return dict(
+            self._stats,
+            version=self.version,
+            path=self.path,
+            artifact=self.artifact,
+            pending=self._queue.qsize(),
+            loaded=self._model is not None,
+            worker_alive=self._worker is not None and self._worker.is_alive(),
+        )
+
+
+model_registry = ModelRegistry()
+
+
+def _reset_after_fork():
+    # The worker thread does not survive fork; queued corrections belong to the parent
+    model_registry._reset_worker()
+    model_registry._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
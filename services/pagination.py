@@ -0,0 +1,122 @@
+# services/pagination.py
+"""Keyset pagination over transactions ordered newest first by (date_time, id).
+
+A page is fetched with ``(date_time, id) < cursor`` (older) or ``> cursor``
+(newer) and a LIMIT, so it costs the same index range scan whether it is the
+first page or the thousandth. Cursors are opaque url-safe base64 tokens.
+"""
+import base64
+import json
+import os
+from datetime import datetime
+
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+
+# Columns the transaction lists render
+LIST_COLUMNS = ("id", "category", "sub_category", "description", "amount", "date_time")
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by ``encode_cursor``."""
+
+
+def encode_cursor(row, direction):
+    # date_time is NOT NULL (migration 4); a NULL would make a cursor decode_cursor rejects
+    date_time = row["date_time"]
+    payload = {"t": date_time.isoformat() if date_time else None, "i": row["id"], "d": direction}
+    if "rank" in row:
+        payload["r"] = row["rank"]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``(date_time, id, direction, rank)`` for a cursor token; ``rank`` may be ``None``."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        direction = payload["d"]
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        rank = payload.get("r")
+        return (
+            datetime.fromisoformat(payload["t"]), int(payload["i"]), direction,
+            float(rank) if rank is not None else None,
+        )
+    except (ValueError, KeyError, TypeError) as ex:
+        raise InvalidCursor(token) from ex
+
+
+def parse_cursor(token):
+    """Return ``token`` if it is a usable cursor, else ``None`` (start from the first page)."""
+    if not token:
+        return None
+    try:
+        decode_cursor(token)
+    except InvalidCursor:
+        return None
+    return token
+
+
+def parse_page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+def fetch_page(cur, where, params, cursor=None, page_size=PAGE_SIZE, rank=None, rank_params=()):
+    """Fetch one page of transactions matching ``where``.
+
+    With ``rank`` (an SQL expression, e.g. a search relevance score) rows are
+    ordered by it first, best first, and the keyset becomes (rank, date_time, id).
+    Returns ``{"transactions", "next_cursor", "prev_cursor"}``; ``next_cursor``
+    leads further down the list and ``prev_cursor`` back up, ``None`` at either end.
+    """
+    params = list(params)
+    columns = list(LIST_COLUMNS)
+    select_params = []
+    key = "date_time, id"
+    if rank:
+        columns.append(f"CAST(({rank}) AS DOUBLE PRECISION) AS rank")
+        select_params = list(rank_params)
+        key = "rank, date_time, id"
+
+    direction = "next"
+    cursor_rank = None
+    if cursor:
+        cursor_time, cursor_id, direction, cursor_rank = decode_cursor(cursor)
+        if rank and cursor_rank is None:
+            raise InvalidCursor(cursor)
+        op = "<" if direction == "next" else ">"
+        if rank:
+            where += f" AND (CAST(({rank}) AS DOUBLE PRECISION), date_time, id) {op} (%s, %s, %s)"
+            params += list(rank_params) + [cursor_rank, cursor_time, cursor_id]
+        else:
+            where += f" AND (date_time, id) {op} (%s, %s)"
+            params += [cursor_time, cursor_id]
+    order = "DESC" if direction == "next" else "ASC"
+
+    cur.execute(f"""
+        SELECT {', '.join(columns)} FROM transactions
+        WHERE {where}
+        ORDER BY {', '.join(f"{column} {order}" for column in key.split(', '))}
+        LIMIT %s
+    """, select_params + params + [page_size + 1])
+    names = list(LIST_COLUMNS) + (["rank"] if rank else [])
+    rows = [dict(zip(names, row)) for row in cur.fetchall()]
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "prev":
+        rows.reverse()
+
+    older = has_more if direction == "next" else cursor is not None
+    newer = cursor is not None if direction == "next" else has_more
+    page = {
+        "transactions": rows,
+        "next_cursor": encode_cursor(rows[-1], "next") if rows and older else None,
+        "prev_cursor": encode_cursor(rows[0], "prev") if rows and newer else None,
+    }
+    for row in rows:
+        row.pop("rank", None)
+    return page
@@ -1,87 +1,163 @@
+# services/password_service.py
+"""Password manager storage: paginated metadata listings and on-demand secrets.
+
+Listings and searches return ``id, category, username, date_time`` only, a page
+at a time in ``(category, username, id)`` order, keyset-paginated along the
+``idx_passwords_user_category_username`` index. A secret is read and decrypted
+(``services.vault``) only when one entry is revealed.
+
+Search matches the query as a substring of ``category || ' ' || username`` and,
+when pg_trgm is installed, by trigram word similarity too (typos), both served
+by the ``idx_passwords_search_trgm`` GIN index. On SQLite it is a substring match
+over the user's rows found through the (user_id, ...) index.
+"""
+import base64
+import json
+import logging
+import os
+from services import vault
 from services.db import get_db
+from services.pagination import InvalidCursor
+from services.search_service import set_trigram_threshold, trigram_available
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_PAGE_SIZE = int(os.environ.get('PASSWORD_PAGE_SIZE', 20))
+# Plaintext rows re-encrypted per statement by encrypt_plaintext_passwords()
+PASSWORD_ENCRYPT_BATCH = int(os.environ.get('PASSWORD_ENCRYPT_BATCH', 500))
+
+METADATA_COLUMNS = ("id", "category", "username", "date_time")
+SEARCH_TEXT = "(category || ' ' || username)"
+
+
+def encode_cursor(row):
+    payload = [row["category"], row["username"], row["id"]]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``(category, username, id)`` for a cursor token."""
+    try:
+        category, username, password_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return str(category), str(username), int(password_id)
+    except (ValueError, TypeError) as ex:
+        raise InvalidCursor(token) from ex
+
+
+def _like_pattern(text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def encrypt_plaintext_passwords(cur, batch_size=PASSWORD_ENCRYPT_BATCH):
+    """Encrypt one batch of legacy plaintext ``password`` values into ``secret``; returns the rows done."""
+    cur.execute("""
+        SELECT id, user_id, password FROM passwords
+        WHERE secret IS NULL AND password IS NOT NULL AND user_id IS NOT NULL
+        ORDER BY id LIMIT %s
+    """, (batch_size,))
+    rows = cur.fetchall()
+    if rows:
+        cur.executemany(
+            "UPDATE passwords SET secret = %s, password = NULL WHERE id = %s",
+            [(vault.encrypt(user_id, password), password_id) for password_id, user_id, password in rows],
+        )
+    return len(rows)
+
 
 class PasswordService:
     def add_password(self, user_id, category, username, password):
-        """Add a new password to the database."""
+        """Encrypt and store a new password; returns the entry's metadata."""
         try:
-            conn = get_db()
-            cur = conn.cursor()
-            cur.execute(
-                """
-                INSERT INTO passwords (user_id, category, username, password)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id, category, username, password, date_time
-                """,
-                (user_id, category, username, password)
-            )
-            inserted_row = cur.fetchone()  # ✅ Now it will return the inserted row
-            conn.commit()
-            cur.close()
-            conn.close()
+            secret = vault.encrypt(user_id, password)
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO passwords (user_id, category, username, secret)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING id, category, username, date_time
+                    """,
+                    (user_id, category, username, secret)
+                )
+                inserted_row = cur.fetchone()
+                conn.commit()
 
             if inserted_row:
-                return {
-                    "id": inserted_row[0],
-                    "category": inserted_row[1],
-                    "username": inserted_row[2],
-                    "password": inserted_row[3],
-                    "date_time": inserted_row[4]
-                }
+                return dict(zip(METADATA_COLUMNS, inserted_row))
             else:
                 return None
 
+        except vault.VaultUnavailable:
+            raise
         except Exception as ex:
-            print(f"❌ Failed to add password: {ex}")
+            logger.error("Failed to add password: %s", ex)
             return None
 
+    def list_passwords(self, user_id, query=None, cursor=None, page_size=PASSWORD_PAGE_SIZE):
+        """One page of the user's entries (optionally matching ``query``), without secrets.
+
+        Returns ``{"passwords", "next_cursor"}``; ``next_cursor`` is ``None`` on the last page.
+        """
+        where = ["user_id = %s"]
+        params = [user_id]
+        query = (query or "").strip()
+        trigram = bool(query) and trigram_available()
+        if query:
+            if trigram:
+                where.append(f"({SEARCH_TEXT} ILIKE %s ESCAPE '\\' OR %s <%% {SEARCH_TEXT})")
+                params += [_like_pattern(query), query]
+            else:
+                where.append(f"{SEARCH_TEXT} ILIKE %s ESCAPE '\\'")
+                params.append(_like_pattern(query))
+        if cursor:
+            where.append("(category, username, id) > (%s, %s, %s)")
+            params += list(decode_cursor(cursor))
 
-    def search_passwords(self, user_id, category, username):
-        """Search passwords by category and username."""
         try:
-            conn = get_db()
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT id, category, username, password, date_time FROM passwords WHERE user_id = %s AND category = %s AND username = %s",
-                (user_id, category, username)
-            )
-            results = cur.fetchall()
-            cur.close()
-            conn.close()
-            return results
+            with get_db() as conn, conn.cursor() as cur:
+                if trigram:
+                    set_trigram_threshold(cur)
+                cur.execute(f"""
+                    SELECT {', '.join(METADATA_COLUMNS)} FROM passwords
+                    WHERE {' AND '.join(where)}
+                    ORDER BY category, username, id
+                    LIMIT %s
+                """, params + [page_size + 1])
+                rows = [dict(zip(METADATA_COLUMNS, row)) for row in cur.fetchall()]
         except Exception as ex:
-            print(f"❌ Failed to search passwords: {ex}")
-            return []
+            logger.error("Failed to list passwords: %s", ex)
+            return {"passwords": [], "next_cursor": None}
 
-    def list_passwords(self, user_id):
-        """List all passwords for the authenticated user."""
-        try:
-            conn = get_db()
-            cur = conn.cursor()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        return {"passwords": rows, "next_cursor": encode_cursor(rows[-1]) if has_more else None}
+
+    def reveal_password(self, user_id, password_id):
+        """Decrypted password of one of the user's entries, or ``None`` if there is no such entry."""
+        with get_db() as conn, conn.cursor() as cur:
             cur.execute(
-                "SELECT id, category, username, password, date_time FROM passwords WHERE user_id = %s",
-                (user_id,)
+                "SELECT secret, password FROM passwords WHERE user_id = %s AND id = %s",
+                (user_id, password_id)
             )
-            results = cur.fetchall()
-            cur.close()
-            conn.close()
-            return results
-        except Exception as ex:
-            print(f"❌ Failed to list passwords: {ex}")
-            return []
+            row = cur.fetchone()
+        if row is None:
+            return None
+        secret, legacy_plaintext = row
+        if secret is None:
+            # Stored before encryption was enabled and not yet re-encrypted
+            return legacy_plaintext
+        return vault.decrypt(user_id, secret)
 
     def delete_password(self, user_id, password_id):
         """Delete a password by ID."""
         try:
-            conn = get_db()
-            cur = conn.cursor()
-            cur.execute(
-                "DELETE FROM passwords WHERE user_id = %s AND id = %s",
-                (user_id, password_id)
-            )
-            conn.commit()
-            cur.close()
-            conn.close()
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM passwords WHERE user_id = %s AND id = %s",
+                    (user_id, password_id)
+                )
+                conn.commit()
             return True
         except Exception as ex:
-            print(f"❌ Failed to delete password: {ex}")
-            return False
\ No newline at end of file
+            logger.error("Failed to delete password: %s", ex)
+            return False
@@ -0,0 +1,70 @@
+# services/prediction_cache.py
+"""Bounded memo tables for model predictions on repeated chat inputs."""
+import math
+import os
+import threading
+from services.cache import InMemoryBackend
+
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+
+
+def normalize_text(text):
+    """Key for a chat line: both vectorizers lowercase, and tokens ignore spacing."""
+    return " ".join(text.lower().split())
+
+
+class MemoCache:
+    """LRU memo of ``key -> value`` that empties itself when the model version changes."""
+
+    def __init__(self, name, max_entries=PREDICTION_CACHE_SIZE):
+        self.name = name
+        self.backend = InMemoryBackend(max_entries)
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self.backend.clear()
+                    self.version = version
+
+    def get(self, key, version=None):
+        self._check_version(version)
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, version=None):
+        if version == self.version:
+            self.backend.set(key, value, math.inf)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.backend.size(),
+            "evictions": self.backend.evictions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "model_version": self.version,
+        }
+
+
+# Whole chat line -> (amount, category, sub_category)
+line_cache = MemoCache("lines")
+# In-vocabulary word tokens -> "category|sub_category"; amounts and unknown
+# words do not change the TF-IDF vector, so "tea 15" and "tea 20" share an entry
+category_cache = MemoCache("categories")
+# Single token -> amount-extractor label; the label depends only on the token
+amount_token_cache = MemoCache("amount_tokens")
+
+
+def prediction_cache_stats():
+    return {cache.name: cache.stats() for cache in (line_cache, category_cache, amount_token_cache)}
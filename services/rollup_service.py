@@ -0,0 +1,101 @@
+# services/rollup_service.py
+import struct
+from collections import defaultdict
+from datetime import date
+from services.db import dialect, execute_values, get_db
+
+# Amounts are stored as REAL; sums are kept in double precision and compared
+# with this tolerance when verifying.
+DRIFT_TOLERANCE = 0.01
+
+
+def month_key(dt):
+    """First day of the month a transaction timestamp belongs to."""
+    return date(dt.year, dt.month, 1)
+
+
+def _as_real(amount):
+    """Round a Python float the way a REAL column stores it."""
+    return struct.unpack("f", struct.pack("f", float(amount or 0)))[0]
+
+
+def apply_rollup_deltas(cur, rows, sign=1):
+    """Add (sign=1) or remove (sign=-1) transactions from ``monthly_rollups``.
+
+    ``rows`` are ``(user_id, date_time, category, sub_category, amount)`` tuples. Run it
+    on the same cursor as the write so the rollups commit or roll back with it.
+    """
+    deltas = defaultdict(lambda: [0.0, 0])
+    for user_id, date_time, category, sub_category, amount in rows:
+        if user_id is None or date_time is None:
+            continue
+        key = (user_id, month_key(date_time), category or "", sub_category or "")
+        deltas[key][0] += sign * _as_real(amount)
+        deltas[key][1] += sign
+    if not deltas:
+        return
+    # Sorted keys: concurrent writers lock the rollup rows in the same order
+    execute_values(cur, """
+        INSERT INTO monthly_rollups (user_id, month, category, sub_category, total, count)
+        VALUES %s
+        ON CONFLICT (user_id, month, category, sub_category) DO UPDATE
+        SET total = monthly_rollups.total + EXCLUDED.total,
+            count = monthly_rollups.count + EXCLUDED.count
+    """, [key + (total, count) for key, (total, count) in sorted(deltas.items())])
+
+
+AGGREGATE_SQL = f"""
+    SELECT user_id, {dialect.month('date_time')} AS month,
+           COALESCE(category, '') AS category, COALESCE(sub_category, '') AS sub_category,
+           SUM(CAST(amount AS DOUBLE PRECISION)) AS total, COUNT(*) AS count
+    FROM transactions
+    WHERE user_id IS NOT NULL AND date_time IS NOT NULL {{user_filter}}
+    GROUP BY 1, 2, 3, 4
+"""
+
+
+def rebuild_rollups(cur, user_id=None):
+    """Recompute ``monthly_rollups`` from raw transactions (all users or one)."""
+    user_filter, params = ("AND user_id = %s", (user_id,)) if user_id is not None else ("", ())
+    if user_id is None:
+        cur.execute("DELETE FROM monthly_rollups")
+    else:
+        cur.execute("DELETE FROM monthly_rollups WHERE user_id = %s", (user_id,))
+    cur.execute(
+        "INSERT INTO monthly_rollups (user_id, month, category, sub_category, total, count) "
+        + AGGREGATE_SQL.format(user_filter=user_filter),
+        params,
+    )
+    return cur.rowcount
+
+
+def verify_rollups(cur, user_id=None):
+    """Compare ``monthly_rollups`` with a fresh aggregate and return the drifted rows."""
+    user_filter, params = ("AND user_id = %s", (user_id,)) if user_id is not None else ("", ())
+    rollup_filter = "WHERE user_id = %s" if user_id is not None else ""
+    cur.execute(f"""
+        WITH fresh AS ({AGGREGATE_SQL.format(user_filter=user_filter)}),
+             stored AS (SELECT * FROM monthly_rollups {rollup_filter})
+        SELECT COALESCE(f.user_id, s.user_id), COALESCE(f.month, s.month),
+               COALESCE(f.category, s.category), COALESCE(f.sub_category, s.sub_category),
+               COALESCE(f.total, 0), COALESCE(s.total, 0), COALESCE(f.count, 0), COALESCE(s.count, 0)
+        FROM fresh f
+        FULL OUTER JOIN stored s USING (user_id, month, category, sub_category)
+        WHERE COALESCE(f.count, 0) <> COALESCE(s.count, 0)
+           OR abs(COALESCE(f.total, 0) - COALESCE(s.total, 0)) > %s
+        ORDER BY 1, 2, 3, 4
+    """, params + params + (DRIFT_TOLERANCE,))
+    keys = ("user_id", "month", "category", "sub_category", "expected_total", "stored_total", "expected_count", "stored_count")
+    return [dict(zip(keys, row)) for row in cur.fetchall()]
+
+
+class RollupService:
+    def rebuild(self, user_id=None):
+        with get_db() as conn, conn.cursor() as cur:
+            count = rebuild_rollups(cur, user_id)
+            conn.commit()
+        return count
+
+    def verify(self, user_id=None):
+        with get_db() as conn, conn.cursor() as cur:
+            return verify_rollups(cur, user_id)
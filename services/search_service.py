@@ -0,0 +1,167 @@
+# services/search_service.py
+"""Parse the transaction search box and turn it into indexed SQL.
+
+Free-text words match ``transactions.search_vector`` (GIN) as prefixes, and, when
+pg_trgm is installed, the description by trigram word similarity as well, so
+substrings and typos still hit an index. Results are ranked by relevance. On
+SQLite the words are prefix queries against the ``transactions_fts`` FTS5 index
+and ranked by bm25.
+
+Operators mixed into the text narrow the results:
+
+    >500  >=500  <1000  <=1000  =250  100..500     amount
+    2026-03  2026-03-15  2026-01..2026-03           date (month or day, or a range)
+"""
+import re
+import threading
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+from services.db import SEARCH_CONFIG, dialect, get_db
+
+# Minimum pg_trgm word similarity for a typo / substring match
+TRIGRAM_THRESHOLD = 0.5
+
+AMOUNT_OP = re.compile(r"^(>=|<=|>|<|=)(\d+(?:\.\d+)?)$")
+AMOUNT_RANGE = re.compile(r"^(\d+(?:\.\d+)?)\.\.(\d+(?:\.\d+)?)$")
+DATE_TOKEN = r"\d{4}-\d{2}(?:-\d{2})?"
+DATE_OP = re.compile(rf"^({DATE_TOKEN})(?:\.\.({DATE_TOKEN}))?$")
+WORD = re.compile(r"[^\W_]+")
+
+
+def _date_bounds(token):
+    """``[start, end)`` datetimes of a ``YYYY-MM`` or ``YYYY-MM-DD`` token."""
+    if len(token) == 7:
+        start = datetime.strptime(token, "%Y-%m")
+        return start, start + relativedelta(months=1)
+    start = datetime.strptime(token, "%Y-%m-%d")
+    return start, start + relativedelta(days=1)
+
+
+class SearchQuery:
+    """A search box query split into free-text words and filters."""
+
+    def __init__(self, text):
+        self.text = text
+        self.words = []
+        self.min_amount = self.max_amount = None
+        self.min_inclusive = self.max_inclusive = True
+        self.start = self.end = None
+
+        for token in text.split():
+            if self._parse_amount(token) or self._parse_date(token):
+                continue
+            self.words.extend(WORD.findall(token.lower()))
+
+    def _parse_amount(self, token):
+        match = AMOUNT_OP.match(token)
+        if match:
+            op, value = match[1], float(match[2])
+            if op in (">", ">="):
+                self.min_amount, self.min_inclusive = value, op == ">="
+            elif op in ("<", "<="):
+                self.max_amount, self.max_inclusive = value, op == "<="
+            else:
+                self.min_amount = self.max_amount = value
+                self.min_inclusive = self.max_inclusive = True
+            return True
+        match = AMOUNT_RANGE.match(token)
+        if match:
+            self.min_amount, self.max_amount = sorted((float(match[1]), float(match[2])))
+            self.min_inclusive = self.max_inclusive = True
+            return True
+        return False
+
+    def _parse_date(self, token):
+        match = DATE_OP.match(token)
+        if not match:
+            return False
+        try:
+            start, end = _date_bounds(match[1])
+            if match[2]:
+                end = _date_bounds(match[2])[1]
+        except ValueError:
+            return False
+        self.start, self.end = start, end
+        return True
+
+    @property
+    def has_dates(self):
+        return self.start is not None
+
+    @property
+    def tsquery(self):
+        """Prefix tsquery of all words, e.g. ``petrol:* & bill:*``."""
+        return " & ".join(f"{word}:*" for word in self.words)
+
+    @property
+    def fts_query(self):
+        """FTS5 query of all words as prefixes, e.g. ``"petrol"* "bill"*``."""
+        return " ".join(f'"{word}"*' for word in self.words)
+
+    def filters(self):
+        """``(where, params)`` for the amount and date operators."""
+        where, params = [], []
+        if self.min_amount is not None:
+            where.append("amount >= %s" if self.min_inclusive else "amount > %s")
+            params.append(self.min_amount)
+        if self.max_amount is not None:
+            where.append("amount <= %s" if self.max_inclusive else "amount < %s")
+            params.append(self.max_amount)
+        if self.start is not None:
+            where += ["date_time >= %s", "date_time < %s"]
+            params += [self.start, self.end]
+        return " AND ".join(where), params
+
+    def text_match(self, trigram):
+        """``(where, params, rank, rank_params)`` for the free-text words, or ``None``.
+
+        Every word must match, either as a full-text prefix or (with pg_trgm) by
+        trigram similarity to a word of the description.
+        """
+        if not self.words:
+            return None
+        if dialect.name == "sqlite":
+            # bm25() is lower for better matches; negate it so higher ranks first
+            return (
+                "id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH %s)", [self.fts_query],
+                "(SELECT -bm25(transactions_fts) FROM transactions_fts"
+                " WHERE transactions_fts MATCH %s AND rowid = transactions.id)", [self.fts_query],
+            )
+        if not trigram:
+            return (
+                f"search_vector @@ to_tsquery('{SEARCH_CONFIG}', %s)", [self.tsquery],
+                f"ts_rank_cd(search_vector, to_tsquery('{SEARCH_CONFIG}', %s))", [self.tsquery],
+            )
+
+        clauses, params = [], []
+        for word in self.words:
+            clauses.append(f"(search_vector @@ to_tsquery('{SEARCH_CONFIG}', %s) OR %s <%% description)")
+            params += [f"{word}:*", word]
+        rank = (
+            f"ts_rank_cd(search_vector, to_tsquery('{SEARCH_CONFIG}', %s))"
+            " + word_similarity(%s, coalesce(description, ''))"
+        )
+        return " AND ".join(clauses), params, rank, [self.tsquery, " ".join(self.words)]
+
+
+_trigram = None
+_trigram_lock = threading.Lock()
+
+
+def trigram_available():
+    """Whether pg_trgm is installed in the database (checked once per process)."""
+    global _trigram
+    if dialect.name == "sqlite":
+        return False
+    if _trigram is None:
+        with _trigram_lock:
+            if _trigram is None:
+                with get_db() as conn, conn.cursor() as cur:
+                    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                    _trigram = cur.fetchone() is not None
+    return _trigram
+
+
+def set_trigram_threshold(cur):
+    """Apply ``TRIGRAM_THRESHOLD`` to the ``<%`` operator for this transaction."""
+    cur.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(TRIGRAM_THRESHOLD),))
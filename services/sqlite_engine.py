@@ -0,0 +1,332 @@
+# services/sqlite_engine.py
+"""Embedded SQLite storage engine (WAL) behind the same interface as psycopg2.
+
+``DATABASE_URL=sqlite:///path/to/expense.db`` selects it. Connections and cursors
+are wrapped so the services' psycopg2-style code runs unchanged:
+
+- ``%s`` / ``%(name)s`` placeholders become ``?`` / ``:name`` (``%%`` -> ``%``)
+- ``= ANY(%s)`` with a list becomes ``IN (SELECT value FROM json_each(?))``
+- ``ILIKE`` becomes ``LIKE`` (case-insensitive for ASCII in SQLite)
+- ``SELECT ... FOR UPDATE [SKIP LOCKED]`` takes the database write lock first
+- ``copy_expert("COPY t (cols) FROM STDIN WITH (FORMAT csv)")`` inserts the rows
+- named (server-side) cursors are plain cursors, which SQLite already streams
+
+Timestamps are stored as fixed-width UTC text (``YYYY-MM-DD HH:MM:SS.ffffff``) so
+they compare correctly as strings, and come back as aware datetimes, like
+TIMESTAMPTZ does. Queries that need other Postgres features branch on
+``services.db.dialect``.
+"""
+import csv
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from psycopg2.extras import Json
+from services.metrics import observe_query
+
+logger = logging.getLogger(__name__)
+
+# Page cache per connection, in KiB (negative = KiB for the cache_size pragma)
+SQLITE_CACHE_KB = int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024))
+SQLITE_MMAP_BYTES = int(os.environ.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))
+
+# psycopg2.extensions.TRANSACTION_STATUS_IDLE / _INTRANS, as the pool expects
+TRANSACTION_STATUS_IDLE = 0
+TRANSACTION_STATUS_INTRANS = 2
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+# SQL expression for "now" in the stored timestamp format (usable in DEFAULT)
+NOW_SQL = "(strftime('%Y-%m-%d %H:%M:%f', 'now') || '000')"
+
+PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+ANY_PARAM = re.compile(r"=\s*ANY\s*\(\s*(%s|%\(\w+\)s)\s*\)", re.IGNORECASE)
+ILIKE = re.compile(r"\bILIKE\b", re.IGNORECASE)
+FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE(\s+SKIP\s+LOCKED)?\b", re.IGNORECASE)
+COPY_FROM = re.compile(r"^\s*COPY\s+(\w+)\s*\(([^)]*)\)\s+FROM\s+STDIN", re.IGNORECASE)
+
+
+# -------------------- Types --------------------
+def _utc_text(value):
+    # Naive datetimes are local time, as a TIMESTAMPTZ column reads them
+    return value.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def _parse_timestamp(raw):
+    value = datetime.fromisoformat(raw.decode() if isinstance(raw, bytes) else raw)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone()
+
+
+sqlite3.register_adapter(datetime, _utc_text)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(Json, lambda value: json.dumps(value.adapted))
+sqlite3.register_adapter(list, json.dumps)
+sqlite3.register_converter("TIMESTAMPTZ", _parse_timestamp)
+sqlite3.register_converter("TIMESTAMP", lambda raw: _parse_timestamp(raw).replace(tzinfo=None))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter("JSONB", json.loads)
+
+
+# -------------------- SQL translation --------------------
+@lru_cache(maxsize=1024)
+def translate(sql, has_params):
+    """Return ``(sqlite_sql, locks)`` for a psycopg2-style statement."""
+    locks = bool(FOR_UPDATE.search(sql))
+    if locks:
+        sql = FOR_UPDATE.sub("", sql)
+    sql = ANY_PARAM.sub(r"IN (SELECT value FROM json_each(\1))", sql)
+    sql = ILIKE.sub("LIKE", sql)
+    if has_params:
+        sql = PLACEHOLDER.sub(lambda m: f":{m[1]}" if m[1] else ("?" if m[0] == "%s" else "%"), sql)
+    return sql, locks
+
+
+class SQLiteCursor:
+    """psycopg2-like cursor over ``sqlite3.Cursor`` that records query metrics."""
+
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.itersize = 2000
+        self._cursor = connection.raw.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, query, vars=None):
+        sql, locks = translate(query, vars is not None)
+        if locks and not self.connection.raw.in_transaction:
+            self._cursor.execute("BEGIN IMMEDIATE")
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(sql, vars if vars is not None else ())
+        except Exception:
+            observe_query(query, time.perf_counter() - started, failed=True)
+            raise
+        observe_query(query, time.perf_counter() - started, self._cursor.rowcount)
+        return None
+
+    def executemany(self, query, vars_list):
+        sql, _ = translate(query, True)
+        started = time.perf_counter()
+        self._cursor.executemany(sql, vars_list)
+        observe_query(query, time.perf_counter() - started, self._cursor.rowcount)
+
+    def copy_expert(self, sql, file, size=8192):
+        """Load ``COPY table (columns) FROM STDIN WITH (FORMAT csv)`` data with INSERTs."""
+        match = COPY_FROM.match(sql)
+        if not match or "csv" not in sql.lower():
+            raise NotImplementedError(f"unsupported COPY for SQLite: {sql.strip()[:80]}")
+        table, columns = match[1], [c.strip() for c in match[2].split(",")]
+        types = {row[1]: (row[2] or "").upper() for row in self._cursor.execute(f"PRAGMA table_info({table})")}
+        stamps = [i for i, column in enumerate(columns) if types.get(column, "").startswith("TIMESTAMP")]
+
+        def rows():
+            for values in csv.reader(file):
+                # Unquoted empty fields are NULL in Postgres' CSV format
+                values = [value if value != "" else None for value in values]
+                for i in stamps:
+                    if values[i] is not None:
+                        values[i] = _utc_text(datetime.fromisoformat(values[i]))
+                yield values
+
+        started = time.perf_counter()
+        self._cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows(),
+        )
+        observe_query(sql, time.perf_counter() - started, self._cursor.rowcount)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """The subset of a psycopg2 connection the services and the pool use."""
+
+    def __init__(self, path, busy_timeout=10):
+        self.raw = sqlite3.connect(
+            path, timeout=busy_timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level="IMMEDIATE", check_same_thread=False,
+        )
+        self.closed = False
+        self.raw.create_function("now", 0, lambda: datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT))
+        for pragma in (
+            "journal_mode = WAL",
+            "synchronous = NORMAL",
+            "foreign_keys = ON",
+            f"busy_timeout = {int(busy_timeout * 1000)}",
+            f"cache_size = -{SQLITE_CACHE_KB}",
+            f"mmap_size = {SQLITE_MMAP_BYTES}",
+            "temp_store = MEMORY",
+        ):
+            self.raw.execute(f"PRAGMA {pragma}")
+
+    def cursor(self, name=None, **kwargs):
+        return SQLiteCursor(self, name)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def get_transaction_status(self):
+        return TRANSACTION_STATUS_INTRANS if self.raw.in_transaction else TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.raw.close()
+
+
+def connect(url, busy_timeout=10):
+    """Open ``sqlite:///relative.db`` or ``sqlite:////absolute.db``."""
+    path = url.split("sqlite:///", 1)[1]
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return SQLiteConnection(path, busy_timeout)
+
+
+def execute_values(cur, sql, argslist, template=None, page_size=100, fetch=False):
+    """``psycopg2.extras.execute_values`` for SQLite: multi-row VALUES, paged."""
+    argslist = list(argslist)
+    result = []
+    if not argslist:
+        return result if fetch else None
+    head, tail = sql.split("%s", 1)
+    width = len(argslist[0])
+    # Stay under SQLite's bound-variable limit
+    page_size = max(min(page_size, 32766 // width), 1)
+    row = template or "(" + ", ".join(["%s"] * width) + ")"
+    for start in range(0, len(argslist), page_size):
+        page = argslist[start:start + page_size]
+        cur.execute(head + ", ".join([row] * len(page)) + tail, [value for args in page for value in args])
+        if fetch:
+            result.extend(cur.fetchall())
+    return result if fetch else None
+
+
+# -------------------- Schema --------------------
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        data_version INTEGER NOT NULL DEFAULT 0,
+        data_updated_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_SQL}
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY,
+        category TEXT,
+        sub_category TEXT,
+        description TEXT,
+        amount REAL,
+        date_time TIMESTAMPTZ,
+        user_id INTEGER REFERENCES users(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS passwords (
+        id INTEGER PRIMARY KEY,
+        category TEXT NOT NULL,
+        username TEXT NOT NULL,
+        password TEXT NOT NULL,
+        date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_id INTEGER REFERENCES users(id)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        params JSONB NOT NULL DEFAULT '{{}}',
+        total_rows INTEGER,
+        processed_rows INTEGER NOT NULL DEFAULT 0,
+        report JSONB,
+        result_path TEXT,
+        error TEXT,
+        owner TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_SQL},
+        started_at TIMESTAMPTZ,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_SQL},
+        finished_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS monthly_rollups (
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        month DATE NOT NULL,
+        category TEXT NOT NULL DEFAULT '',
+        sub_category TEXT NOT NULL DEFAULT '',
+        total DOUBLE PRECISION NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, month, category, sub_category)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id ON transactions (user_id, date_time, id)",
+    """
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_subcat_date_id
+    ON transactions (user_id, category, sub_category, date_time, id)
+    """,
+    # Full-text search: an external-content FTS5 index kept in sync by triggers
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        description, category, sub_category, content='transactions', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts (rowid, description, category, sub_category)
+        VALUES (new.id, new.description, new.category, new.sub_category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, category, sub_category)
+        VALUES ('delete', old.id, old.description, old.category, old.sub_category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_update
+    AFTER UPDATE OF description, category, sub_category ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, category, sub_category)
+        VALUES ('delete', old.id, old.description, old.category, old.sub_category);
+        INSERT INTO transactions_fts (rowid, description, category, sub_category)
+        VALUES (new.id, new.description, new.category, new.sub_category);
+    END
+    """,
+]
+
+
+def init_schema(conn, category_indexes):
+    """Create the SQLite schema and indexes mirroring the Postgres ones (in the caller's transaction)."""
+    cur = conn.raw.cursor()
+    for statement in SCHEMA:
+        cur.execute(statement)
+    # Postgres uses INCLUDE (sub_category, amount); here they are trailing key columns
+    for slug, category in category_indexes.items():
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_transactions_user_date_{slug}
+            ON transactions (user_id, date_time, sub_category, amount)
+            WHERE category = '{category.replace("'", "''")}'
+        """)
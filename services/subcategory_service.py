@@ -2,19 +2,13 @@
 
 from flask import session
 from services.db import get_db
-from services.utils import rows_to_dict
+from services.pagination import PAGE_SIZE, fetch_page
 
 class SubcategoryService:
-    def fetch_transactions_by_subcategory(self, category, sub_category):
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT * FROM transactions WHERE user_id = %s AND category=%s AND sub_category=%s ORDER BY date_time DESC",
-                (session["user_id"], category, sub_category)
+    def fetch_transactions_by_subcategory(self, category, sub_category, cursor=None, page_size=PAGE_SIZE):
+        """One keyset page of the user's whole history in a sub-category, newest first."""
+        with get_db(readonly=True) as conn, conn.cursor() as cur:
+            return fetch_page(
+                cur, "user_id = %s AND category = %s AND sub_category = %s",
+                (session["user_id"], category, sub_category), cursor, page_size
             )
-            txns = rows_to_dict(cur, cur.fetchall())
-        finally:
-            cur.close()
-            conn.close()
-        return txns
@@ -1,22 +1,55 @@
 # utils.py
-import re
-import joblib
+import logging
+import os
+import threading
 from datetime import datetime
-from flask import current_app, session
-from services.db import get_db
+from flask import session
+from services.db import execute_values, get_db
+from services.rollup_service import apply_rollup_deltas
+from services.cache import bump_data_versions, forget_data_version
+from services.group_commit import group_committer
+from services.model_registry import model_registry
+from services.amount_lexer import lex_amounts, token_value
+from services.prediction_cache import amount_token_cache, category_cache, line_cache, normalize_text
+from services.metrics import INFERENCE_ITEMS, INFERENCE_SECONDS
+
+logger = logging.getLogger(__name__)
 
 # -------------------- Load ML models --------------------
-try:
-    vectorizer, clf, classes = joblib.load("money_ai_model.pkl")
-except Exception as ex:
-    current_app.logger.error("AI model loading failed: %s", ex)
-    vectorizer = clf = classes = None
-
-try:
-    amount_vectorizer, amount_clf, amount_le = joblib.load("amount_extractor.pkl")
-except Exception as ex:
-    current_app.logger.error("Amount extractor model loading failed: %s", ex)
-    amount_vectorizer = amount_clf = amount_le = None
+# Both models are loaded on first use, not at import (CLI commands, benchmarks
+# and the job paths never need them), from compact memory-mapped artifacts (see
+# services.model_artifact) so serving never imports scikit-learn. Under gunicorn,
+# ``preload_models()`` loads them up front (see gunicorn.conf.py).
+AMOUNT_MODEL_PATH = "amount_extractor.pkl"
+AMOUNT_MODEL_ARTIFACT = "amount_extractor"
+
+_amount_model = None  # LinearTextModel, or False if loading failed
+_amount_model_lock = threading.Lock()
+
+
+def amount_model():
+    """The amount extractor (``AMOUNT``/``O`` per token), or ``None`` if unavailable."""
+    global _amount_model
+    if _amount_model is None:
+        with _amount_model_lock:
+            if _amount_model is None:
+                from services import model_artifact
+
+                try:
+                    if not os.path.isdir(AMOUNT_MODEL_ARTIFACT):
+                        model_artifact.export_pickle(AMOUNT_MODEL_PATH, AMOUNT_MODEL_ARTIFACT)
+                    _amount_model = model_artifact.load(AMOUNT_MODEL_ARTIFACT)
+                except Exception as ex:
+                    logger.error("Amount extractor model loading failed: %s", ex)
+                    _amount_model = False
+    return _amount_model or None
+
+
+def preload_models():
+    """Load the classifier and the amount extractor now instead of on first use."""
+    # The transaction classifier is learned online, so it lives in the model registry
+    model_registry.get()
+    amount_model()
 
 # -------------------- Categories --------------------
 CATEGORIES = {
@@ -30,58 +63,165 @@ CATEGORIES = {
 }
 
 # -------------------- Amount Extraction --------------------
+def _amount_labels(tokens, model):
+    """Return ``{token: label}`` for lowercased tokens, predicting only uncached ones."""
+    labels = {token: amount_token_cache.get(token) for token in tokens}
+    missing = [token for token, label in labels.items() if label is None]
+    if missing:
+        with INFERENCE_SECONDS.time(model="amount"):
+            predicted = model.predict(missing)
+        INFERENCE_ITEMS.inc(len(missing), model="amount")
+        for token, label in zip(missing, predicted):
+            labels[token] = label
+            amount_token_cache.set(token, label)
+    return labels
+
 def extract_amounts(text):
     """Extract numeric amounts from text."""
-    if amount_vectorizer is None or amount_clf is None or amount_le is None:
-        matches = re.findall(r'[\d,.]+', text)
-        amounts = [float(m.replace(',', '')) for m in matches]
-        return sum(amounts) if amounts else 0
-
-    tokens = text.split()
-    X_vect = amount_vectorizer.transform(tokens)
-    y_pred = amount_clf.predict(X_vect)
-    labels = amount_le.inverse_transform(y_pred)
-
-    amounts = []
-    for token, label in zip(tokens, labels):
-        if label == "AMOUNT":
-            clean_token = re.sub(r'[^\d.]', '', token)
-            if clean_token:
-                amounts.append(float(clean_token))
-    return sum(amounts) if amounts else 0
-
-# -------------------- Classification & Insert --------------------
-def classify_and_insert(user_input: str):
+    return extract_amounts_many([text])[0]
+
+def extract_amounts_many(texts):
+    """Extract amounts for many texts in two stages.
+
+    The lexer settles every token it can (digit-free tokens, currency-marked and
+    k/lakh/crore amounts); only the remaining ambiguous tokens of all texts go
+    through the token classifier, in one batch. Without the classifier every
+    ambiguous number counts, as the old regex fallback did.
+    """
+    lexed = [lex_amounts(text) for text in texts]
+    ambiguous_tokens = {token.lower() for _, ambiguous in lexed for token in ambiguous}
+    # Texts the lexer settles on its own never load the classifier
+    model = amount_model() if ambiguous_tokens else None
+    labels = _amount_labels(ambiguous_tokens, model) if model is not None else None
+
+    results = []
+    for amounts, ambiguous in lexed:
+        for token in ambiguous:
+            if labels is None or labels[token.lower()] == "AMOUNT":
+                value = token_value(token)
+                if value is not None:
+                    amounts.append(value)
+        results.append(sum(amounts) if amounts else 0)
+    return results
+
+# -------------------- Classification --------------------
+def predict_categories(texts, model, version=None):
+    """Return ``"category|sub_category"`` per text, memoized on its in-vocabulary words."""
+    analyzer, vocabulary = model.analyze, model.vocabulary
+    keys = [tuple(sorted(word for word in analyzer(text) if word in vocabulary)) for text in texts]
+
+    labels = [category_cache.get(key, version) for key in keys]
+    missing = [i for i, label in enumerate(labels) if label is None]
+    if missing:
+        with INFERENCE_SECONDS.time(model="category"):
+            predicted = model.predict([texts[i] for i in missing])
+        INFERENCE_ITEMS.inc(len(missing), model="category")
+        for i, label in zip(missing, predicted):
+            labels[i] = label
+            category_cache.set(keys[i], label, version)
+    return labels
+
+def classify_lines(lines):
+    """Return ``(amount, category, sub_category)`` per chat line, or ``None`` without a model.
+
+    Repeated lines are answered from an LRU keyed on the normalized text; the
+    caches are emptied whenever the model registry publishes a new version.
+    """
+    version, model = model_registry.snapshot()
+    if model is None:
+        return None
+
+    keys = [normalize_text(line) for line in lines]
+    results = [line_cache.get(key, version) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        texts = [lines[i] for i in missing]
+        amounts = extract_amounts_many(texts)
+        labels = predict_categories(texts, model, version)
+        for i, amount, label in zip(missing, amounts, labels):
+            category, sub_category = label.split("|")
+            results[i] = (amount, category, sub_category)
+            line_cache.set(keys[i], results[i], version)
+    return results
+
+# -------------------- Insert --------------------
+INSERT_RETURNING_SQL = """
+    INSERT INTO transactions (category, sub_category, description, amount, date_time, user_id)
+    VALUES %s
+    RETURNING id, category, sub_category, amount, description
+"""
+
+
+def insert_transactions(rows):
+    """Insert ``(category, sub_category, description, amount, date_time, user_id)`` rows.
+
+    One multi-row INSERT ... RETURNING, the rollup deltas and the data-version
+    bumps of every user involved, in one transaction. Returns the created rows
+    as dicts, in input order.
+    """
+    with get_db() as conn, conn.cursor() as cur:
+        created = execute_values(cur, INSERT_RETURNING_SQL, rows, page_size=len(rows), fetch=True)
+        # RETURNING order is unspecified; ids are assigned in VALUES order
+        created.sort(key=lambda row: row[0])
+        apply_rollup_deltas(cur, [(r[5], r[4], r[0], r[1], r[3]) for r in rows])
+        bump_data_versions(cur, {r[5] for r in rows})
+        conn.commit()
+    return [
+        {"id": txn_id, "category": category, "sub_category": sub_category, "amount": amount, "description": description}
+        for txn_id, category, sub_category, amount, description in created
+    ]
+
+
+# Concurrent single-line /add posts share one INSERT and commit (see GROUP_COMMIT_MS)
+insert_committer = group_committer(insert_transactions)
+
+
+def classify_and_insert(user_input: str, user_id=None):
     """Classify transaction and insert into DB."""
-    if vectorizer is None or clf is None:
+    classified = classify_lines([user_input])
+    if classified is None:
         return None
+    amount, category, sub_category = classified[0]
+    user_id = user_id if user_id is not None else session["user_id"]
 
-    amount = extract_amounts(user_input)
-    X_test = vectorizer.transform([user_input])
-    prediction = clf.predict(X_test)[0]
-    category, sub_category = prediction.split("|")
+    row = (category, sub_category, user_input, amount, datetime.now(), user_id)
+    try:
+        if insert_committer.window > 0:
+            txn = insert_committer.submit(row)
+            forget_data_version()  # bumped by the committer's thread, outside this request
+            return txn
+        return insert_transactions([row])[0]
+    except Exception as ex:
+        logger.error("DB Insert failed: %s", ex)
+        return None
+
+def classify_and_insert_many(lines, user_id=None):
+    """Classify many transaction lines at once and insert them in one statement.
+
+    Lines missing from the prediction caches are classified with one batched
+    model call each for amounts and categories, and all rows go in with a single
+    multi-row INSERT ... RETURNING in one transaction. Returns the created rows
+    in input order, or ``None`` on failure.
+    """
+    lines = [line.strip() for line in lines if line and line.strip()]
+    if not lines:
+        return [] if model_registry.get() is not None else None
+    user_id = user_id if user_id is not None else session["user_id"]
+
+    classified = classify_lines(lines)
+    if classified is None:
+        return None
+    now = datetime.now()
+    rows = [
+        (category, sub_category, line, amount, now, user_id)
+        for line, (amount, category, sub_category) in zip(lines, classified)
+    ]
 
-    conn = None
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO transactions (category, sub_category, description, amount, date_time, user_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (category, sub_category, user_input, amount, datetime.now(), session["user_id"]))
-
-        cur.execute("SELECT * FROM transactions ORDER BY id DESC LIMIT 1")
-        row = cur.fetchone()
-        txn_id = row[0] if row else None
-        conn.commit()
-        cur.close()
-        return {"id": txn_id, "category": category, "sub_category": sub_category, "amount": amount, "description": user_input}
+        return insert_transactions(rows)
     except Exception as ex:
-        current_app.logger.error("DB Insert failed: %s", ex)
+        logger.error("DB batch insert failed: %s", ex)
         return None
-    finally:
-        if conn:
-            conn.close()
 
 # -------------------- Helper --------------------
 def rows_to_dict(cur, rows):
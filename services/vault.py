@@ -0,0 +1,111 @@
+# services/vault.py
+"""Encryption at rest for the password manager.
+
+Every user has their own AES-256-GCM key, derived from ``VAULT_MASTER_KEY`` with
+HKDF-SHA256 (the user id is the HKDF info), so one user's key reveals nothing
+about another's and the master key itself never touches a secret. Keys are
+derived on a user's first vault access and then held in a bounded in-process
+LRU for ``VAULT_KEY_TTL`` seconds, so listing and revealing within a session
+costs one AES-GCM operation per secret, not a key derivation.
+
+A stored secret is ``version byte || 12-byte random nonce || ciphertext+tag``.
+Without ``VAULT_MASTER_KEY`` nothing can be encrypted or decrypted and vault
+operations raise ``VaultUnavailable``.
+"""
+import os
+import threading
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from services.cache import InMemoryBackend
+
+# Server-side secret all per-user keys are derived from (keep it out of the database)
+VAULT_MASTER_KEY = os.environ.get('VAULT_MASTER_KEY')
+# Derived keys kept in memory, and for how long (seconds) after their derivation
+VAULT_KEY_CACHE_SIZE = int(os.environ.get('VAULT_KEY_CACHE_SIZE', 1024))
+VAULT_KEY_TTL = float(os.environ.get('VAULT_KEY_TTL', 1800))
+
+FORMAT_VERSION = b"\x01"
+NONCE_BYTES = 12
+HKDF_SALT = b"expense-tracker vault v1"
+
+
+# Logged at startup (and shown on the password manager page) while the key is missing
+UNCONFIGURED_MESSAGE = "VAULT_MASTER_KEY is not set: passwords cannot be added, nor encrypted ones revealed"
+
+
+class VaultUnavailable(RuntimeError):
+    """Raised when ``VAULT_MASTER_KEY`` is not configured."""
+
+
+class SecretCorrupted(ValueError):
+    """Raised for a stored secret that fails authentication (tampered or wrong key)."""
+
+
+class KeyCache:
+    """Per-user ``AESGCM`` ciphers, derived on first use and kept in a bounded LRU."""
+
+    def __init__(self, master_key=VAULT_MASTER_KEY, max_entries=VAULT_KEY_CACHE_SIZE, ttl=VAULT_KEY_TTL):
+        self.master_key = master_key.encode() if isinstance(master_key, str) else master_key
+        self.ttl = ttl
+        self.backend = InMemoryBackend(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(self.master_key)
+
+    def derive(self, user_id):
+        if not self.configured:
+            raise VaultUnavailable("VAULT_MASTER_KEY is not set")
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=HKDF_SALT, info=f"user:{user_id}".encode())
+        return AESGCM(hkdf.derive(self.master_key))
+
+    def cipher(self, user_id):
+        cipher = self.backend.get(user_id)
+        with self._lock:
+            if cipher is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if cipher is None:
+            cipher = self.derive(user_id)
+            self.backend.set(user_id, cipher, self.ttl)
+        return cipher
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "configured": self.configured,
+            "entries": self.backend.size(),
+            "evictions": self.backend.evictions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+keys = KeyCache()
+
+
+def encrypt(user_id, plaintext):
+    """Stored form of ``plaintext`` for ``user_id``."""
+    nonce = os.urandom(NONCE_BYTES)
+    return FORMAT_VERSION + nonce + keys.cipher(user_id).encrypt(nonce, plaintext.encode(), None)
+
+
+def decrypt(user_id, stored):
+    """Plaintext of a secret stored by ``encrypt`` for ``user_id``."""
+    stored = bytes(stored)  # psycopg2 returns BYTEA as memoryview
+    if stored[:1] != FORMAT_VERSION:
+        raise SecretCorrupted("unknown secret format")
+    nonce, ciphertext = stored[1:1 + NONCE_BYTES], stored[1 + NONCE_BYTES:]
+    try:
+        return keys.cipher(user_id).decrypt(nonce, ciphertext, None).decode()
+    except InvalidTag as ex:
+        raise SecretCorrupted("secret failed authentication") from ex
@@ -1,5 +1,6 @@
 
 import joblib
+from services.model_artifact import export
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import SGDClassifier
 
@@ -68,4 +69,6 @@ clf.partial_fit(X, labels, classes=classes)
 # Save vectorizer, classifier, and classes
 # ----------------------
 joblib.dump((vectorizer, clf, classes), "money_ai_model.pkl")
+# Serving artifact read by the app (the pickle stays as the online learner's state)
+export(vectorizer, clf, "money_ai_model")
 print("✅ AI Model trained and saved with fixed classes for online learning")